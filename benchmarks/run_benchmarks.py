@@ -0,0 +1,249 @@
+"""Times the stages of rf_classifier's analysis on synthetic events and saves the results as JSON for comparing runs.
+
+The events are written by rf_classifier.synthetic, and their cavity modes are read from a file, so nothing is fetched
+over the network.  Two sets of timings are taken.
+
+- stages: Each step of analyzing an event is timed on its own for the first --stage-events events: validate_data,
+  which includes reading the event, preprocess_data and its parts (read, window_resample, and scaling), and the
+  make_prediction calls of the cavity and fault models.  The p50 and p99 milliseconds per event and the events per
+  second of each are reported.
+- run_model: The whole of run_model, including loading the model, is timed for each number of events in --sizes.  Each
+  size is run in a fresh process so that its peak RSS is its own.
+
+Usage Example:
+::
+
+    python benchmarks/run_benchmarks.py -o before.json
+    # Make changes
+    python benchmarks/run_benchmarks.py -o after.json --baseline before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Use the code in this tree rather than whatever is installed
+app_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(app_root, "src"))
+from rf_classifier import synthetic
+
+results_format_version = 1
+"""Part of every results file.  Bump it when the meaning of the results changes."""
+
+
+def get_peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Returns the peak resident set size in MB of this process, or the largest of its waited for children."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KB and macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """Summarizes the times of a stage."""
+    ms = 1000 * np.array(seconds)
+    return {
+        'count': len(ms),
+        'total_s': float(np.sum(ms) / 1000),
+        'mean_ms': float(np.mean(ms)),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'per_second': float(len(ms) / (np.sum(ms) / 1000)),
+    }
+
+
+def time_stages(paths: List[str], mode_archive: str) -> Dict[str, Dict[str, float]]:
+    """Times each stage of analyzing an event, one event at a time.
+
+    Args:
+        paths: The events to analyze
+        mode_archive: The FileArchive file of the events' cavity modes
+
+    Returns:
+        The summary of each stage's times.  See summarize.
+    """
+    from rf_classifier.model import preprocessing
+    from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+    from rf_classifier.model.model import Model
+
+    model = Model(mode_lookup=CavityModeLookup(FileArchive(mode_archive)))
+    times: Dict[str, List[float]] = {name: [] for name in ('validate_data', 'preprocess_data', 'read',
+                                                           'window_resample', 'scaling', 'cavity_prediction',
+                                                           'fault_prediction')}
+
+    def timed(name: str, func: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        result = func()
+        times[name].append(time.perf_counter() - start)
+        return result
+
+    # The first event pays for imports, allocations, etc.  Leave it out.
+    for i, path in enumerate([paths[0]] + paths):
+        model.update_example(path)
+        timed('validate_data', lambda: model.validate_data())
+        timed('preprocess_data', model.preprocess_data)
+
+        # The parts of preprocess_data
+        event_data = timed('read', lambda: model.reader.load(path))
+        event_time, data = event_data.time, event_data.get_signals()
+        window = timed('window_resample', lambda: preprocessing.get_resampler().resample(
+            data[slice(*preprocessing.get_window_bounds(event_time))]))
+        timed('scaling', lambda: np.ascontiguousarray(preprocessing.standardize(window, preprocessing.fill),
+                                                      dtype=np.float32))
+
+        timed('cavity_prediction', lambda: model.make_prediction(model.cavity_onnx_session))
+        timed('fault_prediction', lambda: model.make_prediction(model.fault_onnx_session))
+        if i == 0:
+            for values in times.values():
+                values.clear()
+
+    return {name: summarize(values) for name, values in times.items()}
+
+
+def time_run_model(paths: List[str], mode_archive: str, batch_size: int, jobs: int) -> Dict[str, Any]:
+    """Times run_model over the events.  Meant to be run in a fresh process.  See time_run_models."""
+    start = time.perf_counter()
+    from rf_classifier.main import run_model
+    from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+
+    results = run_model(paths, batch_size=batch_size, jobs=jobs,
+                        model_kwargs={'mode_lookup': CavityModeLookup(FileArchive(mode_archive))})
+    seconds = time.perf_counter() - start
+    return {
+        'events': len(paths),
+        'errors': sum(1 for result in results['data'] if 'error' in result),
+        'seconds': seconds,
+        'events_per_second': len(paths) / seconds,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'peak_worker_rss_mb': get_peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def time_run_models(paths: List[str], mode_archive: str, sizes: List[int], batch_size: int,
+                    jobs: int) -> List[Dict[str, Any]]:
+    """Times run_model over the first n events for each n in sizes, each in a fresh process."""
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_time_run_model_process,
+                                  args=(sender, paths[:size], mode_archive, batch_size, jobs))
+        process.start()
+        sender.close()
+        try:
+            results.append(receiver.recv())
+        except EOFError:
+            raise RuntimeError(f"Timing run_model over {size} events failed") from None
+        finally:
+            process.join()
+    return results
+
+
+def _time_run_model_process(sender, *args) -> None:
+    """Sends the result of time_run_model back to the parent process.  Not a Pool worker, so run_model can use one."""
+    sender.send(time_run_model(*args))
+    sender.close()
+
+
+def get_environment() -> Dict[str, Any]:
+    """Describes the software and machine the benchmarks ran on."""
+    import onnxruntime as rt
+    from rf_classifier.main import version
+
+    return {
+        'rf_classifier': version,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'onnxruntime': rt.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Prints the results as tables.  Ratios to the baseline's numbers are added if one is given."""
+    def ratio(new: float, old: Optional[float]) -> str:
+        return "" if not old else f"{new / old:8.2f}x"
+
+    old_stages = baseline['stages'] if baseline is not None else {}
+    print(f"{'Stage':18s} {'p50 ms':>9s} {'p99 ms':>9s} {'per sec':>9s}")
+    for name, stats in results['stages'].items():
+        old = old_stages.get(name, {})
+        print(f"{name:18s} {stats['p50_ms']:9.2f} {stats['p99_ms']:9.2f} {stats['per_second']:9.1f}"
+              f"{ratio(stats['p50_ms'], old.get('p50_ms'))}")
+
+    old_runs = {run['events']: run for run in baseline['run_model']} if baseline is not None else {}
+    print(f"\n{'run_model events':18s} {'seconds':>9s} {'per sec':>9s} {'peak MB':>9s}")
+    for run in results['run_model']:
+        old = old_runs.get(run['events'], {})
+        print(f"{run['events']:<18d} {run['seconds']:9.2f} {run['events_per_second']:9.1f} "
+              f"{max(run['peak_rss_mb'], run['peak_worker_rss_mb']):9.1f}{ratio(run['seconds'], old.get('seconds'))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rf_classifier on synthetic events")
+    parser.add_argument("-o", "--output", help="The JSON file the results are written to (default: standard out)",
+                        default=None)
+    parser.add_argument("--sizes", help="The numbers of events given to run_model (default: 1 100 1000)", nargs='+',
+                        type=int, default=[1, 100, 1000])
+    parser.add_argument("--stage-events", help="The number of events the stages are timed on (default: 100)",
+                        type=int, default=100)
+    parser.add_argument("-b", "--batch-size", help="The batch size given to run_model (default: 16)", type=int,
+                        default=16)
+    parser.add_argument("-j", "--jobs", help="The jobs given to run_model (default: 1)", type=int, default=1)
+    parser.add_argument("--n-samples", help="The samples in each synthetic waveform (default: 8192)", type=int,
+                        default=8192)
+    parser.add_argument("--data-dir", help="Write the synthetic events here and keep them (default: a temporary"
+                                           " directory)", default=None)
+    parser.add_argument("--baseline", help="A results file from an earlier run to compare to", default=None)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp() if args.data_dir is None else args.data_dir
+    try:
+        print("Writing synthetic events", file=sys.stderr)
+        paths = synthetic.write_events(data_dir, max(args.sizes + [args.stage_events]), n_samples=args.n_samples)
+        mode_archive = os.path.join(data_dir, "cavity-modes.json")
+        synthetic.write_mode_archive(mode_archive, ["1L25"])
+
+        print("Timing stages", file=sys.stderr)
+        stages = time_stages(paths[:args.stage_events], mode_archive)
+        print("Timing run_model", file=sys.stderr)
+        runs = time_run_models(paths, mode_archive, args.sizes, args.batch_size, args.jobs)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+
+    results = {
+        'version': results_format_version,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': get_environment(),
+        'settings': {'batch_size': args.batch_size, 'jobs': args.jobs, 'n_samples': args.n_samples,
+                     'stage_events': args.stage_events},
+        'stages': stages,
+        'run_model': runs,
+    }
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+        return
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,10 @@ DIR="$( cd "$( dirname "$(readlink -f "${BASH_SOURCE[0]}")" )" >/dev/null 2>&1 &
 # Activate the virtual environment
 source ${DIR}/../venv/bin/activate
 
-# Run the app passing along all of the args
+# Run the app passing along all of the args.  Keep its exit status for the caller, e.g. cron.
 python3 -m rf_classifier.main "$@"
+rc=$?
 
 # Put the environment back the way it was.  Probably unnecessary, but just in case the source does something unexpected.
 deactivate
+exit $rc
@@ -0,0 +1,299 @@
+"""This module runs the model over months of fault events while keeping memory use within a budget.
+
+A long run_model over many events grows the process' memory: worker processes accumulate allocations, the heap
+fragments, and every result is kept.  A backfill instead analyzes the events in chunks of a fixed number of events and
+yields each result as soon as it is made, so nothing is held past its chunk.  Every chunk gets fresh worker processes
+(a single process run keeps its one Model, as does the parent that shares its Model with the workers), and the heap is
+returned to the operating system between chunks.
+
+While a chunk runs, the proportional set size (PSS) of this process and its workers is sampled.  Pages the processes
+share, like the loaded model, numpy's and ONNX Runtime's code, and the copy-on-write pages of forked workers, count
+towards the RSS of every process that maps them, so the sum of the RSS overstates what they use together.  The PSS
+splits each shared page between the processes that map it, so the sum is the memory they use.  Where it is not
+available the RSS is used instead.  The Python allocations of this process can also be traced with tracemalloc.
+
+If a chunk's peak comes close to the budget, the next chunk is run with one worker fewer, or once there is only one,
+with half the batch size.  They are raised back a step at a time while the peaks stay well under the budget.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.backfill import iter_backfill
+
+    stats = {}
+    for result in iter_backfill(paths, memory_budget=4096, jobs=4, chunk_size=256, stats=stats):
+        print(result)
+    print(stats['backfill'])
+"""
+import gc
+import os
+import sys
+import time
+import ctypes
+import itertools
+import contextlib
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from . import utils
+
+high_water = 0.9
+"""The fraction of the memory budget above which the next chunk uses fewer workers or smaller batches."""
+
+low_water = 0.6
+"""The fraction of the memory budget below which the next chunk is given back a worker or a larger batch."""
+
+
+class BackfillStats:
+    """Counts the chunks of a backfill and the times its workers or batch size were changed to stay within budget.
+
+    peak_rss_mb is the largest total PSS of this process and its workers that was sampled.  See get_total_pss_mb.
+    """
+
+    gauges = ('peak_rss_mb', 'peak_python_mb')
+    """The attributes that are measurements rather than counts.  See metrics.format_prometheus."""
+
+    def __init__(self):
+        self.chunks: int = 0
+        self.events: int = 0
+        self.backoffs: int = 0
+        self.recoveries: int = 0
+        self.over_budget_chunks: int = 0
+        self.peak_rss_mb: float = 0.0
+        self.peak_python_mb: float = 0.0
+
+    def add(self, other: 'BackfillStats') -> None:
+        """Adds the counts of another BackfillStats to this one.  The peaks are the larger of the two."""
+        self.chunks += other.chunks
+        self.events += other.events
+        self.backoffs += other.backoffs
+        self.recoveries += other.recoveries
+        self.over_budget_chunks += other.over_budget_chunks
+        self.peak_rss_mb = max(self.peak_rss_mb, other.peak_rss_mb)
+        self.peak_python_mb = max(self.peak_python_mb, other.peak_python_mb)
+
+    def __str__(self) -> str:
+        return (f"Backfill: {self.events} events in {self.chunks} chunks, peak PSS {self.peak_rss_mb:.1f} MB, "
+                f"{self.over_budget_chunks} chunks over budget, {self.backoffs} backoffs, {self.recoveries} recoveries")
+
+
+def get_rss_mb(pid: Optional[int] = None) -> float:
+    """Returns the current resident set size of a process in MB, or 0 if it is unknown (e.g., the process exited).
+
+    Args:
+        pid: The process.  This process if None.
+
+    Only Linux exposes the current RSS.  Elsewhere the peak RSS of this process is returned instead.
+    """
+    try:
+        with open(f"/proc/{'self' if pid is None else pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        pass
+    if pid is not None:
+        return 0.0
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB and macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def get_unique_mb(pid: Optional[int] = None) -> float:
+    """Returns the unique set size of a process in MB: the memory that only it maps, or 0 if it is unknown.
+
+    Pages a forked worker still shares with its parent (e.g., loaded models) count towards the RSS of both, but the
+    unique set size of neither.  Only Linux exposes it.
+
+    Args:
+        pid: The process.  This process if None.
+    """
+    unique_kb = 0
+    try:
+        with open(f"/proc/{'self' if pid is None else pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                    unique_kb += int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return unique_kb / 2 ** 10
+
+
+def get_child_pids() -> Iterator[int]:
+    """Yields the process ids of this process' children, e.g. its pool workers.  Nothing on systems without /proc."""
+    parent = os.getpid()
+    try:
+        entries = list(os.scandir("/proc"))
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "stat"), "r") as f:
+                # The command name may contain spaces and parentheses.  The parent id is the second field after it.
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent:
+            yield int(entry.name)
+
+
+def get_pss_mb(pid: Optional[int] = None) -> float:
+    """Returns the proportional set size of a process in MB: its RSS with each shared page divided between the processes
+    that map it.  The RSS is returned instead where the PSS is unknown (e.g., Linux before 4.14 or other systems).
+
+    Args:
+        pid: The process.  This process if None.
+    """
+    try:
+        with open(f"/proc/{'self' if pid is None else pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 2 ** 10
+    except (OSError, ValueError, IndexError):
+        pass
+    return get_rss_mb(pid)
+
+
+def get_total_pss_mb() -> float:
+    """Returns the proportional set size of this process and its children in MB.  Shared pages are counted once."""
+    return get_pss_mb() + sum(get_pss_mb(pid) for pid in get_child_pids())
+
+
+def trim_heap() -> None:
+    """Collects garbage and asks the C allocator to give free memory back to the operating system where it can."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        # Not glibc
+        pass
+
+
+def adjust_limits(peak_mb: float, memory_budget: float, jobs: int, batch_size: int, max_jobs: int,
+                  max_batch_size: int) -> Tuple[int, int]:
+    """Picks the worker count and batch size of the next chunk from the peak memory use of the last one.
+
+    Above high_water of the budget a worker is dropped, or the batch size halved if there is a single worker.  Below
+    low_water the batch size is doubled, or a worker added once it is back to max_batch_size.
+
+    Returns:
+        tuple: The number of workers and the batch size
+    """
+    if peak_mb > high_water * memory_budget:
+        if jobs > 1:
+            return jobs - 1, batch_size
+        return jobs, max(1, batch_size // 2)
+    if peak_mb < low_water * memory_budget:
+        if batch_size < max_batch_size:
+            return jobs, min(max_batch_size, 2 * batch_size)
+        if jobs < max_jobs:
+            return jobs + 1, batch_size
+    return jobs, batch_size
+
+
+def iter_backfill(events: Iterable[str], memory_budget: float, batch_size: int = 16, jobs: int = 1,
+                  chunk_size: int = 256, model_kwargs: Optional[Dict[str, Any]] = None,
+                  stats: Optional[Dict[str, Any]] = None, sample_interval: float = 1.0, trace_python: bool = False,
+                  on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None,
+                  share_model: bool = False) -> Iterator[Dict[str, Any]]:
+    """Analyzes the events in chunks, yielding each result as soon as it is available and staying within a budget.
+
+    Args:
+        events: The paths to the fault event directories.  Any iterable, including a generator, will do.
+        memory_budget: The most megabytes this process and its workers should use together
+        batch_size: The largest number of events the model analyzes together
+        jobs: The largest number of worker processes used to analyze events.  Events are analyzed in this process if 1.
+        chunk_size: The number of events analyzed before the workers are replaced and the limits adjusted
+        model_kwargs: Extra keyword arguments given to the Model, e.g. a feature_cache
+        stats: The model's stats and a 'backfill' BackfillStats are added to this dictionary if given
+        sample_interval: The least number of seconds between samples of the PSS within a chunk
+        trace_python: Also trace this process' Python allocations with tracemalloc.  This slows allocation down.
+        on_chunk: Called with a report of each chunk once it is done: its 'chunk' number, 'events', 'jobs',
+                  'batch-size', 'seconds', 'peak-rss-mb' (the peak total PSS), and 'peak-python-mb' (None unless
+                  trace_python).
+        share_model: Fork each chunk's workers from a Model loaded in this process.  It is loaded once, when it is
+                     first needed, and kept for the rest of the backfill.  See the parallel module.
+
+    Returns:
+        An iterator over the result dictionaries in the same order as events.  See Model.analyze_batch.
+    """
+    events = iter(events)
+    backfill_stats = BackfillStats()
+    model = None
+    shared = contextlib.ExitStack()
+    model_shared = False
+    current_jobs, current_batch_size = jobs, batch_size
+
+    try:
+        for number in itertools.count(1):
+            chunk = list(itertools.islice(events, chunk_size))
+            if len(chunk) == 0:
+                return
+
+            if trace_python:
+                tracemalloc.start()
+            start = last_sample = time.monotonic()
+            peak_mb = get_total_pss_mb()
+
+            if current_jobs > 1:
+                from .parallel import iter_run_model_parallel, shared_model
+                if share_model and not model_shared:
+                    # Only the pools are replaced each chunk.  They are all forked from the same Model.
+                    shared.enter_context(shared_model(model_kwargs))
+                    model_shared = True
+                results = iter_run_model_parallel(chunk, jobs=current_jobs, batch_size=current_batch_size,
+                                                  model_kwargs=model_kwargs, stats=stats, share_model=share_model)
+            else:
+                if model is None:
+                    # Only the single process Model lives across chunks.  Its waveforms are released after each event.
+                    from .model.model import Model
+                    model = Model(**(model_kwargs or {}))
+                model.reset_stats()
+                results = model.iter_analyze(chunk, batch_size=current_batch_size)
+
+            for result in results:
+                yield result
+                if time.monotonic() - last_sample >= sample_interval:
+                    peak_mb = max(peak_mb, get_total_pss_mb())
+                    last_sample = time.monotonic()
+            peak_mb = max(peak_mb, get_total_pss_mb())
+            num_events = len(chunk)
+            del results, chunk
+
+            if model is not None and current_jobs == 1 and stats is not None:
+                utils.add_stats(stats, model.get_stats())
+            peak_python_mb = None
+            if trace_python:
+                peak_python_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+                backfill_stats.peak_python_mb = max(backfill_stats.peak_python_mb, peak_python_mb)
+
+            backfill_stats.chunks += 1
+            backfill_stats.events += num_events
+            backfill_stats.peak_rss_mb = max(backfill_stats.peak_rss_mb, peak_mb)
+            if peak_mb > memory_budget:
+                backfill_stats.over_budget_chunks += 1
+            if on_chunk is not None:
+                on_chunk({'chunk': number, 'events': num_events, 'jobs': current_jobs,
+                          'batch-size': current_batch_size, 'seconds': time.monotonic() - start,
+                          'peak-rss-mb': peak_mb, 'peak-python-mb': peak_python_mb})
+
+            # Give back what the chunk used before deciding how much the next one may use
+            trim_heap()
+            next_jobs, next_batch_size = adjust_limits(peak_mb, memory_budget, current_jobs, current_batch_size,
+                                                       max_jobs=jobs, max_batch_size=batch_size)
+            if (next_jobs, next_batch_size) < (current_jobs, current_batch_size):
+                backfill_stats.backoffs += 1
+            elif (next_jobs, next_batch_size) > (current_jobs, current_batch_size):
+                backfill_stats.recoveries += 1
+            current_jobs, current_batch_size = next_jobs, next_batch_size
+    finally:
+        shared.close()
+        if trace_python and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if stats is not None:
+            utils.add_stats(stats, {'backfill': backfill_stats})
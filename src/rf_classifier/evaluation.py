@@ -0,0 +1,255 @@
+"""This module scores the model against a labeled test set, such as tests/test_set.txt.
+
+A test set is a tab separated file with a header line and one labeled event per line.  Lines starting with ';' are
+comments.  The columns used are:
+
+- zone, time: The event's zone and time, e.g. 1L25 and 2023-02-01 21:00:26.  Tenths of a second may be left off.
+- cavity, fault: The event's true labels.  Cavity 0 is a multi-cavity event.
+- cav_pred, cav_conf, fault_pred, fault_conf: The labels and confidences (in percent) expected of the model, e.g. those
+  of the last release.  Optional.
+- throws: True if the model is expected to reject the event.  Optional.
+
+The events are found under a data directory laid out like the harvester's and are classified in batches, optionally by
+several worker processes.  The results are compared to the true labels in confusion matrices with per-label accuracy,
+and to the expected predictions by their agreement and the change in confidence.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.evaluation import evaluate, read_test_set
+
+    evaluation = evaluate(read_test_set('tests/test_set.txt'), '/usr/opsdata/waveforms/data/rf', jobs=4)
+    print(evaluation)
+"""
+import os
+import csv
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def read_test_set(path: str) -> List[Dict[str, Any]]:
+    """Reads the labeled events of a test set file.
+
+    Args:
+        path: The tab separated test set file
+
+    Returns:
+        list: A dictionary per event with its 'zone', 'timestamp' (YYYY-MM-DD hh:mm:ss[.S]), true 'cavity-label' and
+        'fault-label' in the format of the model's results, 'throws', and 'expected', which holds the expected result's
+        labels and confidences (0-1), or is None if the file has no expected predictions.
+
+    Raises:
+        ValueError: if a required column is missing
+    """
+    with open(path, "r", newline="") as f:
+        lines = [line for line in f if line.strip() != "" and not line.startswith(";")]
+    rows = list(csv.DictReader(lines, delimiter="\t"))
+    if len(rows) > 0:
+        missing = {'zone', 'time', 'cavity', 'fault'}.difference(rows[0].keys())
+        if len(missing) > 0:
+            raise ValueError(f"Test set is missing columns - {', '.join(sorted(missing))}")
+
+    events = []
+    for row in rows:
+        expected = None
+        if row.get('cav_pred') is not None and row.get('fault_pred') is not None:
+            expected = {
+                'cavity-label': _to_cavity_label(row['cav_pred']),
+                'cavity-confidence': float(row['cav_conf']) / 100,
+                'fault-label': row['fault_pred'],
+                'fault-confidence': float(row['fault_conf']) / 100,
+            }
+        events.append({
+            'zone': row['zone'],
+            'timestamp': row['time'].replace("/", "-"),
+            'cavity-label': _to_cavity_label(row['cavity']),
+            'fault-label': row['fault'],
+            'throws': row.get('throws', 'False').strip().lower() == 'true',
+            'expected': expected,
+        })
+    return events
+
+
+def _to_cavity_label(value: str) -> str:
+    """Converts a test set's cavity number to the cavity label of results.  0 is 'multiple'."""
+    return 'multiple' if value.strip() in ('0', '0.0') else str(int(float(value)))
+
+
+def find_event_dir(data_root: str, zone: str, timestamp: str) -> Optional[str]:
+    """Finds the directory of an event under a harvester data directory.
+
+    Args:
+        data_root: The directory holding the zone directories
+        zone: The event's zone
+        timestamp: The event's time as YYYY-MM-DD hh:mm:ss[.S].  Any tenths of a second match if they are left off.
+
+    Returns:
+        The absolute path of the event directory, or None if there isn't one
+    """
+    date, clock = timestamp.split(" ")
+    date_dir = os.path.join(os.path.abspath(data_root), zone, date.replace("-", "_"))
+    hhmmss, _, tenths = clock.replace(":", "").partition(".")
+    if tenths != "":
+        path = os.path.join(date_dir, f"{hhmmss}.{tenths[0]}")
+        return path if os.path.isdir(path) else None
+    try:
+        names = sorted(name for name in os.listdir(date_dir) if name.startswith(f"{hhmmss}."))
+    except OSError:
+        return None
+    return os.path.join(date_dir, names[0]) if len(names) > 0 else None
+
+
+class ConfusionMatrix:
+    """Counts the predicted labels of each true label."""
+
+    def __init__(self):
+        self.counts: Dict[Tuple[str, str], int] = {}
+
+    def add(self, true: str, predicted: str) -> None:
+        """Counts a prediction."""
+        self.counts[(true, predicted)] = self.counts.get((true, predicted), 0) + 1
+
+    def get_labels(self) -> List[str]:
+        """Returns every true and predicted label, sorted."""
+        return sorted({label for pair in self.counts for label in pair})
+
+    def get_accuracy(self) -> Optional[float]:
+        """Returns the fraction of predictions that are correct, or None if there are none."""
+        total = sum(self.counts.values())
+        if total == 0:
+            return None
+        return sum(count for (true, predicted), count in self.counts.items() if true == predicted) / total
+
+    def get_label_accuracy(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the number of events and the fraction predicted correctly of each true label."""
+        totals: Dict[str, int] = {}
+        correct: Dict[str, int] = {}
+        for (true, predicted), count in self.counts.items():
+            totals[true] = totals.get(true, 0) + count
+            correct[true] = correct.get(true, 0) + (count if true == predicted else 0)
+        return {label: {'events': totals[label], 'accuracy': correct[label] / totals[label]}
+                for label in sorted(totals)}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the labels and the rows of counts, one row per true label and one column per predicted label."""
+        labels = self.get_labels()
+        return {'labels': labels, 'counts': [[self.counts.get((true, predicted), 0) for predicted in labels]
+                                             for true in labels]}
+
+    def __str__(self) -> str:
+        labels = self.get_labels()
+        width = max([len(label) for label in labels] + [6])
+        lines = [f"{'true':{width}s}  " + "  ".join(f"{label:>{width}s}" for label in labels)]
+        for true in labels:
+            lines.append(f"{true:{width}s}  " + "  ".join(f"{self.counts.get((true, predicted), 0):{width}d}"
+                                                         for predicted in labels))
+        return "\n".join(lines)
+
+
+class Evaluation:
+    """The results of classifying a labeled test set.  See evaluate."""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        """The labeled events with the model's 'result' for each."""
+        self.cavity = ConfusionMatrix()
+        self.fault = ConfusionMatrix()
+        self.seconds: float = 0.0
+        """The time taken to classify the events, including loading the model."""
+
+    def add(self, event: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Records the model's result for a labeled event.  Events the model rejects are left out of the matrices."""
+        self.events.append(dict(event, result=result))
+        if 'error' not in result:
+            self.cavity.add(event['cavity-label'], result['cavity-label'])
+            self.fault.add(event['fault-label'], result['fault-label'])
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Summarizes the evaluation.
+
+        Returns:
+            dict: The number of events, those rejected as expected ('expected-errors') and not ('unexpected-errors'),
+            those that should have been rejected but were not ('missed-errors'), the cavity and fault accuracy with
+            per-label accuracy, the agreement with the expected labels, the mean and max absolute change from the
+            expected confidences of the events whose labels agree, and the total seconds and milliseconds per event.
+        """
+        summary: Dict[str, Any] = {'events': len(self.events)}
+        errors = [('error' in event['result'], event['throws']) for event in self.events]
+        summary['expected-errors'] = sum(1 for error, throws in errors if error and throws)
+        summary['unexpected-errors'] = sum(1 for error, throws in errors if error and not throws)
+        summary['missed-errors'] = sum(1 for error, throws in errors if throws and not error)
+
+        for name, matrix in (('cavity', self.cavity), ('fault', self.fault)):
+            summary[f"{name}-accuracy"] = matrix.get_accuracy()
+            summary[f"{name}-label-accuracy"] = matrix.get_label_accuracy()
+
+        compared = [event for event in self.events if event['expected'] is not None and not event['throws'] and
+                    'error' not in event['result']]
+        for name in ('cavity', 'fault'):
+            agree = [event for event in compared
+                     if event['result'][f"{name}-label"] == event['expected'][f"{name}-label"]]
+            drift = [abs(event['result'][f"{name}-confidence"] - event['expected'][f"{name}-confidence"])
+                     for event in agree]
+            summary[f"{name}-agreement"] = len(agree) / len(compared) if len(compared) > 0 else None
+            summary[f"{name}-confidence-drift-mean"] = sum(drift) / len(drift) if len(drift) > 0 else None
+            summary[f"{name}-confidence-drift-max"] = max(drift) if len(drift) > 0 else None
+
+        summary['seconds'] = self.seconds
+        summary['ms-per-event'] = 1000 * self.seconds / len(self.events) if len(self.events) > 0 else None
+        return summary
+
+    def __str__(self) -> str:
+        summary = self.get_summary()
+        lines = [f"Evaluated {summary['events']} events in {summary['seconds']:.1f} s"
+                 + (f" ({summary['ms-per-event']:.1f} ms per event)" if summary['ms-per-event'] is not None else ""),
+                 f"Errors: {summary['expected-errors']} expected, {summary['unexpected-errors']} unexpected, "
+                 f"{summary['missed-errors']} missed"]
+        for name, matrix in (('cavity', self.cavity), ('fault', self.fault)):
+            if summary[f"{name}-accuracy"] is None:
+                continue
+            lines.append("")
+            lines.append(f"{name.capitalize()} accuracy: {summary[f'{name}-accuracy']:.1%}")
+            for label, stats in summary[f"{name}-label-accuracy"].items():
+                lines.append(f"  {label:20s} {stats['accuracy']:7.1%} of {stats['events']}")
+            lines.append(str(matrix))
+            if summary[f"{name}-agreement"] is not None:
+                lines.append(f"Agreement with expected {name} labels: {summary[f'{name}-agreement']:.1%}")
+            if summary[f"{name}-confidence-drift-mean"] is not None:
+                lines.append(f"Change from expected {name} confidence: mean "
+                             f"{summary[f'{name}-confidence-drift-mean']:.4f}, max "
+                             f"{summary[f'{name}-confidence-drift-max']:.4f}")
+        return "\n".join(lines)
+
+
+def evaluate(events: Iterable[Dict[str, Any]], data_root: str, batch_size: int = 16, jobs: int = 1,
+             model_kwargs: Optional[Dict[str, Any]] = None) -> Evaluation:
+    """Classifies labeled events and compares the results to their labels.
+
+    Args:
+        events: The labeled events.  See read_test_set.
+        data_root: The directory holding the events' zone directories
+        batch_size: The number of events the model analyzes together
+        jobs: The number of worker processes used to analyze the events
+        model_kwargs: Extra keyword arguments given to the Model, e.g. a mode_lookup or feature_cache
+
+    Returns:
+        The evaluation
+    """
+    from .main import run_model
+
+    events = list(events)
+    paths = [find_event_dir(data_root, event['zone'], event['timestamp']) for event in events]
+
+    evaluation = Evaluation()
+    start = time.perf_counter()
+    results = iter(run_model([path for path in paths if path is not None], batch_size=batch_size, jobs=jobs,
+                             model_kwargs=model_kwargs)['data'])
+    for event, path in zip(events, paths):
+        if path is None:
+            result = {'error': "Event directory not found", 'location': event['zone'],
+                      'timestamp': event['timestamp']}
+        else:
+            result = next(results)
+        evaluation.add(event, result)
+    evaluation.seconds = time.perf_counter() - start
+    return evaluation
@@ -0,0 +1,264 @@
+"""This module writes results as typed columns, in chunks as they arrive, for loading into analysis notebooks.
+
+-o json builds one document of every result before printing it, and neither it nor the table is quick to load back in
+once there are tens of thousands of results.  The writers here take the results a chunk at a time and write them with a
+fixed set of typed columns: location, timestamp, cavity_label, cavity_confidence, fault_label, fault_confidence, model,
+and error.  Missing values are empty (CSV), null (Parquet), or NaN, NaT, and "" (NumPy).
+
+* CSV is written with the csv module and needs nothing more.
+* Parquet is written one row group per chunk with pyarrow, which is an optional dependency (pip install
+  rf_classifier[parquet]).  Load it with pandas.read_parquet or pyarrow.parquet.read_table.
+* NPY is a NumPy structured array with fixed width strings.  The header is rewritten with the final row count when the
+  writer is closed, so the file can be loaded, or memory mapped, with numpy.load.  Errors longer than the error column
+  are cut short.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.export import open_writer, write_results
+    from rf_classifier.main import iter_run_model
+
+    with open_writer('parquet', 'results.parquet') as writer:
+        write_results(iter_run_model(paths, jobs=8), writer)
+
+    df = pandas.read_parquet('results.parquet')
+"""
+import io
+import os
+import csv
+import sys
+import itertools
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+columns: List[Tuple[str, str]] = [
+    ('location', 'U8'),
+    ('timestamp', 'datetime64[ms]'),
+    ('cavity_label', 'U16'),
+    ('cavity_confidence', 'float64'),
+    ('fault_label', 'U32'),
+    ('fault_confidence', 'float64'),
+    ('model', 'U32'),
+    ('error', 'U200'),
+]
+"""The columns written and their NumPy types.  Each comes from the result key of the same name with - for _."""
+
+formats = ['csv', 'parquet', 'npy']
+"""The supported output formats."""
+
+
+def _get_values(results: List[Dict[str, Any]], column: str) -> List[Any]:
+    """Returns a column's values, with None for results that do not have it."""
+    key = column.replace('_', '-')
+    return [result.get(key) for result in results]
+
+
+def to_arrays(results: List[Dict[str, Any]]) -> Dict[str, 'np.ndarray']:
+    """Converts results to a typed NumPy array per column.  See columns.
+
+    Missing confidences are NaN, missing timestamps NaT, and missing strings empty.
+    """
+    import numpy as np
+
+    arrays = {}
+    for name, dtype in columns:
+        values = _get_values(results, name)
+        if dtype.startswith('datetime64'):
+            # The results' timestamps have a space between the date and time.  NumPy wants a T.
+            values = ['NaT' if value is None else value.replace(' ', 'T') for value in values]
+        elif dtype == 'float64':
+            values = [np.nan if value is None else value for value in values]
+        else:
+            values = ['' if value is None else value for value in values]
+        arrays[name] = np.array(values, dtype=dtype) if len(values) > 0 else np.empty(0, dtype=dtype)
+    return arrays
+
+
+class ResultWriter:
+    """Writes chunks of results to a file.  Subclasses write a format."""
+
+    def __init__(self):
+        self.rows: int = 0
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        """Writes a chunk of results."""
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Finishes the file."""
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CsvWriter(ResultWriter):
+    """Writes results as CSV with a header line.  Floats are written in full."""
+
+    def __init__(self, file: IO[str]):
+        """Create a CsvWriter.
+
+        Args:
+            file: The text file to write to.  It is not closed by the writer.
+        """
+        super().__init__()
+        self.file = file
+        self.writer = csv.writer(file, lineterminator='\n')
+        self.writer.writerow([name for name, dtype in columns])
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        self.writer.writerows(('' if value is None else value for value in row)
+                              for row in zip(*(_get_values(results, name) for name, dtype in columns)))
+        self.file.flush()
+        self.rows += len(results)
+
+
+class ParquetWriter(ResultWriter):
+    """Writes results to a Parquet file, a row group per chunk.  Needs pyarrow."""
+
+    def __init__(self, path: str):
+        """Create a ParquetWriter.
+
+        Args:
+            path: The Parquet file to write
+
+        Raises:
+            ImportError: if pyarrow is not installed
+        """
+        super().__init__()
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as ex:
+            raise ImportError("Writing Parquet needs pyarrow.  Install it with pip install rf_classifier[parquet]") \
+                from ex
+
+        self._pa = pa
+        types = {'U': pa.string(), 'd': pa.timestamp('ms'), 'f': pa.float64()}
+        self.schema = pa.schema([(name, types[dtype[0]]) for name, dtype in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        if len(results) == 0:
+            return
+        import numpy as np
+
+        arrays = to_arrays(results)
+        # Missing values are null rather than NaN, NaT, or ""
+        data = [self._pa.array(arrays[name], type=field.type,
+                               mask=np.array([value is None for value in _get_values(results, name)], dtype=bool))
+                for name, field in zip(self.schema.names, self.schema)]
+        self.writer.write_table(self._pa.Table.from_arrays(data, schema=self.schema))
+        self.rows += len(results)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class NpyWriter(ResultWriter):
+    """Writes results as a NumPy structured array in a .npy file."""
+
+    header_size = 512
+    """The bytes kept for the .npy header, so it can be rewritten with the row count without moving the data."""
+
+    def __init__(self, path: str):
+        """Create a NpyWriter.
+
+        Args:
+            path: The .npy file to write
+        """
+        import numpy as np
+
+        super().__init__()
+        self.dtype = np.dtype(columns)
+        self.file = open(path, 'wb')
+        self._write_header()
+
+    def _write_header(self) -> None:
+        """Writes the .npy header for the rows written so far at the start of the file."""
+        import numpy as np
+
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {'descr': np.lib.format.dtype_to_descr(self.dtype),
+                                                      'fortran_order': False, 'shape': (self.rows,)})
+        header = header.getvalue()
+        # Pad the header out to the same size every time.  It must end with a newline.
+        padded = header[:-1] + b' ' * (self.header_size - len(header)) + b'\n'
+        padded = padded[:8] + (len(padded) - 10).to_bytes(2, 'little') + padded[10:]
+        self.file.seek(0)
+        self.file.write(padded)
+
+    def write(self, results: List[Dict[str, Any]]) -> None:
+        import numpy as np
+
+        arrays = to_arrays(results)
+        chunk = np.empty(len(results), dtype=self.dtype)
+        for name, dtype in columns:
+            chunk[name] = arrays[name]
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(chunk.tobytes())
+        self.rows += len(results)
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self._write_header()
+        self.file.close()
+
+
+class _ClosingCsvWriter(CsvWriter):
+    """A CsvWriter that opens its file and closes it when done."""
+
+    def __init__(self, path: str):
+        super().__init__(open(path, 'w', newline=''))
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def open_writer(output_format: str, path: Optional[str] = None) -> ResultWriter:
+    """Creates a writer for a format.
+
+    Args:
+        output_format: One of formats
+        path: The file to write.  CSV is written to standard out if None.  The other formats need a file.
+
+    Raises:
+        ValueError: if the format is unknown or needs a file that was not given
+    """
+    if output_format not in formats:
+        raise ValueError(f"Unknown output format - {output_format}")
+    if output_format == 'csv':
+        if path is None or path == '-':
+            return CsvWriter(sys.stdout)
+        return _ClosingCsvWriter(path)
+    if path is None or path == '-':
+        raise ValueError(f"The {output_format} format must be written to a file")
+    if output_format == 'parquet':
+        return ParquetWriter(path)
+    return NpyWriter(path)
+
+
+def write_results(results: Iterable[Dict[str, Any]], writer: ResultWriter, chunk_size: int = 1024) -> int:
+    """Writes the results in chunks as they arrive.
+
+    Args:
+        results: The result dictionaries.  Any iterable, including a generator, will do.
+        writer: The writer the chunks are given to.  It is not closed.
+        chunk_size: The number of results written at a time
+
+    Returns:
+        The number of results written
+    """
+    results = iter(results)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(results, chunk_size))
+        if len(chunk) == 0:
+            return count
+        writer.write(chunk)
+        count += len(chunk)
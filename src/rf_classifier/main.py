@@ -1,4 +1,6 @@
 import os
+import time
+import atexit
 import argparse
 from typing import Dict, Any
 
@@ -15,34 +17,85 @@ version = "2.0.0"
 """Application version string"""
 
 
-def run_model(events):
-    """Runs the embedded model with the supplied arguments.
+def iter_run_model(events, batch_size=16, jobs=1, model_kwargs=None, stats=None, memory_budget=None, chunk_size=256,
+                   on_chunk=None, share_model=False, store=None):
+    """Runs the embedded model over the events, yielding each result as soon as it is available.
 
     Args:
-        events (list:str): The arguments to be passed to the model.  Should be valid paths to event directories.
+        events (iterable:str): Paths to the event directories.  Any iterable, including a generator, will do.
+        batch_size (int): The number of events the model analyzes together.  The inputs of a batch are stacked and given
+            to the ONNX models together.
+        jobs (int): The number of worker processes used to analyze the events.  Events are analyzed in this process
+            if 1.
+        model_kwargs (dict): Extra keyword arguments given to the Model, e.g. a feature_cache.
+        stats (dict): The model's stats are added to this dictionary if given.  See Model.get_stats.
+        memory_budget (float): Run as a backfill that keeps this process and its workers within this many megabytes,
+            lowering jobs and batch_size if needed.  See the backfill module.
+        chunk_size (int): The number of events in each chunk of a backfill.
+        on_chunk (callable): Called with a report of each chunk of a backfill.  See backfill.iter_backfill.
+        share_model (bool): Load the model once in this process and fork the worker processes from it so that they
+            share its memory.  See the parallel module.
+        store (ResultStore): Save the results to this store as they are made.  Use its iter_missing to skip the events
+            it already has results for.  See the store module.
     Returns:
-        dict|None:  Returns dictionary of results representing the JSON out of the model or None if there was a
-            problem during execution.
+        iterator:  An iterator over the result dictionaries in the same order as events.
     """
 
+    if store is not None:
+        yield from store.iter_store(iter_run_model(events, batch_size=batch_size, jobs=jobs, model_kwargs=model_kwargs,
+                                                   stats=stats, memory_budget=memory_budget, chunk_size=chunk_size,
+                                                   on_chunk=on_chunk, share_model=share_model))
+        if stats is not None:
+            from .utils import add_stats
+            add_stats(stats, {'store': store.stats})
+        return
+
+    if memory_budget is not None:
+        from .backfill import iter_backfill
+        yield from iter_backfill(events, memory_budget=memory_budget, batch_size=batch_size, jobs=jobs,
+                                 chunk_size=chunk_size, model_kwargs=model_kwargs, stats=stats, on_chunk=on_chunk,
+                                 share_model=share_model)
+        return
+
+    if jobs > 1:
+        from .parallel import iter_run_model_parallel
+        yield from iter_run_model_parallel(events, jobs=jobs, batch_size=batch_size, model_kwargs=model_kwargs,
+                                           stats=stats, share_model=share_model)
+        return
+
     # This takes a little while to import as it relies on some heavy duty packages (e.g., numpy).  Only load it here
     # so help calls, etc. are very snappy.
     from .model.model import Model
 
-    results = []
-    model = Model()
-    for i in range(len(events)):
-        try:
-            model.update_example(events[i])
-            results.append(model.analyze())
-        except Exception as ex:
-            results.append({
-                # ex[1] is the exception message
-                'error': f"{ex}",
-                'location': model.zone_name,
-                'timestamp': model.fault_time
-            })
-    return {'data': results}
+    # Problems with individual events are reported as error results
+    model = Model(**(model_kwargs or {}))
+    yield from model.iter_analyze(events, batch_size=batch_size)
+    if stats is not None:
+        from .utils import add_stats
+        add_stats(stats, model.get_stats())
+
+
+def run_model(events, batch_size=16, jobs=1, model_kwargs=None, stats=None, memory_budget=None, chunk_size=256,
+              share_model=False, store=None):
+    """Runs the embedded model with the supplied arguments.
+
+    Args:
+        events (list:str): The arguments to be passed to the model.  Should be valid paths to event directories.
+        batch_size (int): The number of events the model analyzes together.
+        jobs (int): The number of worker processes used to analyze the events.
+        model_kwargs (dict): Extra keyword arguments given to the Model, e.g. a feature_cache.
+        stats (dict): The model's stats are added to this dictionary if given.  See Model.get_stats.
+        memory_budget (float): Run as a backfill within this many megabytes.  See iter_run_model.
+        chunk_size (int): The number of events in each chunk of a backfill.
+        share_model (bool): Fork the worker processes from a model loaded in this process.  See iter_run_model.
+        store (ResultStore): Save the results to this store.  See iter_run_model.
+    Returns:
+        dict|None:  Returns dictionary of results representing the JSON out of the model or None if there was a
+            problem during execution.
+    """
+    return {'data': list(iter_run_model(events, batch_size=batch_size, jobs=jobs, model_kwargs=model_kwargs,
+                                        stats=stats, memory_budget=memory_budget, chunk_size=chunk_size,
+                                        share_model=share_model, store=store))}
 
 
 def print_results_table(results: Dict[str, Any], header=True):
@@ -105,41 +158,371 @@ def print_results_table(results: Dict[str, Any], header=True):
             ))
 
 
+def print_stats(stats):
+    """Prints the model's stats to standard error, one line per counter type.  Nothing is printed if stats is None."""
+    if stats is None:
+        return
+    for value in stats.values():
+        print(value, file=sys.stderr)
+
+
+def _report_stats(args, stats):
+    """Prints the model's stats if --stats was given and writes them to the --metrics-file if there is one."""
+    if stats is None:
+        return
+    if args.stats:
+        print_stats(stats)
+    if args.metrics_file is not None:
+        from .model.metrics import write_metrics
+        write_metrics(args.metrics_file, stats, args.metrics_format)
+
+
+def _print_chunk(report):
+    """Prints a backfill chunk's report to standard error."""
+    python = f", Python peak {report['peak-python-mb']:.1f} MB" if report['peak-python-mb'] is not None else ""
+    print(f"Chunk {report['chunk']}: {report['events']} events in {report['seconds']:.1f} s with {report['jobs']} jobs"
+          f" and batch size {report['batch-size']}, peak PSS {report['peak-rss-mb']:.1f} MB{python}", file=sys.stderr)
+
+
+def _positive_int(value: str) -> int:
+    """Argument type for options that require an integer greater than zero."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer - {value}")
+    return number
+
+
+def _non_negative_int(value: str) -> int:
+    """Argument type for options that require an integer of zero or more."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer - {value}")
+    return number
+
+
+def _datetime(value: str):
+    """Argument type for times given as YYYY-MM-DD[ hh:mm[:ss[.S]]].  A T may separate the date and time."""
+    from datetime import datetime
+    value = value.strip().replace("T", " ")
+    for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"must be formatted YYYY-MM-DD[ hh:mm[:ss[.S]]] - {value}")
+
+
+def _iter_events(args):
+    """Yields the event paths given on the command line, then those listed in --from-file, then those found by --root.
+
+    Nothing is read ahead, so analysis starts with the first path and paths can be piped in as they are produced.
+    """
+    yield from args.events
+    if args.from_file is not None:
+        f = sys.stdin if args.from_file == "-" else open(args.from_file, "r")
+        try:
+            for line in f:
+                line = line.strip()
+                if line != "" and not line.startswith("#"):
+                    yield line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    if args.root is not None:
+        from .utils import find_events
+        yield from find_events(args.root, zones=args.zones, since=args.since, until=args.until)
+
+
+def _make_session_config(args):
+    """Creates the SessionConfig described by the ONNX session options on the command line."""
+    from .model.sessions import SessionConfig
+    return SessionConfig(intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads,
+                         optimization_level=args.graph_optimization, execution_mode=args.execution_mode,
+                         optimized_model_dir=args.optimized_model_dir, warm_up=args.warm_up)
+
+
+def _make_feature_cache(args):
+    """Creates the FeatureCache described by --cache-dir and --cache-size, or None if there is no --cache-dir."""
+    if args.cache_dir is None:
+        return None
+    from .model.cache import FeatureCache
+    return FeatureCache(args.cache_dir, max_bytes=args.cache_size * 2 ** 20)
+
+
 def main():
     """The main function.  Run argument parsing, make predictions, and present results."""
+    started = time.perf_counter()
     parser = argparse.ArgumentParser(
         description=f"{name} v{version}: A program that determines the fault type and offending cavity based on a"
                     " waveform data from a C100 fault event", epilog="Pluggable models are no longer available.")
+    parser.add_argument("--startup-profile", help="Print the time spent importing packages to standard error on exit",
+                        default=False, dest='startup_profile', action='store_true')
     subparsers = parser.add_subparsers(help='commands', dest='subparser_name')
+
+    # The commands that run the model share the settings of its ONNX Runtime sessions
+    session_parser = argparse.ArgumentParser(add_help=False)
+    session_options = session_parser.add_argument_group("ONNX Runtime session options")
+    session_options.add_argument("--intra-op-threads", help="The number of threads used within an operator (default:"
+                                                            " ONNX Runtime's choice, 1 per worker with -j)",
+                                 default=None, type=_positive_int, dest='intra_op_threads')
+    session_options.add_argument("--inter-op-threads", help="The number of threads used across operators with"
+                                                            " --execution-mode=parallel (default: ONNX Runtime's"
+                                                            " choice, 1 per worker with -j)",
+                                 default=None, type=_positive_int, dest='inter_op_threads')
+    session_options.add_argument("--graph-optimization", help="The graph optimization level (default: all)",
+                                 default='all', choices=['disable', 'basic', 'extended', 'all'],
+                                 dest='graph_optimization')
+    session_options.add_argument("--execution-mode", help="Run operators one at a time or in parallel (default:"
+                                                          " sequential)",
+                                 default='sequential', choices=['sequential', 'parallel'], dest='execution_mode')
+    session_options.add_argument("--optimized-model-dir", help="Save the optimized models in this directory and load"
+                                                               " them from there next time",
+                                 default=None, dest='optimized_model_dir')
+    session_options.add_argument("--warm-up", help="Run the models once on dummy input before the first event",
+                                 default=False, action='store_true', dest='warm_up')
+    session_options.add_argument("--precision", help="Run the float32 models or their quantized INT8 versions"
+                                                     " (default: fp32)",
+                                 default='fp32', choices=['fp32', 'int8'], dest='precision')
+
+    # The commands that analyze events in bulk can time each stage and export their counters
+    metrics_parser = argparse.ArgumentParser(add_help=False)
+    metrics_options = metrics_parser.add_argument_group("Instrumentation options")
+    metrics_options.add_argument("--timings", help="Add the seconds spent in each stage and the bytes read to each"
+                                                   " result", default=False, action='store_true', dest='timings')
+    metrics_options.add_argument("--metrics-file", help="Write the counters and stage timing histograms to this file",
+                                 default=None, dest='metrics_file')
+    metrics_options.add_argument("--metrics-format", help="The format of --metrics-file (default: json if it ends in"
+                                                          " .json, else prometheus)",
+                                 default=None, choices=['prometheus', 'json'], dest='metrics_format')
+
     describe_model = subparsers.add_parser('describe', help='Describe the embedded model')
     describe_model.add_argument('-v', '--verbose', action='store_true', help='Print verbose model info')
-    analyze = subparsers.add_parser("analyze", help='Analyze a fault event')
-    analyze.add_argument("-o", "--output", help="Specify the output format (default: table)",
+    analyze = subparsers.add_parser("analyze", help='Analyze a fault event', parents=[session_parser, metrics_parser])
+    analyze.add_argument("-o", "--output", help="Specify the output format: table, json, or jsonl, which writes each"
+                                                " result on its own line as soon as it is available.  The csv, parquet,"
+                                                " and npy formats write typed columns in chunks to --output-file"
+                                                " (default: table)",
                          default="table", dest='output')
+    analyze.add_argument("--output-file", help="The file -o csv, parquet, or npy is written to.  CSV is written to"
+                                               " standard out if not given.", default=None, dest='output_file')
     analyze.add_argument("-n", "--no-header", help="Do not include a header in the output (only for -o=table)",
                          default=False, dest='no_header', action='store_true')
-    analyze.add_argument("events", nargs='+', help="The path to the fault event directory", default=None)
+    analyze.add_argument("-b", "--batch-size", help="The number of events to analyze together (default: 16)",
+                         default=16, type=_positive_int, dest='batch_size')
+    analyze.add_argument("-j", "--jobs", help="The number of worker processes used to analyze events (default: 1)",
+                         default=1, type=_positive_int, dest='jobs')
+    analyze.add_argument("--cache-dir", help="Cache the preprocessed input of events in this directory",
+                         default=None, dest='cache_dir')
+    analyze.add_argument("--cache-size", help="The most megabytes the feature cache may use (default: 1024)",
+                         default=1024, type=_positive_int, dest='cache_size')
+    analyze.add_argument("--mode-archive", help="Read archived cavity modes from this JSON file instead of the"
+                                                " archiver, e.g. for offline runs", default=None, dest='mode_archive')
+    analyze.add_argument("--stats", help="Print capture file read, feature cache, and cavity mode lookup counts to"
+                                         " standard error",
+                         default=False, dest='stats', action='store_true')
+    analyze.add_argument("--memory-budget", help="Run as a backfill that keeps this process and its workers under"
+                                                 " this many megabytes by analyzing events in chunks and lowering -j"
+                                                 " and -b as needed.  Use with -o jsonl to keep memory flat.",
+                         default=None, type=_positive_int, dest='memory_budget')
+    analyze.add_argument("--chunk-size", help="The number of events in each chunk of a backfill (default: 256)",
+                         default=256, type=_positive_int, dest='chunk_size')
+    analyze.add_argument("--store", help="Save the results to this SQLite database, keyed by zone, timestamp, and"
+                                         " model", default=None, dest='store')
+    analyze.add_argument("--skip-existing", help="Skip the events that already have results from this model version"
+                                                 " in --store", default=False, dest='skip_existing',
+                         action='store_true')
+    analyze.add_argument("--share-model", help="Load the models once and fork the -j worker processes from this"
+                                               " process so that they share its memory (Linux and macOS only)",
+                         default=False, dest='share_model', action='store_true')
+    analyze.add_argument("--prefetch", help="Load and preprocess up to this many events ahead of the batch being"
+                                            " classified on --io-threads threads.  Only applies with -j 1."
+                                            " (default: 0)",
+                         default=0, type=_non_negative_int, dest='prefetch')
+    analyze.add_argument("--io-threads", help="The number of threads that load events with --prefetch (default: 2)",
+                         default=2, type=_positive_int, dest='io_threads')
+    analyze.add_argument("--read-threads", help="The most capture files of an event read at once (default: 8)",
+                         default=8, type=_positive_int, dest='read_threads')
+    analyze.add_argument("--server", help="Forward the request to the classification server when it is running",
+                         default=False, dest='server', action='store_true')
+    analyze.add_argument("--server-port", help="The port of the classification server (default: 8350)",
+                         default=None, type=_positive_int, dest='server_port')
+    analyze.add_argument("--from-file", help="Also analyze the event paths listed one per line in this file, or"
+                                             " standard in if -", default=None, dest='from_file')
+    analyze.add_argument("--root", help="Also analyze the events found under this harvester data directory, e.g."
+                                        " /usr/opsdata/waveforms/data/rf", default=None, dest='root')
+    analyze.add_argument("-z", "--zone", help="Only find events in this zone under --root.  May be given more than"
+                                              " once.", default=None, action='append', dest='zones')
+    analyze.add_argument("--since", help="Only find events at or after this time under --root, e.g. 2023-02-01 or"
+                                         " '2023-02-01 21:00'", default=None, type=_datetime, dest='since')
+    analyze.add_argument("--until", help="Only find events before this time under --root",
+                         default=None, type=_datetime, dest='until')
+    analyze.add_argument("events", nargs='*', help="The path to the fault event directory", default=None)
+    serve = subparsers.add_parser("serve", help='Keep the model loaded and analyze fault events sent over HTTP',
+                                  parents=[session_parser])
+    serve.add_argument("-p", "--port", help="The local port to listen on (default: 8350)",
+                       default=None, type=_positive_int, dest='port')
+    serve.add_argument("-b", "--batch-size", help="The number of events to analyze together (default: 16)",
+                       default=16, type=_positive_int, dest='batch_size')
+    watch = subparsers.add_parser("watch", help='Classify new fault events as the harvester writes them',
+                                  parents=[session_parser, metrics_parser])
+    watch.add_argument("-o", "--output", help="The JSON lines file results are appended to (default: standard out)",
+                       default="-", dest='output')
+    watch.add_argument("-c", "--checkpoint", help="The file that records progress (default: <output>.checkpoint)",
+                       default=None, dest='checkpoint')
+    watch.add_argument("-z", "--zone", help="Only watch this zone.  May be given more than once.",
+                       default=None, action='append', dest='zones')
+    watch.add_argument("--poll-interval", help="Seconds between scans of the data directory (default: 1.0)",
+                       default=1.0, type=float, dest='poll_interval')
+    watch.add_argument("--settle", help="Seconds a complete event must be unchanged before analysis (default: 1.0)",
+                       default=1.0, type=float, dest='settle')
+    watch.add_argument("--timeout", help="Seconds before an incomplete event is analyzed anyway (default: 60.0)",
+                       default=60.0, type=float, dest='timeout')
+    watch.add_argument("--include-existing", help="Analyze events already on disk when there is no checkpoint",
+                       default=False, action='store_true', dest='include_existing')
+    watch.add_argument("data_root", help="The harvester data directory containing the zone directories")
+    quantize = subparsers.add_parser("quantize", help='Write INT8 versions of the models for use with --precision')
+    quantize.add_argument("--output-dir", help="The directory the quantized models are written to (default: the"
+                                               " package's model_files directory)",
+                          default=None, dest='output_dir')
+    quantize.add_argument("--weight-type", help="The type of the quantized weights (default: uint8)",
+                          default='uint8', choices=['uint8', 'int8'], dest='weight_type')
+    compare = subparsers.add_parser("compare-precision", help='Compare the INT8 models to the float32 models on a set'
+                                                              ' of events', parents=[session_parser])
+    compare.add_argument("-o", "--output", help="Specify the output format: table or json, which includes each"
+                                                " event's results and times (default: table)",
+                         default="table", choices=['table', 'json'], dest='output')
+    compare.add_argument("--mode-archive", help="Read archived cavity modes from this JSON file instead of the"
+                                                " archiver, e.g. for offline runs", default=None, dest='mode_archive')
+    compare.add_argument("events", nargs='+', help="The paths to the fault event directories")
+    evaluate = subparsers.add_parser("evaluate", help='Score the model against a labeled test set',
+                                     parents=[session_parser])
+    evaluate.add_argument("-o", "--output", help="Specify the output format: table or json, which includes each"
+                                                 " event's result (default: table)",
+                          default="table", choices=['table', 'json'], dest='output')
+    evaluate.add_argument("--data-root", help="The directory holding the events' zone directories (default: the"
+                                              " waveform browser's)",
+                          default="/usr/opsdata/waveforms/data/rf", dest='data_root')
+    evaluate.add_argument("-b", "--batch-size", help="The number of events to analyze together (default: 16)",
+                          default=16, type=_positive_int, dest='batch_size')
+    evaluate.add_argument("-j", "--jobs", help="The number of worker processes used to analyze events (default: 1)",
+                          default=1, type=_positive_int, dest='jobs')
+    evaluate.add_argument("--cache-dir", help="Cache the preprocessed input of events in this directory",
+                          default=None, dest='cache_dir')
+    evaluate.add_argument("--cache-size", help="The most megabytes the feature cache may use (default: 1024)",
+                          default=1024, type=_positive_int, dest='cache_size')
+    evaluate.add_argument("--mode-archive", help="Read archived cavity modes from this JSON file instead of the"
+                                                 " archiver, e.g. for offline runs", default=None, dest='mode_archive')
+    evaluate.add_argument("test_set", help="The test set file.  See the evaluation module for the format.")
 
     # Parse command line arguments.  Print out the certified name/version if none is specified
     args = parser.parse_args()
 
+    if args.startup_profile:
+        from .startup import ImportProfiler
+        profiler = ImportProfiler(start=started)
+        profiler.install()
+        atexit.register(profiler.print_report)
+
     if args.subparser_name is None:
         print("%s v%s" % (name, version))
         exit(0)
     elif args.subparser_name == 'describe':
-        from .model.model import Model, print_model_description
-        model = Model()
+        # Only the description file is needed.  Don't load the models or their dependencies.
+        from .model.description import print_model_description
         print_model_description(args.verbose)
         exit(0)
     elif args.subparser_name == 'analyze':
+        if len(args.events) == 0 and args.from_file is None and args.root is None:
+            analyze.error("no events given.  Give event paths, --from-file, or --root.")
+        if args.root is None and (args.zones is not None or args.since is not None or args.until is not None):
+            analyze.error("--zone, --since, and --until require --root")
+        if args.skip_existing and args.store is None:
+            analyze.error("--skip-existing requires --store")
+
+        # Open the columnar output first so that a missing file name or package is reported before any work is done
+        writer = None
+        if args.output in ('csv', 'parquet', 'npy'):
+            from .export import open_writer
+            try:
+                writer = open_writer(args.output, args.output_file)
+            except (ValueError, ImportError) as ex:
+                analyze.error(str(ex))
+        events = _iter_events(args)
+
+        store = None
+        if args.store is not None:
+            from .store import ResultStore
+            store = ResultStore(args.store)
+            if args.skip_existing:
+                # Only the description is needed for the model id.  Don't load the models to find it.
+                from .model.description import get_model_id
+                events = store.iter_missing(events, get_model_id(args.precision))
+
+        results = None
+        if args.server:
+            # The client side only needs the standard library.  Fall back to a local run if no server is answering, or
+            # if it runs another model or precision than was asked for.
+            from .model.description import get_model_id
+            from .server import analyze_remote, get_server_model_id, get_server_url
+            url = get_server_url(args.server_port)
+            server_model_id = get_server_model_id(url)
+            if server_model_id is not None and server_model_id != get_model_id(args.precision):
+                print(f"The server at {url} runs {server_model_id}, not {get_model_id(args.precision)}.  Analyzing"
+                      f" locally.", file=sys.stderr)
+            elif server_model_id is not None:
+                try:
+                    results = analyze_remote(list(events), url)
+                except (ConnectionError, RuntimeError) as ex:
+                    print(f"Error: {ex}", file=sys.stderr)
+                    exit(1)
+                if store is not None:
+                    store.put(results['data'])
+
+        stats = {} if (args.stats or args.metrics_file is not None) and results is None else None
+        model_kwargs = {'session_config': _make_session_config(args), 'precision': args.precision,
+                        'timings': args.metrics_file is not None, 'result_timings': args.timings,
+                        'prefetch': args.prefetch, 'io_threads': args.io_threads, 'read_threads': args.read_threads}
+        if args.cache_dir is not None and results is None:
+            model_kwargs['feature_cache'] = _make_feature_cache(args)
+        if args.mode_archive is not None and results is None:
+            from .model.cavity_modes import CavityModeLookup, FileArchive
+            model_kwargs['mode_lookup'] = CavityModeLookup(FileArchive(args.mode_archive))
 
         # Call the appropriate model and get the results
-        results = run_model(args.events)
+        if writer is not None:
+            from .export import write_results
+            if results is None:
+                results = iter_run_model(events, batch_size=args.batch_size, jobs=args.jobs, model_kwargs=model_kwargs,
+                                         stats=stats, memory_budget=args.memory_budget, chunk_size=args.chunk_size,
+                                         on_chunk=_print_chunk if args.stats else None, share_model=args.share_model,
+                                         store=store)
+            else:
+                results = results['data']
+            with writer:
+                write_results(results, writer)
+            _report_stats(args, stats)
+            exit(0)
+        elif results is None and args.output == "jsonl":
+            # Stream the results out instead of collecting them.  Flush so that each line is available downstream.
+            for result in iter_run_model(events, batch_size=args.batch_size, jobs=args.jobs,
+                                         model_kwargs=model_kwargs, stats=stats, memory_budget=args.memory_budget,
+                                         chunk_size=args.chunk_size, on_chunk=_print_chunk if args.stats else None,
+                                         share_model=args.share_model, store=store):
+                print(json.dumps(result), flush=True)
+            _report_stats(args, stats)
+            exit(0)
+        elif results is None:
+            results = run_model(list(events), batch_size=args.batch_size, jobs=args.jobs, model_kwargs=model_kwargs,
+                                stats=stats, memory_budget=args.memory_budget, chunk_size=args.chunk_size,
+                                share_model=args.share_model, store=store)
         # None implies that the model had some sort of a problem
         if results is None:
             exit(1)
         else:
-            if args.output == "json":
+            if args.output == "jsonl":
+                for result in results['data']:
+                    print(json.dumps(result))
+            elif args.output == "json":
                 # # The model does not include it's name on the response.  Add it to each result.
                 # for i in range(0, len(results['data'])):
                 #     results['data'][i]['model'] = cfg['model']
@@ -149,6 +532,60 @@ def main():
                 # If the user doesn't request a support format print out a table
                 # print_results_table(results['data'], cfg, header=(not args.no_header))
                 print_results_table(results['data'], header=(not args.no_header))
+            _report_stats(args, stats)
+        exit(0)
+    elif args.subparser_name == 'serve':
+        from .server import serve
+        serve(port=args.port, batch_size=args.batch_size, session_config=_make_session_config(args),
+              precision=args.precision)
+        exit(0)
+    elif args.subparser_name == 'watch':
+        from .watch import watch
+        watch(args.data_root, output=args.output, checkpoint=args.checkpoint, zones=args.zones,
+              poll_interval=args.poll_interval, settle=args.settle, timeout=args.timeout,
+              include_existing=args.include_existing, session_config=_make_session_config(args),
+              precision=args.precision, result_timings=args.timings, metrics_file=args.metrics_file,
+              metrics_format=args.metrics_format)
+        exit(0)
+    elif args.subparser_name == 'quantize':
+        from .model.quantization import model_dir, quantize_models
+        for path in quantize_models(output_dir=model_dir if args.output_dir is None else args.output_dir,
+                                    weight_type=args.weight_type):
+            print(path)
+        exit(0)
+    elif args.subparser_name == 'compare-precision':
+        from .model.quantization import compare_precisions
+        model_kwargs = {'session_config': _make_session_config(args)}
+        if args.mode_archive is not None:
+            from .model.cavity_modes import CavityModeLookup, FileArchive
+            model_kwargs['mode_lookup'] = CavityModeLookup(FileArchive(args.mode_archive))
+
+        # The --precision option picks the candidate.  It is compared to the float32 models.
+        comparison = compare_precisions([os.path.abspath(event) for event in args.events],
+                                        candidate='int8' if args.precision == 'fp32' else args.precision,
+                                        model_kwargs=model_kwargs)
+        if args.output == "json":
+            print(json.dumps({'summary': comparison.get_summary(), 'events': comparison.events,
+                              'errors': comparison.errors}))
+        else:
+            print(comparison)
+        exit(0)
+    elif args.subparser_name == 'evaluate':
+        from .evaluation import evaluate, read_test_set
+        model_kwargs = {'session_config': _make_session_config(args), 'precision': args.precision}
+        if args.cache_dir is not None:
+            model_kwargs['feature_cache'] = _make_feature_cache(args)
+        if args.mode_archive is not None:
+            from .model.cavity_modes import CavityModeLookup, FileArchive
+            model_kwargs['mode_lookup'] = CavityModeLookup(FileArchive(args.mode_archive))
+
+        evaluation = evaluate(read_test_set(args.test_set), args.data_root, batch_size=args.batch_size,
+                              jobs=args.jobs, model_kwargs=model_kwargs)
+        if args.output == "json":
+            print(json.dumps({'summary': evaluation.get_summary(), 'cavity-confusion': evaluation.cavity.to_dict(),
+                              'fault-confusion': evaluation.fault.to_dict(), 'events': evaluation.events}))
+        else:
+            print(evaluation)
         exit(0)
     else:
         print(f'Unrecognized subcommand "{args.subparser_name}')
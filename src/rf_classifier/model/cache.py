@@ -0,0 +1,187 @@
+"""This module provides an on-disk cache of the preprocessed model input of fault events.
+
+Reading, validating, and preprocessing an event takes far longer than running the models on it.  Events are often
+analyzed more than once, e.g., after a model upgrade or when rerunning a list of events.  The FeatureCache saves each
+event's (4096, 32) float32 model input to its own .npy file and memory maps it back in when the event is seen again.
+
+Entries are keyed by the event's path, the names, sizes, and modification times of its capture files, and the
+preprocessing parameters.  Changing any of them gives a new key, so stale entries are never used.  They simply age out.
+The cache is kept under a size cap by evicting the least recently used entries, judged by their modification times.
+Several processes may share a cache directory.
+
+Only the input of events that passed validation is cached, so a cache hit goes straight to inference.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.model import Model
+    from rf_classifier.model.cache import FeatureCache
+
+    model = Model(feature_cache=FeatureCache('/tmp/rf_classifier_cache', max_bytes=2**30))
+"""
+import os
+import json
+import uuid
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+from . import preprocessing
+from .reader import capture_file_regex
+
+cache_format_version = 1
+"""Part of every key.  Bump it when the meaning of the cached arrays changes."""
+
+
+class CacheStats:
+    """Counts the hits, misses, stores, and evictions of a FeatureCache."""
+
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stores: int = 0
+        self.evictions: int = 0
+
+    def add(self, other: 'CacheStats') -> None:
+        """Adds the counts of another CacheStats to this one."""
+        self.hits += other.hits
+        self.misses += other.misses
+        self.stores += other.stores
+        self.evictions += other.evictions
+
+    def __str__(self) -> str:
+        return (f"Feature cache: {self.hits} hits, {self.misses} misses, {self.stores} stored, "
+                f"{self.evictions} evicted")
+
+
+class FeatureCache:
+    """Stores the model input of events as memory mapped .npy files with a size cap and LRU eviction.
+
+    A FeatureCache is not thread safe.  Use copy() to give each thread its own.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 ** 30):
+        """Create a FeatureCache.  The directory is created if needed.
+
+        Args:
+            cache_dir: The directory the cache entries are kept in
+            max_bytes: The most bytes of entries to keep.  The least recently used entries are removed past this.
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def copy(self) -> 'FeatureCache':
+        """Creates a FeatureCache using the same directory and size cap with its own stats."""
+        return FeatureCache(self.cache_dir, max_bytes=self.max_bytes)
+
+    @staticmethod
+    def make_key(event_path: str) -> Optional[str]:
+        """Makes the cache key of an uncompressed event directory.
+
+        Returns:
+            The key or None if the event is not a directory of capture files.
+        """
+        files = []
+        try:
+            with os.scandir(event_path) as it:
+                for entry in it:
+                    if capture_file_regex.match(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if len(files) == 0:
+            return None
+
+        key = {
+            'version': cache_format_version,
+            'path': os.path.abspath(event_path),
+            'files': sorted(files),
+            'signals': preprocessing.signals,
+            'window_start': preprocessing.window_start,
+            'n_samples': preprocessing.n_samples,
+            'num_resample': preprocessing.num_resample,
+            'fill': preprocessing.fill,
+        }
+        return hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+
+    def contains(self, key: Optional[str]) -> bool:
+        """Checks if there is an entry for key without counting it as a hit or miss."""
+        return key is not None and os.path.exists(self._get_path(key))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Returns the read-only, memory mapped model input saved under key or None if it is not in the cache."""
+        path = self._get_path(key)
+        try:
+            features = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        except (ValueError, OSError):
+            # A damaged entry.  Drop it so that it gets replaced.
+            self._remove(path)
+            self.stats.misses += 1
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.hits += 1
+        return features
+
+    def put(self, key: str, features: np.ndarray) -> None:
+        """Saves the model input under key and evicts the least recently used entries if over the size cap."""
+        path = self._get_path(key)
+
+        # Write to a unique name and move it into place so readers never see a partial file
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(features, dtype=np.float32))
+            os.replace(tmp, path)
+        except OSError:
+            self._remove(tmp)
+            raise
+        self.stats.stores += 1
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache is within its size cap."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.npy'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            # Another process may have beaten us to it
+            if self._remove(path):
+                self.stats.evictions += 1
+            total -= size
+
+    def _get_path(self, key: str) -> str:
+        """Returns the path of the file an entry is kept in."""
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        """Removes a file if it exists.  Returns True if it was removed."""
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,366 @@
+"""This module looks up the cavity control modes, bypass words, and gradient set points used to validate fault events.
+
+rfwtools' ExampleValidator.validate_cavity_modes makes 17 point queries to the MYA archiver for every event.  The
+CavityModeLookup instead asks the archiver for the history of each PV over a time interval and keeps it.  Lookups that
+fall within a fetched interval are answered from memory.  Model.analyze_batch prefetches the PVs of a whole batch of
+events with a single range query per PV, so a backfill makes a handful of requests per zone rather than 17 per event.
+
+The archive behind the lookup is pluggable.  MyaArchive talks to the myquery web service.  FileArchive reads PV
+histories from a JSON file and stands in for the archiver in offline runs and tests.
+::
+
+    {"pvs": {"R1P1CNTL2MODE": [["2023-02-01 00:00:00", 4], ...], ...}}
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.model import Model
+    from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+
+    model = Model(mode_lookup=CavityModeLookup(FileArchive('cavity-modes.json')))
+"""
+import bisect
+import json
+import time
+import threading
+import collections
+import concurrent.futures
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+mode_template = '{}CNTL2MODE'
+"""The cavity control mode PV.  A float treated like a bit word.  GDR (I/Q) mode is 4, SELAP is 64."""
+
+bypassed_template = '{}XMOUT'
+"""The zone's bypass bit word PV.  Bits 0-7 correspond to cavities 1-8."""
+
+gset_template = '{}GSET'
+"""The cavity gradient set point PV.  Historically, operators have "bypassed" cavities by setting it to 0."""
+
+
+class LookupStats:
+    """Counts the lookups made through a CavityModeLookup and the archive queries needed to answer them."""
+
+    def __init__(self):
+        self.lookups: int = 0
+        self.hits: int = 0
+        self.queries: int = 0
+        self.query_seconds: float = 0.0
+
+    def add(self, other: 'LookupStats') -> None:
+        """Adds the counts of another LookupStats to this one."""
+        self.lookups += other.lookups
+        self.hits += other.hits
+        self.queries += other.queries
+        self.query_seconds += other.query_seconds
+
+    def __str__(self) -> str:
+        hit_rate = 100 * self.hits / self.lookups if self.lookups > 0 else 0.0
+        latency = 1000 * self.query_seconds / self.queries if self.queries > 0 else 0.0
+        return (f"Cavity mode lookups: {self.lookups} ({hit_rate:.1f}% already fetched), {self.queries} archive "
+                f"queries ({latency:.1f} ms average)")
+
+
+class MyaArchive:
+    """Gets PV histories from the MYA archiver's myquery web service.  Requires access to the internal JLab network."""
+
+    def __init__(self, url: Optional[str] = None):
+        """Create a MyaArchive.
+
+        Args:
+            url: The base URL of the myquery service.  The one used by rfwtools if None.
+        """
+        self.url = url
+
+    def get_history(self, pv: str, begin: datetime, end: datetime, deployment: str = 'ops') \
+            -> List[Tuple[datetime, Any]]:
+        """Returns the time ordered (time, value) updates of pv from the last one at or before begin through end.
+
+        Raises:
+            ValueError: if myquery returns an error response
+        """
+        from rfwtools import mya
+
+        url = mya.__myquery_url__ if self.url is None else self.url
+        fmt = "%Y-%m-%d+%H:%M:%S.%f"
+        query = f"/interval?c={pv}&b={begin.strftime(fmt)}&e={end.strftime(fmt)}&m={deployment}&p=on&f=&v="
+        response = mya.get_json(url + query)
+        if 'error' in response.keys():
+            raise ValueError(f"Received error response - {response['error']}")
+
+        # Updates without a value (e.g., disconnects) mean there is no value from then on
+        return [(_parse_time(point['d']), point.get('v')) for point in response['data']]
+
+
+class FileArchive:
+    """Gets PV histories from a JSON file.  A stand-in for the archiver in offline runs and tests."""
+
+    def __init__(self, path: str):
+        """Create a FileArchive by loading the file.
+
+        Args:
+            path: A JSON file of the form {"pvs": {<pv>: [[<time>, <value>], ...], ...}}.  Times are ISO format strings.
+        """
+        self.path = path
+        with open(path, "r") as f:
+            content = json.load(f)
+        self.pvs: Dict[str, List[Tuple[datetime, Any]]] = {}
+        for pv, points in content['pvs'].items():
+            self.pvs[pv] = sorted((_parse_time(t), value) for t, value in points)
+
+    def get_history(self, pv: str, begin: datetime, end: datetime, deployment: str = 'ops') \
+            -> List[Tuple[datetime, Any]]:
+        """Returns the time ordered (time, value) updates of pv from the last one at or before begin through end.
+
+        The deployment is ignored.
+
+        Raises:
+            ValueError: if the file has no history for pv, like myquery does for unknown PVs
+        """
+        if pv not in self.pvs:
+            raise ValueError(f"Received error response - Unknown PV {pv}")
+        points = self.pvs[pv]
+        times = [t for t, value in points]
+        first = max(0, bisect.bisect_right(times, begin) - 1)
+        last = bisect.bisect_right(times, end)
+        return points[first:last]
+
+
+class _Segment:
+    """A PV's history over a time interval."""
+
+    def __init__(self, begin: datetime, end: datetime, points: List[Tuple[datetime, Any]]):
+        self.begin = begin
+        self.end = end
+        self.times = [t for t, value in points]
+        self.values = [value for t, value in points]
+
+    def covers(self, t: datetime) -> bool:
+        return self.begin <= t <= self.end
+
+    def value_at(self, t: datetime) -> Any:
+        """The value of the last update at or before t.  None if there was no update."""
+        i = bisect.bisect_right(self.times, t) - 1
+        return None if i < 0 else self.values[i]
+
+
+class CavityModeLookup:
+    """Looks up archived PV values, keeping the history fetched over time intervals to answer later lookups.
+
+    A CavityModeLookup is thread safe and may be shared by copies of a Model.
+    """
+
+    def __init__(self, archive: Optional[Union[MyaArchive, FileArchive]] = None, max_workers: int = 6,
+                 max_span: timedelta = timedelta(hours=12), max_segments: int = 64):
+        """Create a CavityModeLookup.
+
+        Args:
+            archive: Where PV histories come from.  A MyaArchive if None.
+            max_workers: The number of archive queries made at once.  Kept low to not overwhelm the archiver.
+            max_span: The longest time interval fetched with a single query.  Events further apart are split up.
+            max_segments: The number of intervals kept per PV.  The oldest fetched are dropped first.
+        """
+        self.archive = MyaArchive() if archive is None else archive
+        self.max_workers = max_workers
+        self.max_span = max_span
+        self.max_segments = max_segments
+        self.stats = LookupStats()
+
+        # (deployment, pv) => the intervals fetched so far
+        self._segments: Dict[Tuple[str, str], collections.deque] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can't be pickled.  This lets a lookup be handed to worker processes.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get_value(self, pv: str, t: datetime, deployment: str = 'ops') -> Any:
+        """Returns the archived value of pv at time t.  None if it had no value then.
+
+        Raises:
+            ValueError: if the archive could not provide the history of pv
+        """
+        self._count([(pv, t)], deployment)
+        return self._get_value(pv, t, deployment)
+
+    def prefetch(self, lookups: Iterable[Tuple[str, datetime]], deployment: str = 'ops') -> None:
+        """Fetches the history needed for the (pv, time) lookups with as few range queries as possible.
+
+        Lookups of a PV are covered by a single query unless they are more than max_span apart.  Queries that fail
+        (e.g., the archiver can't be reached) are ignored here.  The error is raised when the value is looked up.
+        """
+        # Only fetch what isn't already known
+        times = collections.defaultdict(set)
+        with self._lock:
+            for pv, t in lookups:
+                if self._find(deployment, pv, t) is None:
+                    times[pv].add(t)
+
+        intervals = []
+        for pv, pv_times in times.items():
+            pv_times = sorted(pv_times)
+            begin = pv_times[0]
+            end = begin
+            for t in pv_times[1:]:
+                if t - begin > self.max_span:
+                    intervals.append((pv, begin, end))
+                    begin = t
+                end = t
+            intervals.append((pv, begin, end))
+
+        if len(intervals) == 0:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._fetch, pv, begin, end, deployment) for pv, begin, end in intervals]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    pass
+
+    def prefetch_events(self, events: Iterable[Tuple[List[str], datetime]], deployment: str = 'ops',
+                        offset: float = -1.0) -> None:
+        """Fetches everything validate_cavity_modes will need for the events.
+
+        Args:
+            events: The capture filenames and datetime of each event
+            deployment: The MYA deployment to query
+            offset: The number of seconds before each event the PVs are checked
+        """
+        lookups = []
+        for capture_filenames, event_datetime in events:
+            if len(capture_filenames) > 0:
+                lookups.extend(self._get_event_lookups(capture_filenames, event_datetime, offset))
+        self.prefetch(lookups, deployment=deployment)
+
+    def validate_cavity_modes(self, capture_filenames: List[str], event_datetime: datetime,
+                              mode: Union[Tuple[int, ...], int] = (4,), offset: float = -1.0,
+                              deployment: str = 'ops') -> None:
+        """Checks that each cavity was in an acceptable control mode or had its gradient set to zero.
+
+        This makes the same checks as rfwtools' ExampleValidator.validate_cavity_modes, using the cached history.
+
+        Args:
+            capture_filenames: The names of the event's capture files
+            event_datetime: The time of the fault event
+            mode: The acceptable control mode values
+            offset: The number of seconds before the fault event the PVs are checked
+            deployment: The MYA deployment to query
+
+        Raises:
+            ValueError: if any cavity mode does not match the value specified by the mode parameter
+        """
+        if len(capture_filenames) == 0:
+            raise ValueError("No capture file content found.")
+
+        # Fetch any PVs that are not known yet together
+        lookups = self._get_event_lookups(capture_filenames, event_datetime, offset)
+        self._count(lookups, deployment)
+        self.prefetch(lookups, deployment=deployment)
+
+        zone, cavs = self._get_zone_and_cavities(capture_filenames)
+        pre_fault_dt = event_datetime + timedelta(seconds=offset)
+
+        try:
+            bypassed = self._get_value(bypassed_template.format(zone), pre_fault_dt, deployment)
+        except ValueError:
+            # The bypassed flag was not always archived.  Faults prior to Fall 2019 may predate it.
+            bypassed = None
+
+        gsets = {}
+        modes = {}
+        for cav in cavs:
+            gsets[cav] = self._get_value(gset_template.format(cav), pre_fault_dt, deployment)
+            modes[cav] = self._get_value(mode_template.format(cav), pre_fault_dt, deployment)
+
+        bypassed_bits = format(0, "08b")
+        if bypassed is not None:
+            bypassed_bits = format(bypassed, "08b")[::-1]
+
+        for cav in cavs:
+            cav_number = int(cav[3])
+            mode_val = modes[cav]
+
+            # Sometimes cavities are bypassed by setting gset to 0.  Check that.
+            if gsets[cav] == 0:
+                continue
+
+            # Matches rfwtools, which compares the bit character to the number 0.  The bypass word never exempts a
+            # cavity as a result.
+            if bypassed_bits[cav_number - 1] == 0:
+                continue
+
+            exc = ValueError("Cavity '" + cav + f"' not in valid operating mode ({mode}).  Mode = " + str(mode_val))
+            if type(mode) == tuple or type(mode) == list:
+                if mode_val not in mode:
+                    raise exc
+            elif type(mode) == int:
+                if mode_val != mode:
+                    raise exc
+            else:
+                raise ValueError(f"Unexpected mode variable type '{type(mode).__name__}'")
+
+    @classmethod
+    def _get_event_lookups(cls, capture_filenames: List[str], event_datetime: datetime,
+                           offset: float) -> List[Tuple[str, datetime]]:
+        """Returns the (pv, time) lookups needed to validate an event."""
+        zone, cavs = cls._get_zone_and_cavities(capture_filenames)
+        t = event_datetime + timedelta(seconds=offset)
+        lookups = [(bypassed_template.format(zone), t)]
+        for cav in cavs:
+            lookups.append((gset_template.format(cav), t))
+            lookups.append((mode_template.format(cav), t))
+        return lookups
+
+    @staticmethod
+    def _get_zone_and_cavities(capture_filenames: List[str]) -> Tuple[str, List[str]]:
+        """Returns the EPICS zone (e.g., R1P) and cavity (e.g., R1P1) names of the capture files."""
+        return capture_filenames[0][0:3], [filename[0:4] for filename in capture_filenames]
+
+    def _count(self, lookups: List[Tuple[str, datetime]], deployment: str) -> None:
+        """Counts the lookups and how many of them can be answered without querying the archive."""
+        with self._lock:
+            self.stats.lookups += len(lookups)
+            self.stats.hits += sum(self._find(deployment, pv, t) is not None for pv, t in lookups)
+
+    def _get_value(self, pv: str, t: datetime, deployment: str) -> Any:
+        """Returns the value of pv at time t, querying the archive if it is not already known."""
+        with self._lock:
+            segment = self._find(deployment, pv, t)
+        if segment is None:
+            segment = self._fetch(pv, t, t, deployment)
+        return segment.value_at(t)
+
+    def _find(self, deployment: str, pv: str, t: datetime) -> Optional[_Segment]:
+        """Returns a fetched interval of pv that covers t.  Must be called with the lock held."""
+        for segment in self._segments.get((deployment, pv), ()):
+            if segment.covers(t):
+                return segment
+        return None
+
+    def _fetch(self, pv: str, begin: datetime, end: datetime, deployment: str) -> _Segment:
+        """Queries the archive for the history of pv over [begin, end] and keeps it."""
+        start = time.perf_counter()
+        try:
+            segment = _Segment(begin, end, self.archive.get_history(pv, begin, end, deployment=deployment))
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stats.queries += 1
+                self.stats.query_seconds += elapsed
+
+        with self._lock:
+            segments = self._segments.setdefault((deployment, pv), collections.deque(maxlen=self.max_segments))
+            segments.append(segment)
+        return segment
+
+
+def _parse_time(value: str) -> datetime:
+    """Parses the ISO format times used by myquery and FileArchive files, e.g. 2023-02-01T21:00:25.100"""
+    return datetime.fromisoformat(value.replace(' ', 'T'))
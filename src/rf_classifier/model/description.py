@@ -0,0 +1,63 @@
+"""This module reads the embedded model's description.yaml file.
+
+It only needs yaml, so describing the model does not pay for loading numpy, rfwtools, or the ONNX models.
+"""
+import os
+from typing import Any, Dict, Optional
+
+import yaml
+
+desc_file = os.path.join(os.path.dirname(__file__), "model_files", "description.yaml")
+"""The path to the embedded model's description file."""
+
+
+def get_model_description() -> Dict[str, Any]:
+    """Parses the description.yaml file associated with this model and returns the resulting dictionary"""
+
+    if not os.path.exists(desc_file):
+        raise FileNotFoundError(f"File not found - {desc_file}")
+    else:
+        with open(desc_file, "r") as f:
+            desc = yaml.safe_load(f.read())
+            if desc is None:
+                raise RuntimeError(f"Error parsing {desc_file}")
+    return desc
+
+
+def get_model_id(precision: str = 'fp32', desc: Optional[Dict[str, Any]] = None) -> str:
+    """Returns the model id given in each result's 'model' field, e.g. random_forest_v0_1.
+
+    Args:
+        precision: The precision of the models that made the results.  Results of the quantized models are told apart
+                   from those of the reference models.
+        desc: The model description.  Read from desc_file if None.
+    """
+    desc = get_model_description() if desc is None else desc
+    model_id = f"{desc['name']}_v{desc['version'].replace('.', '_')}"
+    if precision != 'fp32':
+        model_id += f"_{precision}"
+    return model_id
+
+
+def print_model_description(verbose: bool):
+    """Function for reading and print a model's description based on it's description.yaml file.
+
+    Args:
+        verbose (bool): Whether to print out the detailed information of the model
+
+    Returns:
+        None:  Prints out description or relevant error messages.
+    """
+
+    desc = get_model_description()
+    description = f"""
+Model ID:      {desc['id']}
+Release Date:  {desc['releaseDate']}
+Cavity Labels: {desc['cavityLabels']}
+Fault Labels:  {desc['faultLabels']}
+Training Data: {desc['trainingData']}
+Brief:         {desc['brief']}
+"""
+    if verbose:
+        description += os.linesep + f"Details:       {desc['details']}"
+    print(description)
@@ -0,0 +1,167 @@
+"""This module holds an event's waveform data, read once and shared by validation and preprocessing.
+
+rfwtools' ExampleValidator loads and copies a full event_df of every event it validates, after which the model read the
+capture files again to build its input.  An EventData is read once per event, by CaptureFileReader.load or from an
+rfwtools event_df, and holds just what the checks and the model need: the capture file names, every waveform name, the
+whole Time column, and the model's signals.  The checks are the same as ExampleValidator's and raise the same errors.
+The waveforms are released once the model input has been built from them.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.reader import CaptureFileReader
+
+    event_data = CaptureFileReader().load('/usr/opsdata/waveforms/data/rf/1L25/2023_02_01/210026.1')
+    event_data.validate_capture_file_counts()
+    event_data.validate_capture_file_waveforms()
+    event_data.validate_waveform_times()
+    data = event_data.get_signals()
+    event_data.release()
+"""
+import itertools
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import preprocessing
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+required_waveforms = ["IMES", "QMES", "GMES", "PMES", "IASK", "QASK", "GASK", "PASK", "CRFP", "CRFPP", "CRRP", "CRRPP",
+                      "GLDE", "PLDE", "DETA2", "CFQE2", "DFQES"]
+"""The waveforms every cavity's capture file must have.  Same as the ones required by rfwtools."""
+
+
+class EventData:
+    """The capture file names, waveform names, Time column, and model signals of an event."""
+
+    def __init__(self, event_path: str, capture_filenames: List[str], waveforms: List[str], time: np.ndarray,
+                 columns: Dict[str, np.ndarray], mismatched_range: Optional[Tuple[float, float]] = None):
+        """Create an EventData.  See CaptureFileReader.load and from_event_df.
+
+        Args:
+            event_path: The path to the event directory
+            capture_filenames: The names of the event's capture files
+            waveforms: The <cavity>_<waveform> names of every waveform in the capture files, including any repeats
+            time: The Time column shared by the capture files
+            columns: The signals read, by <cavity>_<waveform> name.  Each has a value per time.
+            mismatched_range: The smallest and largest times of all the capture files if their Time columns do not
+                match.  None if they match.
+        """
+        self.event_path = event_path
+        self.capture_filenames = capture_filenames
+        self.waveforms = waveforms
+        self.time: Optional[np.ndarray] = time
+        self.columns: Optional[Dict[str, np.ndarray]] = columns
+        self.mismatched_range = mismatched_range
+
+    @classmethod
+    def from_event_df(cls, event_path: str, capture_filenames: List[str], event_df: 'pd.DataFrame',
+                      signals: Optional[List[str]] = None) -> 'EventData':
+        """Creates an EventData from an event_df loaded by rfwtools, e.g. for compressed events.
+
+        Args:
+            event_path: The path to the event directory
+            capture_filenames: The names of the event's capture files
+            event_df: The event's waveforms with a Time column, as made by rfwtools' Example.load_data
+            signals: The signals kept.  preprocessing.signals if None.
+        """
+        signals = preprocessing.signals if signals is None else signals
+        waveforms = [column for column in event_df.columns.values if column != 'Time']
+        columns = {signal: event_df[signal].values for signal in signals if signal in event_df.columns}
+        return cls(event_path, capture_filenames, waveforms, event_df['Time'].values, columns)
+
+    def get_signals(self, signals: Optional[List[str]] = None) -> np.ndarray:
+        """Returns the signals as a 2D array with a column per signal, in order, and a row per time.
+
+        Args:
+            signals: The signals to return.  preprocessing.signals if None.
+
+        Raises:
+            ValueError: if signals are missing or the capture files' times do not match
+            RuntimeError: if the data has been released
+        """
+        if self.columns is None:
+            raise RuntimeError(f"Event data has been released - {self.event_path}")
+        if self.mismatched_range is not None:
+            raise ValueError("Capture files do not have matching Time columns")
+        signals = preprocessing.signals if signals is None else signals
+        missing = [signal for signal in signals if signal not in self.columns]
+        if len(missing) > 0:
+            raise ValueError(f"Capture files are missing waveforms - {', '.join(missing)}")
+
+        data = np.empty((len(self.time), len(signals)), dtype=np.float64)
+        for i, signal in enumerate(signals):
+            data[:, i] = self.columns[signal]
+        return data
+
+    def release(self) -> None:
+        """Drops the waveforms.  The capture file and waveform names are kept."""
+        self.time = None
+        self.columns = None
+
+    def validate_capture_file_counts(self) -> None:
+        """Checks that there is exactly one capture file per cavity.
+
+        Raises:
+            ValueError: if either missing or "duplicate" capture files are found.
+        """
+        counts = {cavity: 0 for cavity in ("1", "2", "3", "4", "5", "6", "7", "8")}
+        for filename in self.capture_filenames:
+            counts[filename[3]] += 1
+
+        for cavity, count in counts.items():
+            if count > 1:
+                raise ValueError("Duplicate capture files exist for zone '" + cavity + "'")
+            if count == 0:
+                raise ValueError("Missing capture file for zone '" + cavity + "'")
+
+    def validate_capture_file_waveforms(self) -> None:
+        """Checks that all of the required waveforms are present exactly one time across all capture files.
+
+        Raises:
+            ValueError: if any required waveform is repeated or missing
+        """
+        required = sorted(f"{cavity}_{waveform}" for cavity, waveform
+                          in itertools.product(("1", "2", "3", "4", "5", "6", "7", "8"), required_waveforms))
+        if sorted(self.waveforms) != required:
+            raise ValueError("Found event_df does not have the required waveform columns.")
+
+    def validate_waveform_times(self, max_start: float = -100.0, min_end: float = 100.0, step_size: float = 0.2,
+                                delta_max: float = 0.02) -> None:
+        """Checks that the Time column has a valid range and sample interval and that the files' columns match.
+
+        rfwtools joins the files on Time, so the range of files whose times do not match is that of all their times
+        together.  It is checked first so that such events fail the same way they did with rfwtools.
+
+        Args:
+            max_start: The latest acceptable start time for the waveforms
+            min_end: The earliest acceptable end time for the waveforms
+            step_size: The expected step_size of each waveform in milliseconds
+            delta_max: The maximum difference between the observed time steps and step_size in milliseconds.
+
+        Raises:
+            ValueError: if the Time column is beyond expected thresholds or the capture files' times do not match
+            RuntimeError: if the data has been released
+        """
+        if self.time is None:
+            raise RuntimeError(f"Event data has been released - {self.event_path}")
+        if len(self.time) < 2:
+            raise ValueError(f"Found {len(self.time)} samples.  Expected a range of at least [{max_start}, {min_end}]")
+
+        min_t, max_t = (np.min(self.time), np.max(self.time)) if self.mismatched_range is None \
+            else self.mismatched_range
+        if max_start < min_t or min_end > max_t:
+            raise ValueError(
+                "Invalid time range of [{},{}] found.  Does not include minimum range for fault data [{}, {}]".format(
+                    min_t, max_t, max_start, min_end))
+        if self.mismatched_range is not None:
+            raise ValueError("Capture files do not have matching Time columns")
+
+        lag = np.diff(self.time)
+        max_step = np.max(lag)
+        min_step = np.min(lag)
+        if abs(step_size - max_step) > delta_max or abs(step_size - min_step) > delta_max:
+            raise ValueError("Found improper step size.  Expect: {}, Step size range: ({}, {}), Acceptable delta: {}"
+                             .format(step_size, min_step, max_step, delta_max))
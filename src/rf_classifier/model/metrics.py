@@ -0,0 +1,212 @@
+"""This module times the stages of analyzing an event and exports the counters a Model keeps.
+
+A Model created with timings=True records how long each event spends in each stage:
+
+- cache: Looking the event up in the feature cache
+- validate: Checking the capture files, waveforms, and cavity modes
+- read: Reading the Time column and the model's signals from the capture files, once for both validation and
+  preprocessing
+- resample: Cropping the window and down sampling it
+- scale: Standardizing the signals
+- cavity-inference, fault-inference: Running the models.  The time of a batch is split evenly between its events.
+
+The stages an event went through are totaled in its 'total' entry, and the bytes it took from capture files are kept as
+'bytes-read'.  The durations are collected into histograms by TimingStats, which joins the other counters returned by
+Model.get_stats().  With timings off, the stages are not timed at all.
+
+The counters can be saved as a Prometheus text file, e.g. for node_exporter's textfile collector, or as a JSON snapshot.
+"""
+import os
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+stages = ('cache', 'validate', 'read', 'resample', 'scale', 'cavity-inference', 'fault-inference', 'total')
+"""The stages timed by an instrumented Model, in the order they happen, followed by the total."""
+
+default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The upper bounds in seconds of the stage duration histograms' buckets.  A final bucket catches everything else."""
+
+metric_prefix = 'rf_classifier'
+"""The prefix of the exported metrics' names."""
+
+
+class Histogram:
+    """Counts observed values in buckets with fixed upper bounds, like a Prometheus histogram."""
+
+    def __init__(self, buckets: Sequence[float] = default_buckets):
+        self.buckets: List[float] = list(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        """The number of values in each bucket.  Not cumulative.  The last is for values past the largest bound."""
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """Adds a value to the histogram."""
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def add(self, other: 'Histogram') -> None:
+        """Adds the counts of another Histogram with the same buckets to this one."""
+        if other.buckets != self.buckets:
+            raise ValueError("Histograms have different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in.  Infinite if past the largest bound."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            seen += count
+            if seen >= rank and seen > 0:
+                return bound
+        return float('inf')
+
+
+class TimingStats:
+    """Collects the stage durations of events into histograms.  Kept by a Model created with timings=True."""
+
+    def __init__(self):
+        self.events: int = 0
+        self.errors: int = 0
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in stages}
+
+    def record(self, timings: Dict[str, float], error: bool = False) -> None:
+        """Adds the timings of an event.  Only the stages it went through are counted."""
+        self.events += 1
+        if error:
+            self.errors += 1
+        for stage, histogram in self.stages.items():
+            if stage in timings:
+                histogram.observe(timings[stage])
+
+    def add(self, other: 'TimingStats') -> None:
+        """Adds the counts of another TimingStats to this one."""
+        self.events += other.events
+        self.errors += other.errors
+        for stage, histogram in other.stages.items():
+            self.stages[stage].add(histogram)
+
+    def __str__(self) -> str:
+        means = [f"{stage} {1000 * h.sum / h.count:.1f}" for stage, h in self.stages.items() if h.count > 0]
+        return f"Stage timings (mean ms) over {self.events} events ({self.errors} failed): " + ", ".join(means)
+
+
+class StageTimer:
+    """A context manager that adds the time spent in it to a stage of an event's timings."""
+
+    def __init__(self, timings: Dict[str, float], stage: str):
+        self.timings = timings
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> 'StageTimer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.timings[self.stage] = self.timings.get(self.stage, 0.0) + time.perf_counter() - self.start
+
+
+def format_prometheus(stats: Dict[str, Any]) -> str:
+    """Formats a Model's stats in the Prometheus text exposition format.
+
+    The stage durations are given as the rf_classifier_stage_duration_seconds histogram labeled by stage.  Every other
+    counter becomes rf_classifier_<stats key>_<attribute>_total, e.g. rf_classifier_read_bytes_read_total.  Attributes
+    listed in a stats class' gauges, like peaks, can go down between runs and become gauges without the _total suffix,
+    e.g. rf_classifier_backfill_peak_rss_mb.
+
+    Args:
+        stats: The stats returned by Model.get_stats(), or a running total of them.  See utils.add_stats.
+    """
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, TimingStats):
+            for name, count, help_text in (('events', value.events, "Events analyzed with timings"),
+                                           ('event_errors', value.errors, "Events that could not be analyzed")):
+                lines.extend(_format_counter(f"{metric_prefix}_{name}_total", count, help_text))
+
+            name = f"{metric_prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {name} Time spent in each stage of analyzing an event")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in value.stages.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + [float('inf')], histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        else:
+            gauges = getattr(value, 'gauges', ())
+            for attribute, count in vars(value).items():
+                if isinstance(count, (int, float)) and not isinstance(count, bool):
+                    name = f"{metric_prefix}_{key}_{attribute}"
+                    if attribute in gauges:
+                        lines.extend(_format_gauge(name, count, f"{type(value).__name__}.{attribute}"))
+                        continue
+                    if not name.endswith("_total"):
+                        name += "_total"
+                    lines.extend(_format_counter(name, count, f"{type(value).__name__}.{attribute}"))
+    return "\n".join(lines) + "\n"
+
+
+def make_snapshot(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a Model's stats to a JSON serializable dictionary with the time it was taken."""
+    return {'created': datetime.now().isoformat(timespec='seconds'), 'stats': _to_json(stats)}
+
+
+def write_metrics(path: str, stats: Dict[str, Any], metrics_format: Optional[str] = None) -> None:
+    """Atomically writes a Model's stats to a file, so readers never see a partial file.
+
+    Args:
+        path: The file to write
+        stats: The stats returned by Model.get_stats(), or a running total of them
+        metrics_format: 'prometheus' or 'json'.  JSON if path ends with .json and Prometheus otherwise if None.
+    """
+    if metrics_format is None:
+        metrics_format = 'json' if path.endswith('.json') else 'prometheus'
+    if metrics_format == 'json':
+        content = json.dumps(make_snapshot(stats), indent=2) + "\n"
+    elif metrics_format == 'prometheus':
+        content = format_prometheus(stats)
+    else:
+        raise ValueError(f"Unknown metrics format - {metrics_format}")
+
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _format_counter(name: str, value: float, help_text: str) -> List[str]:
+    """Formats a counter in the Prometheus text exposition format."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value!r}"]
+
+
+def _format_gauge(name: str, value: float, help_text: str) -> List[str]:
+    """Formats a gauge in the Prometheus text exposition format."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value!r}"]
+
+
+def _to_json(value: Any) -> Any:
+    """Converts stats objects to dictionaries of their attributes."""
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if hasattr(value, '__dict__'):
+        return {key: _to_json(item) for key, item in vars(value).items()}
+    return value
@@ -1,69 +1,51 @@
 import os
+import copy
+import contextlib
 import platform
 import sys
 import math
 from datetime import datetime
 import json
-import yaml
-from typing import Any, Dict, Optional, Tuple, List
+import itertools
+import threading
+import collections
+import concurrent.futures
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional, Tuple, List
 
 import numpy as np
-import pandas as pd
-from rfwtools.utils import get_signal_names
-from rfwtools.example import Example
-from rfwtools.example_validator import ExampleValidator
-from rfwtools.extractor.windowing import window_extractor
-from rfwtools.config import Config
-import onnxruntime as rt
-from sklearn.preprocessing import StandardScaler
-
-
 
+from . import metrics, preprocessing, quantization
+from .cache import CacheStats, FeatureCache
+from .cavity_modes import CavityModeLookup, LookupStats
+from .description import get_model_description, get_model_id, print_model_description
+from .event_data import EventData
+from .metrics import StageTimer, TimingStats
+from .reader import CaptureFileReader, ReadStats, capture_file_regex
+from .sessions import SessionConfig
 from .. import utils
 
+# pandas, rfwtools, and onnxruntime take the better part of two seconds to import.  They are imported where they are
+# first used so that importing this module stays cheap.
+if TYPE_CHECKING:
+    import pandas as pd
+    import onnxruntime as rt
+    from rfwtools.example import Example
+
 app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 """The base directory of this model application."""
 
 lib_dir = os.path.join(app_dir, 'lib')
 """The directory where python code and pickle files containing tsfresh models, etc. can be found."""
 
+fault_names = ["Quench_100ms", "Quench_3ms", "E_Quench", "Heat Riser Choke", "Microphonics", "Controls Fault",
+               "Single Cav Turn off"]
+"""The fault type labels in the order of the fault model's output."""
 
-def get_model_description() -> Dict[str, Any]:
-    """Parses the description.yaml file associated with this model and returns the resulting dictionary"""
-
-    desc_file = os.path.join(os.path.dirname(__file__), "model_files", "description.yaml")
-    if not os.path.exists(desc_file):
-        raise FileNotFoundError(f"File not found - {desc_file}")
-    else:
-        with open(desc_file, "r") as f:
-            desc = yaml.safe_load(f.read())
-            if desc is None:
-                raise RuntimeError(f"Error parsing {desc_file}")
-    return desc
-
-
-def print_model_description(verbose: bool):
-    """Function for reading and print a model's description based on it's description.yaml file.
-
-    Args:
-        verbose (bool): Whether to print out the detailed information of the model
-
-    Returns:
-        None:  Prints out description or relevant error messages.
-    """
+_not_timed = contextlib.nullcontext()
+"""Stands in for a StageTimer when timings are off."""
 
-    desc = get_model_description()
-    description = f"""
-Model ID:      {desc['id']}
-Release Date:  {desc['releaseDate']}
-Cavity Labels: {desc['cavityLabels']}
-Fault Labels:  {desc['faultLabels']}
-Training Data: {desc['trainingData']}
-Brief:         {desc['brief']}
-"""
-    if verbose:
-        description += os.linesep + f"Details:       {desc['details']}"
-    print(description)
+invalid_zones = ['0L04']
+"""The zones the model does not make predictions for."""
 
 
 def softmax(x: np.array) -> Tuple[int, List[float]]:
@@ -73,20 +55,15 @@ def softmax(x: np.array) -> Tuple[int, List[float]]:
     return int(y), dist
 
 
-def standard_scaling(df: pd.DataFrame, fill: float = 0.0) -> pd.DataFrame:
+def standard_scaling(df: 'pd.DataFrame', fill: float = 0.0) -> 'pd.DataFrame':
     """This is like sklearn's StandardScaler, except that constant signals are replaced with an arbitrary constant.
 
-    This transforms the DataFrame in place.
+    Returns a new DataFrame.  See preprocessing.standardize for the array version used by the model.
     """
-    scaler = StandardScaler(copy=True, with_mean=True, with_std=True)
-    df = df.copy()
-    for i in range(len(df.columns)):
-        signal = df.iloc[:, i].values.reshape(-1, 1)
-        if np.min(signal) == np.max(signal):
-            df.iloc[:, i] = [fill] * len(signal)
-        else:
-            df.iloc[:, i] = scaler.fit_transform(signal)
-    return df
+    import pandas as pd
+
+    return pd.DataFrame(preprocessing.standardize(df.values.astype(np.float64), fill_value=fill), index=df.index,
+                        columns=df.columns)
 
 
 class Model:
@@ -104,31 +81,173 @@ class Model:
     Additional documentation is available in the package docs folder.
     """
 
-    def __init__(self):
-        """Create a Model object.  This performs all data handling, validation, and analysis."""
+    def __init__(self, session_options: Optional['rt.SessionOptions'] = None,
+                 feature_cache: Optional[FeatureCache] = None, mode_lookup: Optional[CavityModeLookup] = None,
+                 session_config: Optional[SessionConfig] = None, precision: str = 'fp32', timings: bool = False,
+                 result_timings: bool = False, prefetch: int = 0, io_threads: int = 2,
+                 read_threads: int = 8):
+        """Create a Model object.  This performs all data handling, validation, and analysis.
+
+        Args:
+            session_options: The options used to create the ONNX InferenceSessions.  Used as is instead of the options
+                             made from session_config if given, in which case optimized models are not saved.
+            feature_cache: A cache of preprocessed model input.  Events found in it skip validation and preprocessing.
+                           Nothing is cached if None.
+            mode_lookup: Looks up the archived cavity modes used in validation.  One using the MYA archiver if None.
+            session_config: The settings of the ONNX InferenceSessions, including whether to warm them up.  ONNX
+                            Runtime defaults if None.
+            precision: Which version of the model files to run, 'fp32' or the quantized 'int8'.  See the quantization
+                       module.
+            timings: Time the stages of analyzing each event.  The times are collected by get_stats()['timings'].  See
+                     the metrics module.
+            result_timings: Also add each event's stage times and bytes read to its result as 'timings'.  Implies
+                            timings.
+            prefetch: The number of events iter_analyze() loads and preprocesses ahead of the batch being classified.
+                      Events are loaded one at a time between batches if 0.
+            io_threads: The number of threads iter_analyze() loads events with when prefetch is on
+            read_threads: The most capture files of an event read at once.  See CaptureFileReader.
+        """
         self.model_description: Dict[str, Any] = get_model_description()
         self.model_name: str = self.model_description['name']
         self.model_version: str = self.model_description['version']
+        self.precision: str = precision
+
+        # Results of the quantized models are told apart from those of the reference models
+        self.model_id: str = get_model_id(precision, self.model_description)
+
+        # Not timing anything unless asked keeps the cost of timings to a check per stage
+        self.timing_stats: Optional[TimingStats] = TimingStats() if timings or result_timings else None
+        self.result_timings: bool = result_timings
+
+        self.prefetch: int = prefetch
+        self.io_threads: int = io_threads
+
+        self._init_event_state()
+
+        # Reads the waveforms of events that are on disk.  Keeps count of the bytes read.
+        self.reader: CaptureFileReader = CaptureFileReader(threads=read_threads)
+        self.feature_cache: Optional[FeatureCache] = feature_cache
+        self.mode_lookup: CavityModeLookup = CavityModeLookup() if mode_lookup is None else mode_lookup
+
+        self.session_config: SessionConfig = SessionConfig() if session_config is None else session_config
+        self.cavity_onnx_session: 'rt.InferenceSession' = self._create_session('cavity_model', session_options)
+        self.fault_onnx_session: 'rt.InferenceSession' = self._create_session('fault_model', session_options)
+        if self.session_config.warm_up:
+            self.warm_up()
+
+    def _create_session(self, name: str, session_options: Optional['rt.SessionOptions'] = None) \
+            -> 'rt.InferenceSession':
+        """Creates the InferenceSession of one of the model files at the model's precision.  See SessionConfig."""
+        model_path = quantization.get_model_path(name, self.precision)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No {self.precision} model file - {model_path}.  See the quantization module.")
+        if session_options is not None:
+            import onnxruntime as rt
+            return rt.InferenceSession(model_path, sess_options=session_options)
+        return self.session_config.create_session(model_path)
+
+    def warm_up(self):
+        """Runs each ONNX session once on dummy input.
+
+        The first run of a session is slower than the rest while ONNX Runtime allocates its buffers and threads.  Doing
+        it up front keeps the first event from paying for it.
+        """
+        for sess in (self.cavity_onnx_session, self.fault_onnx_session):
+            shape = [dim if isinstance(dim, int) and dim > 0 else 1 for dim in sess.get_inputs()[0].shape]
+            self.make_batch_prediction(sess, np.zeros(shape, dtype=np.float32))
 
-        # Make sure we do not have a trailing slash to muck up processing later.
+    def _init_event_state(self):
+        """Sets up the attributes that hold information about the currently loaded example."""
         self.event_dir: Optional[str] = None
         self.zone_name: Optional[str] = None
         self.fault_time: Optional[str] = None
 
-        self.example: Example = None
-        self.validator: ExampleValidator = ExampleValidator()
-        self.common_features_df: pd.DataFrame = None
+        self.example: Optional['Example'] = None
+        # Read on first use and shared by validation and preprocessing.  Released once the features are made.
+        self.event_data: Optional[EventData] = None
+        self.features: Optional[np.ndarray] = None
+
+        # The stage times of the current event.  None unless timings are on and an event is being analyzed.
+        self.event_timings: Optional[Dict[str, float]] = None
+        self._event_bytes_read: int = 0
+
+    def copy(self) -> 'Model':
+        """Creates a Model that shares this model's ONNX sessions, but has its own currently loaded example.
 
-        self.cavity_onnx_session: rt.InferenceSession = rt.InferenceSession(os.path.join(os.path.dirname(__file__),
-                                                                                         'model_files',
-                                                                                         'cavity_model.onnx'))
-        self.fault_onnx_session: rt.InferenceSession = rt.InferenceSession(os.path.join(os.path.dirname(__file__),
-                                                                                        'model_files',
-                                                                                        'fault_model.onnx'))
+        ONNX InferenceSessions can be run by several threads at once, while the rest of a Model is not thread safe.
+        Give each thread its own copy to analyze events concurrently without loading the ONNX models again.
+        """
+        model = copy.copy(self)
+        model._init_event_state()
+        model.reader = CaptureFileReader(threads=self.reader.threads)
+        if self.feature_cache is not None:
+            model.feature_cache = self.feature_cache.copy()
+        if self.timing_stats is not None:
+            model.timing_stats = TimingStats()
+        return model
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns the counters kept while analyzing events, e.g., the capture file reads and cavity mode lookups."""
+        stats = {'read': self.reader.stats, 'modes': self.mode_lookup.stats}
+        if self.feature_cache is not None:
+            stats['cache'] = self.feature_cache.stats
+        if self.timing_stats is not None:
+            stats['timings'] = self.timing_stats
+        return stats
+
+    def reset_stats(self) -> None:
+        """Starts the counters returned by get_stats over from zero."""
+        self.reader.stats = ReadStats()
+        self.mode_lookup.stats = LookupStats()
+        if self.feature_cache is not None:
+            self.feature_cache.stats = CacheStats()
+        if self.timing_stats is not None:
+            self.timing_stats = TimingStats()
+
+    def _time(self, stage: str):
+        """Returns a context manager timing a stage of the current event.  It does nothing if timings are off."""
+        if self.event_timings is None:
+            return _not_timed
+        return StageTimer(self.event_timings, stage)
+
+    def _start_event(self) -> None:
+        """Starts timing the stages of an event if timings are on."""
+        if self.timing_stats is not None:
+            self.event_timings = {}
+            self._event_bytes_read = self.reader.stats.bytes_read
+
+    def _finish_event(self, result: Dict[str, Any], timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Records the stage times of an event and adds them to its result if asked to.
+
+        Args:
+            result: The event's result or error result
+            timings: The event's stage times.  Those of the current event if None.
+
+        Returns:
+            The result
+        """
+        if timings is None:
+            timings = self.event_timings
+            self.event_timings = None
+        if timings is None or self.timing_stats is None:
+            return result
+
+        timings['total'] = sum(timings[stage] for stage in metrics.stages if stage in timings and stage != 'total')
+        self.timing_stats.record(timings, error='error' in result)
+        if self.result_timings:
+            result['timings'] = timings
+        return result
 
     def update_example(self, path: str):
         """Updates the currently loaded example to reflect the new path"""
 
+        # Forget the previous example so that errors are not reported against it
+        self.event_dir = None
+        self.zone_name = None
+        self.fault_time = None
+        self.example = None
+        self.event_data = None
+
         if not path.startswith(os.sep):
             raise ValueError("Path to fault-data must be absolute")
 
@@ -144,16 +263,17 @@ class Model:
         dt = datetime.strptime(f"{tokens[-2]} {tokens[-1]}", "%Y_%m_%d %H%M%S.%f")
         zone = tokens[-3]
 
-        # Save the root data path into the rfwtools configuration.  Windows is weird, C: doesn't get handled correctly.
+        # Get the root data path.  Windows is weird, C: doesn't get handled correctly.
         if platform.system() == "Windows":
             data_dir = os.path.join(tokens[0], os.sep, *tokens[1:-3])
         else:
             data_dir = os.path.join(os.path.sep, *tokens[:-3])
-        Config().data_dir = data_dir
 
-        # Update the example the model is currently loading
+        # Update the example the model is currently loading.  Give it the data path directly instead of through the
+        # global rfwtools configuration so that models in other threads can load events from other places.
+        from rfwtools.example import Example
         self.example = Example(zone=zone, dt=dt, cavity_conf=math.nan, fault_conf=math.nan, cavity_label="",
-                               fault_label="", label_source="")
+                               fault_label="", label_source="", data_dir=data_dir)
 
     def analyze(self, deployment: str = 'ops') -> Dict[str, Any]:
         """A method that performs some analysis and classifies the fault event by cavity number and fault type.
@@ -193,14 +313,25 @@ class Model:
             | "model"             | str        | The model which produced the result                             |
             +---------------------+------------+-----------------------------------------------------------------+
         """
-        # Check that the data we're about to analyze meets any preconditions for our model
-        self.validate_data(deployment)
-
-        # Preprocess the data before model inference
-        self.preprocess_data()
-
+        # Check that the data we're about to analyze meets any preconditions for our model and preprocess it for model
+        # inference.  Both are skipped for events in the feature cache.
+        self._start_event()
+        try:
+            self.load_features(deployment)
+            result = self.classify()
+        except Exception:
+            self.event_timings = None
+            raise
+        return self._finish_event(result)
+
+    def classify(self) -> Dict[str, Any]:
+        """Runs the models on the current example's features.  See analyze() for the result.
+
+        The features must already be loaded, e.g. by load_features().
+        """
         # Analyze the data to determine which cavity caused the fault.
-        cav_results = self.get_cavity_label()
+        with self._time('cavity-inference'):
+            cav_results = self.get_cavity_label()
 
         # A value of cavity-label '0' corresponds to a multi-cavity event.  In this case the fault analysis is
         # unreliable and we should short circuit and report only a multi-cavity fault type (likely someone
@@ -208,39 +339,330 @@ class Model:
         # prediction we're basing this on.
         fault_results = {'fault-label': 'Multi Cav turn off', 'fault-confidence': cav_results['cavity-confidence']}
         if cav_results['cavity-label'] != 'multiple':
-            fault_results = self.get_fault_type_label(int(cav_results['cavity-label']))
+            with self._time('fault-inference'):
+                fault_results = self.get_fault_type_label(int(cav_results['cavity-label']))
+
+        return self.make_result(self.example, cav_results, fault_results)
+
+    def analyze_batch(self, paths: List[str], deployment: str = 'ops') -> List[Dict[str, Any]]:
+        """Analyzes several fault events while running each ONNX model once over the inputs of the whole batch.
+
+        Each event is loaded, validated, and preprocessed in turn.  The inputs of the events that pass validation are
+        stacked into a single (N, 4096, 32) tensor for the cavity model, and only the rows that are not labeled
+        'multiple' are then given to the fault model.  Problems with an individual event do not stop the batch.
+
+        Args:
+            paths: The absolute paths to the fault event directories
+            deployment: Which MYA deployment to use when validating cavity operating modes.
+
+        Returns:
+            list: One dictionary per path in the order given.  Successful results are identical to the output of
+            analyze().  Events that could not be analyzed are given as {'error': <message>, 'location': <zone>,
+            'timestamp': <timestamp>} where location and timestamp may be None if the path could not be parsed.
+        """
+        # Get the cavity mode history of the whole batch up front with a single archiver query per PV
+        self.prefetch_cavity_modes(paths, deployment)
+        return self.classify_loaded([self.load_event(path, deployment) for path in paths])
+
+    def load_event(self, path: str, deployment: str = 'ops') \
+            -> Tuple[Optional[Dict[str, Any]], Optional['Example'], Optional[np.ndarray], Optional[Dict[str, float]]]:
+        """Loads, validates, and preprocesses an event for classify_loaded().
+
+        Args:
+            path: The absolute path to the fault event directory
+            deployment: Which MYA deployment to use when validating cavity operating modes.
+
+        Returns:
+            tuple: The error result if the event could not be loaded, else None, followed by the event's example,
+            features, and stage times so far (None unless timings are on).
+        """
+        self._start_event()
+        try:
+            self.update_example(path)
+            self.load_features(deployment)
+        except Exception as ex:
+            return self._finish_event(self.make_error_result(ex)), None, None, None
+        timings = self.event_timings
+        self.event_timings = None
+        return None, self.example, self.features, timings
+
+    def classify_loaded(self, events: List[Tuple[Optional[Dict[str, Any]], Optional['Example'],
+                                                 Optional[np.ndarray], Optional[Dict[str, float]]]]) \
+            -> List[Dict[str, Any]]:
+        """Classifies events loaded by load_event(), running each ONNX model once over the whole batch.
+
+        Args:
+            events: The output of load_event() for each event
+
+        Returns:
+            list: One result per event in the order given.  See analyze_batch().
+        """
+        results: List[Optional[Dict[str, Any]]] = [error for error, example, features, timings in events]
+
+        # Keep the inputs and examples of the events that made it
+        rows = [i for i, (error, example, features, timings) in enumerate(events) if error is None]
+        examples = [events[i][1] for i in rows]
+        features = [events[i][2] for i in rows]
+        timings = [events[i][3] for i in rows]
+
+        if len(rows) == 0:
+            return results
+
+        try:
+            features = np.stack(features)
+            with self._time_batch(timings, 'cavity-inference', range(len(rows))):
+                cav_ids, cav_confs = self.make_batch_prediction(self.cavity_onnx_session, features)
+            cav_labels = [self.get_cavity_label_name(cavity_id) for cavity_id in cav_ids]
+
+            # Multi-cavity events are not given to the fault model.  See analyze() for details.
+            single = [j for j in range(len(rows)) if cav_labels[j] != 'multiple']
+            fault_results = [{'fault-label': 'Multi Cav turn off', 'fault-confidence': conf} for conf in cav_confs]
+            if len(single) > 0:
+                for j in single:
+                    self.assert_valid_cavity_number(int(cav_labels[j]))
+                with self._time_batch(timings, 'fault-inference', single):
+                    fault_ids, fault_confs = self.make_batch_prediction(self.fault_onnx_session, features[single])
+                for j, fault_id, fault_conf in zip(single, fault_ids, fault_confs):
+                    fault_results[j] = {'fault-label': fault_names[fault_id], 'fault-confidence': fault_conf}
+        except Exception as ex:
+            # Inference applies to the whole batch, so every event in it gets the error
+            for i, example, event_timings in zip(rows, examples, timings):
+                results[i] = self._finish_event(self.make_error_result(ex, example), event_timings)
+            return results
+
+        for j, i in enumerate(rows):
+            cav_results = {'cavity-label': cav_labels[j], 'cavity-confidence': cav_confs[j]}
+            results[i] = self._finish_event(self.make_result(examples[j], cav_results, fault_results[j]), timings[j])
+
+        return results
+
+    @contextlib.contextmanager
+    def _time_batch(self, timings: List[Optional[Dict[str, float]]], stage: str, rows: Iterable[int]):
+        """Times a stage run once for several events of a batch and splits the time evenly between them.
 
+        Args:
+            timings: The stage times of each event in the batch.  None for events that are not timed.
+            stage: The stage being timed
+            rows: The indices into timings of the events in the stage
+        """
+        if self.timing_stats is None:
+            yield
+            return
+
+        rows = list(rows)
+        batch_timings: Dict[str, float] = {}
+        with StageTimer(batch_timings, stage):
+            yield
+        for j in rows:
+            if timings[j] is not None:
+                timings[j][stage] = timings[j].get(stage, 0.0) + batch_timings[stage] / len(rows)
+
+    def iter_analyze(self, paths: Iterable[str], batch_size: int = 16, deployment: str = 'ops') \
+            -> Iterator[Dict[str, Any]]:
+        """Analyzes fault events in batches, yielding the results of each batch as soon as it is done.
+
+        Only one batch of events is held at a time, so any number of events can be analyzed with constant memory.  If
+        the model was created with prefetch, up to that many more events are loaded ahead by its io_threads.  See
+        _iter_analyze_prefetched().
+
+        Args:
+            paths: The absolute paths to the fault event directories.  Any iterable, including a generator, will do.
+            batch_size: The number of events to analyze together.  See analyze_batch().
+            deployment: Which MYA deployment to use when validating cavity operating modes.
+
+        Returns:
+            An iterator over the result dictionaries in the same order as paths.  See analyze_batch().
+        """
+        if self.prefetch > 0:
+            yield from self._iter_analyze_prefetched(paths, batch_size=batch_size, deployment=deployment)
+            return
+
+        paths = iter(paths)
+        while True:
+            batch = list(itertools.islice(paths, batch_size))
+            if len(batch) == 0:
+                return
+            yield from self.analyze_batch(batch, deployment=deployment)
+
+    def _iter_analyze_prefetched(self, paths: Iterable[str], batch_size: int, deployment: str) \
+            -> Iterator[Dict[str, Any]]:
+        """Analyzes events while a pool of threads loads and preprocesses the ones that come next.
+
+        Reading capture files leaves the CPU idle and inference leaves the disk idle.  Here the io_threads load events
+        while this thread runs the ONNX models, which release the GIL, so each event costs about the larger of the two
+        rather than their sum.  Each loading thread has its own copy of the model.  At most batch_size + prefetch
+        events are loaded or loading at a time, so the loaders stop when inference falls behind.  The cavity modes of
+        each batch are still fetched together before its events are loaded.
+        """
+        local = threading.local()
+        copies: List['Model'] = []
+        lock = threading.Lock()
+
+        def load(path: str):
+            model = getattr(local, 'model', None)
+            if model is None:
+                model = local.model = self.copy()
+                with lock:
+                    copies.append(model)
+            return model.load_event(path, deployment)
+
+        paths = iter(paths)
+        pending: collections.deque = collections.deque()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.io_threads,
+                                                       thread_name_prefix='rf-classifier-io') as executor:
+                try:
+                    while True:
+                        while len(pending) < batch_size + self.prefetch:
+                            batch = list(itertools.islice(paths, batch_size))
+                            if len(batch) == 0:
+                                break
+                            self.prefetch_cavity_modes(batch, deployment)
+                            pending.extend(executor.submit(load, path) for path in batch)
+
+                        if len(pending) == 0:
+                            return
+                        loaded = [pending.popleft().result() for _ in range(min(batch_size, len(pending)))]
+                        yield from self.classify_loaded(loaded)
+                finally:
+                    # Don't wait on events nobody will see, e.g. when the caller stops early
+                    for future in pending:
+                        future.cancel()
+        finally:
+            for model in copies:
+                self._add_stats(model)
+
+    def _add_stats(self, other: 'Model') -> None:
+        """Adds the counters of a copy of this model to this model's.  The cavity mode lookup is already shared."""
+        self.reader.stats.add(other.reader.stats)
+        if self.feature_cache is not None and other.feature_cache is not None:
+            self.feature_cache.stats.add(other.feature_cache.stats)
+        if self.timing_stats is not None and other.timing_stats is not None:
+            self.timing_stats.add(other.timing_stats)
+
+    def make_result(self, example: 'Example', cav_results: Dict[str, Any], fault_results: Dict[str, Any]) \
+            -> Dict[str, Any]:
+        """Combines the cavity and fault model results for an example into the dictionary returned by analyze()."""
         return {
-            'location': self.example.event_zone,
-            'timestamp': self.example.event_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-5],
+            'location': example.event_zone,
+            'timestamp': example.event_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-5],
             'cavity-label': cav_results['cavity-label'],
             'cavity-confidence': float(cav_results['cavity-confidence']),
             'fault-label': fault_results['fault-label'],
             'fault-confidence': float(fault_results['fault-confidence']),
-            'model': f"{self.model_name}_v{self.model_version.replace('.', '_')}"
+            'model': self.model_id
+        }
+
+    def make_error_result(self, ex: Exception, example: Optional['Example'] = None) -> Dict[str, Any]:
+        """Creates the result reported for an event that could not be analyzed.
+
+        Args:
+            ex: The exception raised while handling the event
+            example: The event's example.  If None, the zone and timestamp of the currently loaded event are used.
+        """
+        if example is None:
+            return {'error': f"{ex}", 'location': self.zone_name, 'timestamp': self.fault_time}
+        return {
+            'error': f"{ex}",
+            'location': example.event_zone,
+            'timestamp': example.event_datetime.strftime("%Y-%m-%d %H:%M:%S.%f")[:-5]
         }
 
+    def prefetch_cavity_modes(self, paths: Iterable[str], deployment: str = 'ops'):
+        """Fetches the archived cavity modes needed to validate the events at paths with as few queries as possible.
+
+        Events that can't be parsed or that are in the feature cache are skipped.  Their problems are reported when they
+        are analyzed.
+
+        Args:
+            paths: The absolute paths to the fault event directories
+            deployment (str):  Which MYA deployment to use when validating cavity operating modes.
+        """
+        events = []
+        for path in paths:
+            try:
+                event_datetime = utils.path_to_datetime(path)
+                capture_filenames = [name for name in os.listdir(path) if capture_file_regex.match(name)]
+            except (ValueError, OSError):
+                continue
+            if self.feature_cache is not None and self.feature_cache.contains(self.feature_cache.make_key(path)):
+                continue
+            events.append((capture_filenames, event_datetime))
+        self.mode_lookup.prefetch_events(events, deployment=deployment)
+
+    def load_features(self, deployment: str = 'ops'):
+        """Validates and preprocesses the current example, or gets its model input from the feature cache.
+
+        Only events that pass validation are added to the cache, so cached events are not validated again.  Updates
+        self.features.
+
+        Args:
+            deployment (str):  Which MYA deployment to use when validating cavity operating modes.
+        """
+        key = None
+        if self.feature_cache is not None:
+            with self._time('cache'):
+                key = self.feature_cache.make_key(self.example.get_event_path(compressed=False))
+                features = None if key is None else self.feature_cache.get(key)
+            if features is not None:
+                self.features = features
+                return
+
+        # The capture files are read once, up front so the read is not timed as validation, and their waveforms are
+        # released by preprocess_data().  Release them here too in case validation fails.
+        try:
+            self.get_event_data()
+            with self._time('validate'):
+                self.validate_data(deployment)
+            self.preprocess_data()
+        finally:
+            self.event_data = None
+
+        if key is not None:
+            with self._time('cache'):
+                self.feature_cache.put(key, self.features)
+
+    def get_event_data(self) -> EventData:
+        """Returns the current example's waveform data, reading its capture files if they have not been read yet.
+
+        The data is read at most once per example and shared by validate_data() and preprocess_data().
+        """
+        if self.event_data is not None:
+            return self.event_data
+
+        with self._time('read'):
+            event_path = self.example.get_event_path(compressed=False)
+            if self.example.capture_files_on_disk(compressed=False):
+                # Parse only the model's signals, but all of the Time column for validation
+                self.event_data = self.reader.load(event_path)
+            else:
+                # Let rfwtools handle compressed events and ones it has to download
+                self.example.load_data()
+                try:
+                    self.event_data = EventData.from_event_df(event_path, self.example.get_capture_file_list(),
+                                                              self.example.event_df)
+                finally:
+                    self.example.unload_data()
+        if self.event_timings is not None:
+            self.event_timings['bytes-read'] = self.reader.stats.bytes_read - self._event_bytes_read
+        return self.event_data
+
     def preprocess_data(self):
-        """This method preprocesses the data in preparation for model input.  Updates self.common_features_df."""
-        # Fault and cavity models use same data and features.  Get that now.
-        signals = get_signal_names(cavities=['1', '2', '3', '4', '5', '6', '7', '8'],
-                                   waveforms=['GMES', 'GASK', 'CRFP', 'DETA2'])
-
-        # We need to crop, downsample, then do z-score.  Any constant values are set to 0.001 manually.
-        num_resample = 4096
-        num_meta_columns = 8
-        self.common_features_df = window_extractor(self.example, signals=signals, windows={'pre-fault': -1533.4},
-                                                   n_samples=7680, standardize=False, downsample=True,
-                                                   ds_kwargs={'num': num_resample})
-
-        # The extractor makes a row per requested window plus some metadata.  Columns are named
-        # Sample_<sample_num>_<cav_num>_<signal>, and go Sample_1_1_GMES, Sample_2_1_GMES, ..., Sample_1_1_GASK, ....
-        # We want to change this so that each column is all of the samples for 1_GMES, 1_GASK, ... as in the signal
-        # order above.
-        self.common_features_df = pd.DataFrame(
-            self.common_features_df.iloc[0, num_meta_columns:].values.reshape(len(signals), -1).T, columns=signals)
-
-        self.common_features_df = standard_scaling(self.common_features_df, fill=0.001)
+        """This method preprocesses the data in preparation for model input.  Updates self.features.
+
+        Both models use the same (4096, 32) float32 input.  The signals are cropped, down sampled, then z-scored, with
+        any constant signals set to 0.001.  See the preprocessing module for details.  The example's waveforms are
+        released once the input is made.
+        """
+        event_data = self.get_event_data()
+        try:
+            with self._time('resample'):
+                window = preprocessing.resample_window(event_data.time, event_data.get_signals())
+            with self._time('scale'):
+                self.features = preprocessing.scale_window(window)
+        finally:
+            event_data.release()
+            self.event_data = None
 
     def validate_data(self, deployment='ops'):
         """Check that the event directory and it's data is of the expected format.
@@ -258,38 +680,65 @@ class Model:
         Returns:
             None: Subroutines raise an exception if an error condition is found.
         """
-        self.validator.set_example(self.example)
-
-        # Don't just use the built in validate_data method as this needs to be future proofed against C100 firmware
-        # upgrades.  This upgrade will result in a new mode SELAP (R...CNTL2MODE == 64).
-        self.validator.validate_capture_file_counts()
-        self.validator.validate_capture_file_waveforms()
+        # These are the checks of rfwtools' ExampleValidator, made on the data that preprocessing will use instead of a
+        # copy of the event it loads itself.  Its cavity mode check also needs to be future proofed against C100
+        # firmware upgrades.  This upgrade will result in a new mode SELAP (R...CNTL2MODE == 64).
+        event_data = self.get_event_data()
+        event_data.validate_capture_file_counts()
+        event_data.validate_capture_file_waveforms()
 
         # Many of these examples will have some amount of rounding error.
-        self.validator.validate_waveform_times(min_end=10.0, max_start=-1534.0, step_size=0.2)
-        self.validator.validate_cavity_modes(mode=(4, 64), deployment=deployment)
-        self.validator.validate_zones()
+        event_data.validate_waveform_times(min_end=10.0, max_start=-1534.0, step_size=0.2)
+        self.mode_lookup.validate_cavity_modes(event_data.capture_filenames, self.example.event_datetime,
+                                               mode=(4, 64), deployment=deployment)
+        if self.example.event_zone in invalid_zones:
+            raise ValueError("Zone {} is not a valid zone for this model".format(self.example.event_zone))
 
     def make_prediction(self, sess):
         """Use an ONNX InferenceSession to make a prediction based on the current example's features"""
-        input_name = sess.get_inputs()[0].name
+        idx, confidence = self.make_batch_prediction(sess, self.features[np.newaxis])
+
+        return idx[0], confidence[0]
+
+    @staticmethod
+    def make_batch_prediction(sess: 'rt.InferenceSession', features: np.ndarray) -> Tuple[List[int], List[float]]:
+        """Use an ONNX InferenceSession to make predictions for a stack of examples' features.
+
+        Sessions that accept any batch size are run once.  Exported models may instead fix the batch dimension of their
+        input (ours only accept a single example), in which case the stack is run in chunks of that size.
+
+        Args:
+            sess: The InferenceSession of the model to run
+            features: A float32 array of shape (N, 4096, 32) containing the model input of N examples
+
+        Returns:
+            tuple: A list of the predicted class indices and a list of their confidences, one entry per example.
+        """
+        model_input = sess.get_inputs()[0]
         label_name = sess.get_outputs()[0].name
 
-        # Model outputs a list of 2D arrays.  Only one prediction, so pull it out of the larger structure for easier
-        # work
-        prediction = sess.run([label_name],
-                              {input_name: self.common_features_df.values.reshape(1, -1, 32).astype(np.float32)})
-        prediction = prediction[0][0]
+        batch_size = model_input.shape[0]
+        if not isinstance(batch_size, int) or batch_size < 1:
+            batch_size = len(features)
+
+        # Model outputs a list of 2D arrays.  We only ask for the one output.
+        predictions = []
+        for start in range(0, len(features), batch_size):
+            predictions.extend(sess.run([label_name], {model_input.name: features[start:start + batch_size]})[0])
 
-        # The model does not return a probability distribution or a cavity id, but a 9D output.  Run softmax on it to
-        # get out prediction and "probability"
-        idx, confs = softmax(prediction)
-        confidence = confs[idx]
+        # The model does not return a probability distribution or a class id, but a raw output vector per example.  Run
+        # softmax on each to get the prediction and "probability"
+        idx = []
+        confidence = []
+        for prediction in predictions:
+            i, confs = softmax(prediction)
+            idx.append(i)
+            confidence.append(confs[i])
 
         return idx, confidence
 
     def get_cavity_label(self):
-        """Loads the underlying cavity model and performs the predictions based on the common_features_df.
+        """Loads the underlying cavity model and performs the predictions based on the features.
 
             Returns:
                 A dictionary with format {'cavity-label': <string_label>, 'cavity-confidence': <float in [0,1]>}"
@@ -297,17 +746,19 @@ class Model:
         # Load the cavity model and make a prediction about which cavity faulted
         cavity_id, cavity_confidence = self.make_prediction(self.cavity_onnx_session)
 
-        # Convert the results from an int to a human-readable string
+        return {'cavity-label': self.get_cavity_label_name(cavity_id), 'cavity-confidence': cavity_confidence}
+
+    @staticmethod
+    def get_cavity_label_name(cavity_id: int) -> str:
+        """Converts the cavity model's class index to a human-readable cavity label."""
         if cavity_id == 0:
-            cavity_id = 'multiple'
-        else:
-            # The cavity_id int corresponds to the actual cavity number if 1-8
-            cavity_id = str(cavity_id)
+            return 'multiple'
 
-        return {'cavity-label': cavity_id, 'cavity-confidence': cavity_confidence}
+        # The cavity_id int corresponds to the actual cavity number if 1-8
+        return str(cavity_id)
 
     def get_fault_type_label(self, cavity_number):
-        """Loads the underlying fault type model and performs the predictions based on the common_features_df.
+        """Loads the underlying fault type model and performs the predictions based on the features.
 
             Args:
                 cavity_number (int): The number of the cavity (1-8) that caused the fault.
@@ -322,8 +773,6 @@ class Model:
         fault_idx, fault_confidence = self.make_prediction(self.fault_onnx_session)
 
         # Get the fault name and probability associated with that index
-        fault_names = ["Quench_100ms", "Quench_3ms", "E_Quench", "Heat Riser Choke", "Microphonics", "Controls Fault",
-                       "Single Cav Turn off"]
         fault_name = fault_names[fault_idx]
 
         return {'fault-label': fault_name, 'fault-confidence': fault_confidence}
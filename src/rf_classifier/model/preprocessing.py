@@ -0,0 +1,179 @@
+"""This module turns an event's waveform data into the input tensor of the cavity and fault models.
+
+The models take a (4096, 32) float32 tensor.  Each column is one of the GMES, GASK, CRFP, and DETA2 waveforms of the
+eight cavities.  The waveforms are cropped to the 7680 samples starting at -1533.4 ms, down sampled to 4096 samples, and
+z-score standardized.  Constant signals are replaced with a fill value of 0.001 instead.
+
+Everything is done on numpy arrays holding all 32 signals at once.  This gives the same result as cropping and down
+sampling with rfwtools' window_extractor followed by standard_scaling, without the per-signal loops and DataFrames.
+
+Down sampling is done by a Resampler, which does what scipy.signal.resample does with a plan made once for the fixed
+window and output lengths.  See get_resampler.
+"""
+import functools
+from typing import Tuple
+
+import numpy as np
+
+signals = [f"{cavity}_{waveform}" for cavity in ('1', '2', '3', '4', '5', '6', '7', '8')
+           for waveform in ('GMES', 'GASK', 'CRFP', 'DETA2')]
+"""The names of the signals used by the models in the order of the model input's columns."""
+
+window_start = -1533.4
+"""The time (ms) at or after which the window of samples given to the models starts."""
+
+n_samples = 7680
+"""The number of samples in the window."""
+
+num_resample = 4096
+"""The number of samples the window is down sampled to."""
+
+fill = 0.001
+"""The value given to signals that are constant over the window."""
+
+
+def get_window_bounds(time: np.ndarray, start: float = window_start, n: int = n_samples) -> Tuple[int, int]:
+    """Finds the rows holding the window of n samples that starts at the first time at or after start.
+
+    Args:
+        time: The Time column of the event's waveforms
+        start: The earliest time (ms) of the window
+        n: The number of samples in the window
+
+    Returns:
+        tuple: The first row of the window and the row after its last.
+
+    Raises:
+        RuntimeError: if the waveforms do not contain the full window
+    """
+    after_start = np.flatnonzero(time >= start)
+    if len(after_start) == 0:
+        raise RuntimeError(f"Example's time range ([{time[0]}, {time[-1]}] does not contain window ({start} + "
+                           f"{n} steps).")
+    start_i = int(after_start[0])
+    end_i = start_i + n
+
+    # Matches window_extractor, which requires one sample past the end of the window
+    if len(time) - 1 < end_i:
+        raise RuntimeError(f"Example's time range ([{time[0]}, {time[-1]}] does not contain window ({start} + "
+                           f"{n} steps).")
+    return start_i, end_i
+
+
+def standardize(x: np.ndarray, fill_value: float = 0.0) -> np.ndarray:
+    """Z-score standardizes each column of x.  Constant columns are set to fill_value instead.
+
+    This is like sklearn's StandardScaler applied to each column, done in one vectorized pass.
+
+    Args:
+        x: A 2D array with one signal per column
+        fill_value: The value given to every sample of a constant column
+
+    Returns:
+        A new array of the standardized columns
+    """
+    mean = x.mean(axis=0)
+    std = x.std(axis=0)
+    constant = x.min(axis=0) == x.max(axis=0)
+
+    out = (x - mean) / np.where(constant, 1.0, std)
+    out[:, constant] = fill_value
+    return out
+
+
+class Resampler:
+    """Fourier resamples windows of n samples to num samples, the same as scipy.signal.resample along the time axis.
+
+    scipy.signal.resample works out how to truncate or pad the spectrum, including splitting the Nyquist component, on
+    every call.  Since it only depends on n and num, a Resampler works it out once as a weight per kept frequency.  The
+    scale by num / n is folded in.  Resampling is then a real FFT of every signal at once, a multiply, and an inverse
+    real FFT.  The FFTs reuse the plans scipy.fft caches for their lengths.
+
+    A Resampler holds no state between calls, so threads may share one.
+    """
+
+    def __init__(self, n: int = n_samples, num: int = num_resample, workers: int = 1):
+        """Create a Resampler.
+
+        Args:
+            n: The number of samples in each window
+            num: The number of samples each window is resampled to
+            workers: The number of threads each FFT may use
+        """
+        self.n = n
+        self.num = num
+        self.workers = workers
+
+        # The frequencies kept, 0 through N/2, and their weights.  Matches scipy.signal.resample for real input.
+        kept = min(n, num)
+        self.num_kept = kept // 2 + 1
+        self.weights = np.full(self.num_kept, num / n)
+        if kept % 2 == 0:
+            if num < n:
+                # The component at N/2 takes the one at -N/2 as well
+                self.weights[-1] *= 2.0
+            elif n < num:
+                # The Nyquist component is split between +N/2 and -N/2
+                self.weights[-1] *= 0.5
+
+    def resample(self, windows: np.ndarray) -> np.ndarray:
+        """Resamples every signal of one or more windows.
+
+        Args:
+            windows: An array of shape (n, signals), or (events, n, signals) to resample several events at once
+
+        Returns:
+            A float64 array with n replaced by num in the shape of windows
+        """
+        # scipy.signal is slow to import.  scipy.fft is all that is needed.
+        import scipy.fft
+
+        if windows.shape[-2] != self.n:
+            raise ValueError(f"Expected windows of {self.n} samples, not {windows.shape[-2]}")
+        spectrum = scipy.fft.rfft(windows, axis=-2, workers=self.workers)
+        spectrum = spectrum[..., :self.num_kept, :] * self.weights[:, np.newaxis]
+        return scipy.fft.irfft(spectrum, self.num, axis=-2, workers=self.workers)
+
+
+@functools.lru_cache(maxsize=8)
+def get_resampler(n: int = n_samples, num: int = num_resample) -> Resampler:
+    """Returns the shared Resampler of n samples to num samples, making it the first time it is asked for."""
+    return Resampler(n=n, num=num)
+
+
+def make_model_input(time: np.ndarray, data: np.ndarray, start: float = window_start, n: int = n_samples,
+                     num: int = num_resample, fill_value: float = fill) -> np.ndarray:
+    """Crops, down samples, and standardizes the signals into the model input tensor.
+
+    Args:
+        time: The Time column of the event's waveforms
+        data: A 2D array with a column for each of the signals, in order, and a row for each time
+        start: The earliest time (ms) of the window
+        n: The number of samples in the window
+        num: The number of samples the window is down sampled to
+        fill_value: The value given to signals that are constant over the window
+
+    Returns:
+        A C-contiguous float32 array of shape (num, number of signals)
+    """
+    return scale_window(resample_window(time, data, start=start, n=n, num=num), fill_value=fill_value)
+
+
+def resample_window(time: np.ndarray, data: np.ndarray, start: float = window_start, n: int = n_samples,
+                    num: int = num_resample) -> np.ndarray:
+    """Crops the signals to the window and down samples them.  The first half of make_model_input.
+
+    Returns:
+        A float64 array of shape (num, number of signals)
+    """
+    start_i, end_i = get_window_bounds(time, start=start, n=n)
+    return get_resampler(n, num).resample(data[start_i:end_i])
+
+
+def scale_window(window: np.ndarray, fill_value: float = fill) -> np.ndarray:
+    """Standardizes the down sampled window into the model input.  The second half of make_model_input.
+
+    Returns:
+        A C-contiguous float32 array of the same shape as window
+    """
+    return np.ascontiguousarray(standardize(window, fill_value=fill_value), dtype=np.float32)
@@ -0,0 +1,202 @@
+"""This module makes and evaluates the INT8 versions of the cavity and fault models.
+
+The models are dynamically quantized with ONNX Runtime: their weights are stored as 8-bit integers and activations are
+quantized on the fly, so no calibration data is needed.  The quantized files sit next to the float32 ones in
+model_files, named e.g. cavity_model.int8.onnx, and are selected with Model(precision='int8').
+
+Whether the INT8 models are worth using depends on the CPU, since ONNX Runtime's integer kernels vary by instruction
+set, and on how well they agree with the float32 models.  compare_precisions runs both over a corpus of events and
+reports the label agreement, the change in confidence, and the inference time per event.  Only adopt the INT8 models
+where it shows them to be both faster and in agreement.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.quantization import compare_precisions, quantize_models
+
+    quantize_models()
+    comparison = compare_precisions(['/usr/opsdata/waveforms/data/rf/1L25/2023_02_03/103934.1'])
+    print(comparison)
+"""
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+model_dir = os.path.join(os.path.dirname(__file__), 'model_files')
+"""The directory holding the model files."""
+
+model_names = ('cavity_model', 'fault_model')
+"""The names of the model files without precision or extension."""
+
+precisions = ('fp32', 'int8')
+"""The supported precisions of the models.  fp32 is the reference."""
+
+weight_types = {
+    'uint8': 'QUInt8',
+    'int8': 'QInt8',
+}
+"""The supported types of quantized weights and the names of their onnxruntime.quantization.QuantType values."""
+
+
+def get_model_path(name: str, precision: str = 'fp32', directory: str = model_dir) -> str:
+    """Returns the path of a model file at the given precision.
+
+    Args:
+        name: One of model_names
+        precision: One of precisions
+        directory: The directory holding the model files
+    """
+    if precision not in precisions:
+        raise ValueError(f"Unknown precision - {precision}")
+    if precision == 'fp32':
+        return os.path.join(directory, f"{name}.onnx")
+    return os.path.join(directory, f"{name}.{precision}.onnx")
+
+
+def quantize_models(output_dir: str = model_dir, weight_type: str = 'uint8') -> List[str]:
+    """Writes dynamically quantized INT8 versions of the float32 models.
+
+    Unsigned weights are the default as ONNX Runtime's convolution kernels for signed weights are far slower on many
+    CPUs.
+
+    Args:
+        output_dir: The directory the quantized files are written to
+        weight_type: The type of the quantized weights.  One of the keys of weight_types.
+
+    Returns:
+        The paths of the quantized model files
+    """
+    if weight_type not in weight_types:
+        raise ValueError(f"Unknown weight type - {weight_type}")
+
+    # Pulls in the onnx package.  Only needed here.
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name in model_names:
+        path = get_model_path(name, 'int8', output_dir)
+        quantize_dynamic(get_model_path(name), path, weight_type=getattr(QuantType, weight_types[weight_type]))
+        paths.append(path)
+    return paths
+
+
+class PrecisionComparison:
+    """The results of running the reference and candidate models over the same events.  See compare_precisions."""
+
+    def __init__(self, reference: str, candidate: str):
+        self.reference: str = reference
+        self.candidate: str = candidate
+        self.events: List[Dict[str, Any]] = []
+        """The results and inference seconds of each precision for the events that could be analyzed."""
+        self.errors: List[Dict[str, Any]] = []
+        """The error results of the events that could not be analyzed."""
+
+    def add(self, reference: Dict[str, Any], candidate: Dict[str, Any], reference_seconds: float,
+            candidate_seconds: float) -> None:
+        """Records the results of an event."""
+        self.events.append({
+            'location': reference['location'],
+            'timestamp': reference['timestamp'],
+            self.reference: reference,
+            self.candidate: candidate,
+            f"{self.reference}-seconds": reference_seconds,
+            f"{self.candidate}-seconds": candidate_seconds,
+        })
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Summarizes the comparison.
+
+        Returns:
+            dict: The number of events compared and failed, the fraction of events whose cavity, fault, and both labels
+            agree, the mean and max absolute change in cavity and fault confidence, and the median and 99th percentile
+            inference milliseconds per event of each precision.  Only the events whose cavity labels agree are included
+            in the fault confidence change.
+        """
+        summary: Dict[str, Any] = {'events': len(self.events), 'errors': len(self.errors)}
+        if len(self.events) == 0:
+            return summary
+
+        ref = [event[self.reference] for event in self.events]
+        cand = [event[self.candidate] for event in self.events]
+        cavity = np.array([r['cavity-label'] == c['cavity-label'] for r, c in zip(ref, cand)])
+        fault = np.array([r['fault-label'] == c['fault-label'] for r, c in zip(ref, cand)])
+        summary['cavity-agreement'] = float(np.mean(cavity))
+        summary['fault-agreement'] = float(np.mean(fault))
+        summary['agreement'] = float(np.mean(cavity & fault))
+
+        for label, mask in (('cavity', np.ones(len(ref), dtype=bool)), ('fault', cavity)):
+            drift = np.array([abs(r[f"{label}-confidence"] - c[f"{label}-confidence"])
+                              for r, c, m in zip(ref, cand, mask) if m])
+            summary[f"{label}-confidence-drift-mean"] = float(np.mean(drift)) if len(drift) > 0 else None
+            summary[f"{label}-confidence-drift-max"] = float(np.max(drift)) if len(drift) > 0 else None
+
+        for precision in (self.reference, self.candidate):
+            ms = 1000 * np.array([event[f"{precision}-seconds"] for event in self.events])
+            summary[f"{precision}-ms-p50"] = float(np.percentile(ms, 50))
+            summary[f"{precision}-ms-p99"] = float(np.percentile(ms, 99))
+        return summary
+
+    def __str__(self) -> str:
+        summary = self.get_summary()
+        lines = [f"Compared {summary['events']} events ({summary['errors']} could not be analyzed)"]
+        if summary['events'] > 0:
+            lines.append(f"Label agreement:   cavity {summary['cavity-agreement']:.1%}, fault "
+                         f"{summary['fault-agreement']:.1%}, both {summary['agreement']:.1%}")
+            for label in ('cavity', 'fault'):
+                if summary[f"{label}-confidence-drift-mean"] is not None:
+                    lines.append(f"{label.capitalize() + ' confidence:':18s} mean change "
+                                 f"{summary[f'{label}-confidence-drift-mean']:.4f}, max change "
+                                 f"{summary[f'{label}-confidence-drift-max']:.4f}")
+            for precision in (self.reference, self.candidate):
+                lines.append(f"{precision + ' inference:':18s} {summary[f'{precision}-ms-p50']:.1f} ms p50, "
+                             f"{summary[f'{precision}-ms-p99']:.1f} ms p99 per event")
+        return "\n".join(lines)
+
+
+def compare_precisions(paths: Iterable[str], reference: str = 'fp32', candidate: str = 'int8',
+                       model_kwargs: Optional[Dict[str, Any]] = None, deployment: str = 'ops') -> PrecisionComparison:
+    """Runs the models at two precisions over the same events and compares their results and inference times.
+
+    Each event is read, validated, and preprocessed once.  Both models then classify the same input, one event at a
+    time, so that the times are of inference alone.
+
+    Args:
+        paths: The absolute paths to the fault event directories
+        reference: The precision the candidate is compared to
+        candidate: The precision being evaluated
+        model_kwargs: Extra keyword arguments given to both Models, e.g. a feature_cache or session_config
+        deployment: Which MYA deployment to use when validating cavity operating modes
+
+    Returns:
+        The comparison
+    """
+    from .model import Model
+
+    model_kwargs = dict(model_kwargs or {})
+    model_kwargs.pop('precision', None)
+    reference_model = Model(precision=reference, **model_kwargs)
+    candidate_model = Model(precision=candidate, **model_kwargs)
+
+    comparison = PrecisionComparison(reference, candidate)
+    for path in paths:
+        try:
+            reference_model.update_example(path)
+            reference_model.load_features(deployment)
+        except Exception as ex:
+            comparison.errors.append(reference_model.make_error_result(ex))
+            continue
+
+        candidate_model.example = reference_model.example
+        candidate_model.features = reference_model.features
+        start = time.perf_counter()
+        reference_result = reference_model.classify()
+        reference_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        candidate_result = candidate_model.classify()
+        candidate_seconds = time.perf_counter() - start
+        comparison.add(reference_result, candidate_result, reference_seconds, candidate_seconds)
+
+    return comparison
@@ -0,0 +1,211 @@
+"""This module reads the waveforms used by the models directly from an event's capture files.
+
+rfwtools parses every column of every capture file and joins them into a single DataFrame.  The models only use four of
+each cavity's seventeen waveforms.  The CaptureFileReader parses just those columns, and the Time column, with pandas' C
+parser.  The model needs the whole Time column to validate an event, so each event is read once in full.  The resulting
+EventData is shared by validation and preprocessing.  See the event_data module.  The reader keeps count of the files
+and bytes it read.
+
+An event's capture files are read concurrently by a small pool of threads, so that the latency of loading an event from
+a network filesystem is about that of its slowest file rather than the sum of all eight.  The files are combined in
+order once they have all arrived, and errors are raised as if they had been read one after another.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.reader import CaptureFileReader
+
+    reader = CaptureFileReader()
+    event_data = reader.load('/usr/opsdata/waveforms/data/rf/1L25/2023_02_01/210026.1')
+    data = event_data.get_signals()
+    print(reader.stats)
+"""
+import io
+import os
+import re
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import preprocessing
+from .event_data import EventData
+
+capture_file_regex = re.compile(r"R.*harv\..*\.txt")
+"""A regex for matching capture file filenames.  Same as the one used by rfwtools."""
+
+waveform_regex = re.compile(r"R\d\w\dWF[TS]")
+"""A regex for matching capture file waveform names, e.g. R1M1WFSGMES.  Same as the one used by rfwtools."""
+
+flipped_time_threshold = -1000.0
+"""Events whose first Time is greater than this have a flipped Time column.  See rfwtools' Example.load_data."""
+
+
+class ReadStats:
+    """Counts the capture files and bytes read by a CaptureFileReader."""
+
+    def __init__(self):
+        self.files: int = 0
+        self.bytes_read: int = 0
+        self.bytes_total: int = 0
+
+    def add(self, other: 'ReadStats') -> None:
+        """Adds the counts of another ReadStats to this one."""
+        self.files += other.files
+        self.bytes_read += other.bytes_read
+        self.bytes_total += other.bytes_total
+
+    def __str__(self) -> str:
+        return f"Read {self.bytes_read} of {self.bytes_total} bytes from {self.files} capture files"
+
+
+class CaptureFileReader:
+    """Reads the model's signals and the whole Time column from the capture files of an event directory.
+
+    The result is the same as the matching columns of the event_df produced by rfwtools' Example.load_data.  A reader is
+    not thread safe.  Give each thread its own.  Each reader keeps its own pool of threads for reading an event's files,
+    which is started on first use.
+    """
+
+    def __init__(self, signals: Optional[List[str]] = None, threads: int = 8):
+        """Create a CaptureFileReader.
+
+        Args:
+            signals: The <cavity>_<waveform> names of the signals to read.  preprocessing.signals if None.
+            threads: The most capture files of an event read at once.  The files are read one after another if 1.
+        """
+        self.signals = preprocessing.signals if signals is None else signals
+        self.threads = threads
+        self.stats = ReadStats()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        """Stops the reader's threads.  The reader may still be used, and starts them again if needed."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def load(self, event_path: str) -> EventData:
+        """Reads the capture files in event_path in full, once, for both validation and preprocessing.
+
+        The whole Time column and the name of every waveform are kept for the checks, but only the model's signals are
+        parsed.  Problems the checks look for, like missing capture files or waveforms, or capture files whose times do
+        not match, are left for them to report.
+
+        Args:
+            event_path: The path to the uncompressed event directory
+
+        Returns:
+            The event's data
+
+        Raises:
+            ValueError: if there are no capture files or a waveform name is unexpected
+        """
+        files = sorted(name for name in os.listdir(event_path) if capture_file_regex.match(name))
+        if len(files) == 0:
+            raise ValueError(f"No capture files found in {event_path}")
+
+        paths = [os.path.join(event_path, name) for name in files]
+        time, columns, waveforms, mismatched_range = self._read_files(paths)
+        return EventData(event_path, files, waveforms, time, columns, mismatched_range)
+
+    def _read_files(self, paths: List[str]) \
+            -> Tuple[np.ndarray, Dict[str, np.ndarray], List[str], Optional[Tuple[float, float]]]:
+        """Reads and combines the capture files.
+
+        Returns:
+            tuple: The Time column, a dictionary of signal name to column, the names of every waveform in the files,
+            and the smallest and largest times of all the files if their Time columns do not match (None if they do).
+        """
+        # Each file counts into its own ReadStats so that the threads don't share one
+        file_stats = [ReadStats() for _ in paths]
+        if self.threads > 1 and len(paths) > 1:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.threads,
+                                                                       thread_name_prefix='rf-classifier-read')
+            futures = [self._executor.submit(self._read_file, path, stats) for path, stats in zip(paths, file_stats)]
+            # Wait for them all so that every read is counted, then raise the first error in file order
+            concurrent.futures.wait(futures)
+            for stats in file_stats:
+                self.stats.add(stats)
+            results = [future.result() for future in futures]
+        else:
+            try:
+                results = [self._read_file(path, stats) for path, stats in zip(paths, file_stats)]
+            finally:
+                for stats in file_stats:
+                    self.stats.add(stats)
+
+        times = []
+        columns: Dict[str, np.ndarray] = {}
+        waveforms: List[str] = []
+        for time, file_columns, file_waveforms in results:
+            times.append(time)
+            columns.update(file_columns)
+            waveforms.extend(file_waveforms)
+
+        # rfwtools joins the files on Time.  Validated events all share the same times, so just check that.
+        rows = min(len(time) for time in times)
+        time = times[0][:rows]
+        mismatched_range = None
+        if any(not np.array_equal(time, other) for other in times[1:]):
+            # rfwtools fixes each file's times before the join, so flip each of them for the range
+            flipped = [-1 * other[::-1] if other[0] > flipped_time_threshold else other
+                       for other in times if len(other) > 0]
+            mismatched_range = (min(np.min(other) for other in flipped), max(np.max(other) for other in flipped))
+        columns = {signal: column[:rows] for signal, column in columns.items()}
+
+        # Some early events had a bug where the Time column was wrong.  Fix it the same way rfwtools does.
+        if rows > 0 and time[0] > flipped_time_threshold:
+            time = -1 * time[::-1]
+
+        return time, columns, waveforms, mismatched_range
+
+    def _read_file(self, path: str, stats: ReadStats) -> Tuple[np.ndarray, Dict[str, np.ndarray], List[str]]:
+        """Reads the Time column and the wanted signals of a single capture file, counting the read in stats.
+
+        Returns:
+            tuple: The Time column, a dictionary of signal name to column, and the signal names of all of the file's
+            waveforms.
+        """
+        with open(path, 'rb') as f:
+            stats.files += 1
+            stats.bytes_total += os.fstat(f.fileno()).st_size
+            content = f.read()
+            stats.bytes_read += len(content)
+
+        # The header is the first line that is not blank or a comment
+        skip = 0
+        start = 0
+        while True:
+            end = content.find(b'\n', start)
+            line = content[start:] if end < 0 else content[start:end]
+            if line.strip() != b'' and not line.startswith(b'#'):
+                break
+            if end < 0:
+                raise ValueError(f"Could not find the header of capture file {path}")
+            skip += 1
+            start = end + 1
+        names = line.decode('utf-8').rstrip('\r').split('\t')
+
+        # Map the file's waveform names (R1M1WFSGMES) to signal names (1_GMES)
+        usecols = ['Time']
+        signals = {}
+        waveforms = []
+        for name in names:
+            if name == 'Time':
+                continue
+            if not waveform_regex.match(name):
+                raise ValueError("Found unexpected waveform data - " + name)
+            signal = name[3] + "_" + name[7:]
+            waveforms.append(signal)
+            if signal in self.signals and name not in signals:
+                usecols.append(name)
+                signals[name] = signal
+
+        # pandas is slow to import.  Only pay for it when there is a file to parse.
+        import pandas as pd
+
+        df = pd.read_csv(io.BytesIO(content), sep="\t", comment='#', skip_blank_lines=True, dtype='float64',
+                         usecols=usecols, skiprows=skip)
+        return df['Time'].values, {signal: df[name].values for name, signal in signals.items()}, waveforms
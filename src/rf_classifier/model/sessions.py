@@ -0,0 +1,174 @@
+"""This module creates the ONNX Runtime InferenceSessions that run the cavity and fault models.
+
+A SessionConfig holds the settings of the sessions: thread counts, graph optimization level, and execution mode.  It
+only holds plain values, so it can be pickled and given to worker processes, and importing this module does not import
+onnxruntime.
+
+Creating a session optimizes the model's graph, which is repeated by every new process.  Given an optimized_model_dir,
+the optimized graph is saved there the first time and loaded as is afterwards.  The saved files are keyed by the model
+file's content, the ONNX Runtime version, the optimization level, and the CPU, since the highest level of optimization
+can include hardware specific operators.  Files for old models or versions are not removed.  Each is only a few MB.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.model import Model
+    from rf_classifier.model.sessions import SessionConfig
+
+    model = Model(session_config=SessionConfig(intra_op_threads=2, optimized_model_dir='/tmp/rf_classifier_onnx',
+                                               warm_up=True))
+"""
+import os
+import uuid
+import hashlib
+import platform
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import onnxruntime as rt
+
+optimization_levels = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+"""The supported graph optimization levels and the names of their onnxruntime.GraphOptimizationLevel values."""
+
+execution_modes = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+"""The supported execution modes and the names of their onnxruntime.ExecutionMode values."""
+
+
+class SessionConfig:
+    """The settings used to create the models' ONNX Runtime InferenceSessions."""
+
+    def __init__(self, intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None,
+                 optimization_level: str = 'all', execution_mode: str = 'sequential',
+                 optimized_model_dir: Optional[str] = None, warm_up: bool = False):
+        """Create a SessionConfig.  The defaults match ONNX Runtime's.
+
+        Args:
+            intra_op_threads: The number of threads used within an operator.  ONNX Runtime's choice if None.
+            inter_op_threads: The number of threads used across operators in parallel mode.  ONNX Runtime's if None.
+            optimization_level: The graph optimization level.  One of the keys of optimization_levels.
+            execution_mode: Whether operators are run one at a time.  One of the keys of execution_modes.
+            optimized_model_dir: The directory optimized models are saved to and loaded from.  Not saved if None.
+            warm_up: Should a Model run its sessions once on dummy input when it is created so that the first event is
+                     not slower than the rest
+        """
+        if optimization_level not in optimization_levels:
+            raise ValueError(f"Unknown graph optimization level - {optimization_level}")
+        if execution_mode not in execution_modes:
+            raise ValueError(f"Unknown execution mode - {execution_mode}")
+
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.optimization_level = optimization_level
+        self.execution_mode = execution_mode
+        self.optimized_model_dir = None if optimized_model_dir is None else os.path.abspath(optimized_model_dir)
+        self.warm_up = warm_up
+
+    def replace(self, **kwargs) -> 'SessionConfig':
+        """Creates a SessionConfig with the same settings except for those given as keyword arguments."""
+        settings = dict(intra_op_threads=self.intra_op_threads, inter_op_threads=self.inter_op_threads,
+                        optimization_level=self.optimization_level, execution_mode=self.execution_mode,
+                        optimized_model_dir=self.optimized_model_dir, warm_up=self.warm_up)
+        settings.update(kwargs)
+        return SessionConfig(**settings)
+
+    def make_options(self, optimization_level: Optional[str] = None) -> 'rt.SessionOptions':
+        """Creates the onnxruntime.SessionOptions for these settings.
+
+        Args:
+            optimization_level: Used instead of the configured level if given
+        """
+        import onnxruntime as rt
+
+        options = rt.SessionOptions()
+        if self.intra_op_threads is not None:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads is not None:
+            options.inter_op_num_threads = self.inter_op_threads
+        level = self.optimization_level if optimization_level is None else optimization_level
+        options.graph_optimization_level = getattr(rt.GraphOptimizationLevel, optimization_levels[level])
+        options.execution_mode = getattr(rt.ExecutionMode, execution_modes[self.execution_mode])
+        return options
+
+    def create_session(self, model_path: str) -> 'rt.InferenceSession':
+        """Creates an InferenceSession for an ONNX model file, using the saved optimized model if there is one.
+
+        Args:
+            model_path: The path to the ONNX model file
+
+        Returns:
+            The session.  Its outputs do not depend on whether the optimized model was loaded or made.
+        """
+        import onnxruntime as rt
+
+        optimized_path = self.get_optimized_model_path(model_path)
+        if optimized_path is None:
+            return rt.InferenceSession(model_path, sess_options=self.make_options())
+
+        # The saved model is already optimized.  Don't spend time trying again.
+        if os.path.exists(optimized_path):
+            try:
+                return rt.InferenceSession(optimized_path, sess_options=self.make_options('disable'))
+            except Exception:
+                # A damaged file.  Drop it so that it gets replaced.
+                _remove(optimized_path)
+
+        # Save to a unique name and move it into place so other processes never load a partial file.  The warning about
+        # hardware specific optimizations is handled by keying the file on the CPU.
+        os.makedirs(self.optimized_model_dir, exist_ok=True)
+        tmp = f"{optimized_path}.{uuid.uuid4().hex}.tmp"
+        options = self.make_options()
+        options.optimized_model_filepath = tmp
+        options.log_severity_level = 3
+        try:
+            session = rt.InferenceSession(model_path, sess_options=options)
+            os.replace(tmp, optimized_path)
+        finally:
+            _remove(tmp)
+        return session
+
+    def get_optimized_model_path(self, model_path: str) -> Optional[str]:
+        """Returns where the optimized version of a model file is saved, or None if optimized models are not saved."""
+        if self.optimized_model_dir is None or self.optimization_level == 'disable':
+            return None
+
+        import onnxruntime as rt
+
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for block in iter(lambda: f.read(2 ** 20), b''):
+                digest.update(block)
+        for part in (rt.__version__, self.optimization_level, ','.join(rt.get_available_providers()), _get_cpu_id()):
+            digest.update(b'\0' + part.encode('utf-8'))
+
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        return os.path.join(self.optimized_model_dir, f"{name}.{digest.hexdigest()}.onnx")
+
+
+def _get_cpu_id() -> str:
+    """Identifies the CPU's architecture and instruction set extensions, which decide the kernels ONNX Runtime uses."""
+    cpu_id = platform.machine()
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            for line in f:
+                # x86 lists its extensions as flags, ARM as features
+                if line.startswith(('flags', 'Features')):
+                    return f"{cpu_id} {line.split(':', 1)[1].strip()}"
+    except OSError:
+        pass
+    return f"{cpu_id} {platform.processor()}"
+
+
+def _remove(path: str) -> None:
+    """Removes a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,204 @@
+"""This module runs the embedded model over many fault events using a pool of worker processes.
+
+Reading, validating, and preprocessing waveform data takes far longer than model inference and only keeps a single core
+busy.  Each worker process builds its own Model once, when the pool starts, and then analyzes batches of events handed
+to it by the parent process.  Results are returned in the same order as the events were given.
+
+Every worker importing numpy, pandas, and rfwtools and loading both ONNX models multiplies the start up time and memory
+by the number of workers.  With share_model, the parent acts as a fork server instead: it imports everything and loads
+the Model once, then forks the workers, which share its pages copy-on-write for as long as neither side writes to them.
+The garbage collector is frozen before the fork so that collections in the workers do not touch those pages.  Nothing
+is shared through ONNX Runtime itself: each session keeps its own copy of its weights, including any it prepacked, and
+the forked workers share that memory only as ordinary pages.  Only what a worker writes to, like its event data and the
+ONNX Runtime memory arena, becomes its own.  Each worker reports its resident and unique memory after every batch.
+"""
+import gc
+import os
+import math
+import itertools
+import contextlib
+import collections
+import multiprocessing
+import concurrent.futures
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sized, Tuple
+
+from . import utils
+
+_model = None
+"""The Model used by a worker process.  Created by _init_worker when the worker starts, or by the parent before it forks
+the workers if the model is shared.  See shared_model."""
+
+
+class WorkerMemoryStats:
+    """Keeps the peak resident and unique memory of each worker process."""
+
+    gauges = ('peak_rss_mb', 'peak_unique_mb')
+    """The attributes that are measurements rather than counts.  See metrics.format_prometheus."""
+
+    def __init__(self):
+        self.rss_mb: Dict[int, float] = {}
+        self.unique_mb: Dict[int, float] = {}
+        self.peak_rss_mb: float = 0.0
+        self.peak_unique_mb: float = 0.0
+
+    def record(self, pid: int, rss_mb: float, unique_mb: float) -> None:
+        """Records a sample of a worker's memory use."""
+        self.rss_mb[pid] = max(self.rss_mb.get(pid, 0.0), rss_mb)
+        self.unique_mb[pid] = max(self.unique_mb.get(pid, 0.0), unique_mb)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        self.peak_unique_mb = max(self.peak_unique_mb, unique_mb)
+
+    def add(self, other: 'WorkerMemoryStats') -> None:
+        """Adds the samples of another WorkerMemoryStats to this one.  The peaks of each worker are kept."""
+        for pid in other.rss_mb:
+            self.record(pid, other.rss_mb[pid], other.unique_mb[pid])
+
+    def __str__(self) -> str:
+        if len(self.rss_mb) == 0:
+            return "Workers: none"
+        rss = sum(self.rss_mb.values()) / len(self.rss_mb)
+        unique = sum(self.unique_mb.values()) / len(self.unique_mb)
+        return (f"Workers: {len(self.rss_mb)}, mean peak RSS {rss:.1f} MB of which {unique:.1f} MB unique, "
+                f"largest unique {self.peak_unique_mb:.1f} MB")
+
+
+def _init_worker(model_kwargs: Optional[Dict[str, Any]] = None) -> None:
+    """Initializes a worker process by loading the model.  Called within the worker processes, or by the parent before
+    it forks them if the model is shared."""
+    global _model
+
+    from .model.model import Model
+    from .model.sessions import SessionConfig
+
+    # The pool provides the parallelism.  Letting every worker's ONNX sessions spin up a thread per core only leads to
+    # the workers fighting each other for the CPU.  Thread counts that were asked for are kept.
+    model_kwargs = dict(model_kwargs or {})
+    config = model_kwargs.get('session_config') or SessionConfig()
+    model_kwargs['session_config'] = config.replace(
+        intra_op_threads=1 if config.intra_op_threads is None else config.intra_op_threads,
+        inter_op_threads=1 if config.inter_op_threads is None else config.inter_op_threads)
+    _model = Model(**model_kwargs)
+
+
+@contextlib.contextmanager
+def shared_model(model_kwargs: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    """Loads the Model that iter_run_model_parallel forks its workers from with share_model, and keeps it until the
+    block exits.
+
+    Without it, each iter_run_model_parallel call loads a Model of its own and lets go of it when done.  Callers that
+    start several pools, like a backfill's chunks, load it once this way instead.
+
+    Args:
+        model_kwargs: Extra keyword arguments given to the Model.  Those of the iter_run_model_parallel calls are then
+                      not used.
+    """
+    global _model
+
+    _init_worker(model_kwargs)
+    try:
+        yield
+    finally:
+        _model = None
+
+
+def _analyze_batch(events: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Analyzes a batch of events with the worker's model.  Only called within the worker processes.
+
+    Returns:
+        tuple: The results and the model's stats for the batch, along with the worker's memory use under 'workers'.  See
+        Model.get_stats.
+    """
+    from .backfill import get_rss_mb, get_unique_mb
+
+    _model.reset_stats()
+    results = _model.analyze_batch(events)
+    stats = _model.get_stats()
+    stats['workers'] = WorkerMemoryStats()
+    stats['workers'].record(os.getpid(), get_rss_mb(), get_unique_mb())
+    return results, stats
+
+
+def iter_run_model_parallel(events: Iterable[str], jobs: int, batch_size: int = 16, mp_context: Optional[Any] = None,
+                            model_kwargs: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None,
+                            share_model: bool = False) -> Iterator[Dict[str, Any]]:
+    """Analyzes the events using a pool of worker processes, yielding the results as they become available.
+
+    Events are split into batches that are spread across the workers.  When the number of events is known, batches are
+    made smaller than batch_size if needed to give every worker something to do.  Only a few batches per worker are
+    handed out ahead of the results being consumed, so memory use does not grow with the number of events.
+
+    Args:
+        events: The paths to the fault event directories.  Any iterable, including a generator, will do.
+        jobs: The number of worker processes to use
+        batch_size: The maximum number of events a worker analyzes together
+        mp_context: The multiprocessing context used to start the workers.  Python's default if None.  Must be None or
+                    a fork context if share_model.
+        model_kwargs: Extra keyword arguments given to each worker's Model, e.g. a feature_cache
+        stats: The workers' stats are added to this dictionary if given.  See Model.get_stats and WorkerMemoryStats.
+        share_model: Load the Model in this process and fork the workers from it so that they share its memory.  The
+                     Model loaded by an enclosing shared_model is used if there is one.
+
+    Returns:
+        An iterator over the result dictionaries in the same order as events.  Failed events get the same error
+        dictionaries as Model.analyze_batch produces.
+    """
+    global _model
+
+    size = batch_size
+    if isinstance(events, Sized):
+        size = max(1, min(batch_size, math.ceil(len(events) / jobs)))
+    events = iter(events)
+
+    initializer, initargs = _init_worker, (model_kwargs,)
+    if share_model:
+        if mp_context is None:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise ValueError("Sharing the model with the worker processes needs the fork start method")
+            mp_context = multiprocessing.get_context('fork')
+        elif mp_context.get_start_method() != 'fork':
+            raise ValueError(f"Sharing the model with the worker processes needs the fork start method, not"
+                             f" {mp_context.get_start_method()}")
+
+        # The workers inherit the loaded model.  Freezing the garbage collector keeps the objects that exist now out of
+        # the collections done by the workers, which would otherwise write to, and so copy, the pages holding them.
+        owns_model = _model is None
+        if owns_model:
+            _init_worker(model_kwargs)
+        initializer, initargs = None, ()
+        gc.freeze()
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context,
+                                                    initializer=initializer, initargs=initargs) as executor:
+            # Batches are submitted and collected in order, so results come back in the order of events
+            futures = collections.deque()
+            while True:
+                while len(futures) < 2 * jobs:
+                    batch = list(itertools.islice(events, size))
+                    if len(batch) == 0:
+                        break
+                    futures.append(executor.submit(_analyze_batch, batch))
+
+                if len(futures) == 0:
+                    return
+                results, batch_stats = futures.popleft().result()
+                if stats is not None:
+                    utils.add_stats(stats, batch_stats)
+                yield from results
+    finally:
+        if share_model:
+            gc.unfreeze()
+            if owns_model:
+                _model = None
+
+
+def run_model_parallel(events: List[str], jobs: int, batch_size: int = 16, mp_context: Optional[Any] = None,
+                       model_kwargs: Optional[Dict[str, Any]] = None, stats: Optional[Dict[str, Any]] = None,
+                       share_model: bool = False) -> List[Dict[str, Any]]:
+    """Analyzes the events using a pool of worker processes.  See iter_run_model_parallel for details.
+
+    Returns:
+        A list with one result dictionary per event in the same order as events.
+    """
+    return list(iter_run_model_parallel(events, jobs=jobs, batch_size=batch_size, mp_context=mp_context,
+                                        model_kwargs=model_kwargs, stats=stats, share_model=share_model))
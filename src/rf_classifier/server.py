@@ -0,0 +1,176 @@
+"""This module provides a classification server that keeps the embedded model loaded between requests.
+
+Starting the application, importing its dependencies, and loading the ONNX models takes seconds, while classifying a
+fault event takes a fraction of that.  The server pays the start up cost once and then answers analysis requests sent to
+it over HTTP on the local host.  Each request is handled in its own thread by a copy of the model that shares the loaded
+ONNX sessions.
+
+Requests and responses are JSON.
+::
+
+    POST /analyze  {"events": ["/path/to/zone/date/time", ...], "deployment": "ops"}
+                   => {"data": [<result>, ...]}
+    GET  /status   => {"name": "rf_classifier", "version": "2.0.0", "model": "cnn_lstm_v1_0"}
+
+The client functions only rely on the standard library, so forwarding a request to a running server is quick.
+"""
+import sys
+import json
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+host = '127.0.0.1'
+"""The address the server listens on.  The server is only reachable from the local host."""
+
+default_port = 8350
+"""The default port the server listens on."""
+
+
+class ModelServer(ThreadingHTTPServer):
+    """An HTTP server that analyzes fault events with a model that stays loaded between requests."""
+
+    daemon_threads = True
+
+    def __init__(self, model, port: int = default_port, batch_size: int = 16):
+        """Create the server and bind it to the local host.
+
+        Args:
+            model (rf_classifier.model.model.Model): The loaded model.  Each request is handled by a copy of it.
+            port: The port to listen on.  Zero picks a free port.
+            batch_size: The number of events the model analyzes together.
+        """
+        super().__init__((host, port), _RequestHandler)
+        self.model = model
+        self.batch_size = batch_size
+        self.model_id = model.model_id
+
+    def analyze(self, events: List[str], deployment: str = 'ops') -> List[Dict[str, Any]]:
+        """Analyze the events using a copy of the server's model.  Safe to call from several threads at once."""
+        model = self.model.copy()
+        return list(model.iter_analyze(events, batch_size=self.batch_size, deployment=deployment))
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests made to a ModelServer."""
+
+    server: ModelServer
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._send_json(200, {'name': 'rf_classifier', 'version': _app_version(), 'model': self.server.model_id})
+        else:
+            self._send_json(404, {'error': f"Unknown resource - {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self._send_json(404, {'error': f"Unknown resource - {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            events = request['events']
+            deployment = request.get('deployment', 'ops')
+            if not isinstance(events, list) or not all(isinstance(event, str) for event in events):
+                raise ValueError("events must be a list of paths")
+        except (ValueError, KeyError, TypeError, AttributeError) as ex:
+            self._send_json(400, {'error': f"Bad request - {ex}"})
+            return
+
+        self._send_json(200, {'data': self.server.analyze(events, deployment=deployment)})
+
+    def _send_json(self, status: int, content: Dict[str, Any]):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _app_version() -> str:
+    """Returns the application version string."""
+    from .main import version
+    return version
+
+
+def get_server_url(port: Optional[int] = None) -> str:
+    """Returns the base URL of a server running on the local host at the given port (default_port if None)."""
+    return f"http://{host}:{default_port if port is None else port}"
+
+
+def serve(port: Optional[int] = None, batch_size: int = 16, session_options: Optional[Any] = None,
+          session_config: Optional[Any] = None, precision: str = 'fp32') -> None:
+    """Load the model and answer analysis requests until interrupted.
+
+    Args:
+        port: The port to listen on.  default_port if None.
+        batch_size: The number of events the model analyzes together
+        session_options (onnxruntime.SessionOptions): The options for the model's ONNX sessions.  Used instead of
+            session_config if given.
+        session_config (SessionConfig): The settings of the model's ONNX sessions.  Defaults if None.
+        precision: The precision of the model files to run, 'fp32' or 'int8'
+    """
+    from .model.model import Model
+
+    model = Model(session_options=session_options, session_config=session_config, precision=precision)
+    server = ModelServer(model, port=default_port if port is None else port,
+                         batch_size=batch_size)
+    print(f"Serving {server.model_id} at {get_server_url(server.server_address[1])}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def analyze_remote(events: List[str], url: str, deployment: str = 'ops', timeout: Optional[float] = None) \
+        -> Dict[str, Any]:
+    """Has a running server analyze the events.
+
+    Args:
+        events: The paths to the fault event directories.  These are resolved by the server, so they should be absolute.
+        url: The base URL of the server, e.g. http://127.0.0.1:8350
+        deployment: Which MYA deployment the server uses when validating cavity operating modes
+        timeout: How many seconds to wait for the server to respond.  Wait indefinitely if None.
+
+    Returns:
+        The results in the same {'data': [...]} format produced by run_model.
+
+    Raises:
+        ConnectionError: if the server could not be reached
+        RuntimeError: if the server rejects the request
+    """
+    data = json.dumps({'events': events, 'deployment': deployment}).encode('utf-8')
+    request = urllib.request.Request(f"{url}/analyze", data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as ex:
+        raise RuntimeError(f"Server rejected request - {ex.read().decode('utf-8', errors='replace')}") from ex
+    except (urllib.error.URLError, OSError) as ex:
+        raise ConnectionError(f"Could not reach server at {url} - {ex}") from ex
+
+
+def is_server_running(url: str, timeout: float = 1.0) -> bool:
+    """Checks if a classification server is answering at url."""
+    try:
+        with urllib.request.urlopen(f"{url}/status", timeout=timeout) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def get_server_model_id(url: str, timeout: float = 1.0) -> Optional[str]:
+    """Returns the model id of the classification server answering at url, or None if none is answering.
+
+    The server runs one model at one precision.  Compare this to description.get_model_id before sending it events.
+    """
+    try:
+        with urllib.request.urlopen(f"{url}/status", timeout=timeout) as response:
+            return json.loads(response.read()).get('model') if response.status == 200 else None
+    except (urllib.error.URLError, OSError, ValueError, AttributeError):
+        return None
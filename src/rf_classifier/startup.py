@@ -0,0 +1,95 @@
+"""This module measures where rf_classifier's start up time goes.
+
+cron starts a new rf_classifier process for every run, so the time spent importing numpy, pandas, rfwtools, and ONNX
+Runtime is paid again each time.  The commands only import what they need when they first need it.  An ImportProfiler
+times each of those imports so that regressions in cold start cost are easy to spot.  It is enabled with the
+--startup-profile option, e.g.
+::
+
+    bin/rf_classifier.bash --startup-profile analyze /path/to/event
+
+Only the import statement that triggered the loading of new modules is reported.  The time of the modules it pulled in
+along the way is included in it.  Use python's -X importtime option for a module by module breakdown.
+"""
+import sys
+import time
+import builtins
+import threading
+from importlib.util import resolve_name
+from typing import List, Optional, Tuple
+
+
+class ImportProfiler:
+    """Times the import statements that load new modules by wrapping builtins.__import__."""
+
+    def __init__(self, start: Optional[float] = None):
+        """Create an ImportProfiler.  Nothing is timed until it is installed.
+
+        Args:
+            start: The time.perf_counter() value the total start up time is measured from.  Now if None.
+        """
+        self.start: float = time.perf_counter() if start is None else start
+        self.records: List[Tuple[str, float, int]] = []
+        """The name, seconds, and number of modules loaded of each import that loaded something."""
+
+        self._original = None
+        self._local = threading.local()
+
+    def install(self) -> None:
+        """Starts timing imports."""
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        """Stops timing imports."""
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """Stands in for builtins.__import__.  Only the outermost import of each thread is timed."""
+        if getattr(self._local, 'depth', 0) > 0:
+            return self._original(name, globals, locals, fromlist, level)
+
+        modules = len(sys.modules)
+        start = time.perf_counter()
+        self._local.depth = 1
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = 0
+            loaded = len(sys.modules) - modules
+            if loaded > 0:
+                self.records.append((self._get_name(name, globals, level), time.perf_counter() - start, loaded))
+
+    @staticmethod
+    def _get_name(name: str, globals: Optional[dict], level: int) -> str:
+        """Returns the absolute name of the imported module."""
+        if level == 0:
+            return name
+        try:
+            return resolve_name('.' * level + name, globals['__package__'])
+        except (KeyError, TypeError, ImportError, ValueError):
+            return '.' * level + name
+
+    def get_report(self, limit: int = 15) -> str:
+        """Summarizes the start up time and lists the slowest imports.
+
+        Args:
+            limit: The most imports to list
+
+        Returns:
+            The report as a multi-line string
+        """
+        total = time.perf_counter() - self.start
+        imported = sum(seconds for name, seconds, loaded in self.records)
+        modules = sum(loaded for name, seconds, loaded in self.records)
+        lines = [f"Startup profile: {total:.3f} s total, {imported:.3f} s importing {modules} modules"]
+        for name, seconds, loaded in sorted(self.records, key=lambda record: record[1], reverse=True)[:limit]:
+            lines.append(f"  {seconds:8.3f} s  {name} ({loaded} modules)")
+        return "\n".join(lines)
+
+    def print_report(self, limit: int = 15) -> None:
+        """Prints the report to standard error.  See get_report."""
+        print(self.get_report(limit), file=sys.stderr)
@@ -0,0 +1,206 @@
+"""This module keeps the results of analyzed events in a SQLite database so that reruns only do the missing work.
+
+Results written to standard out are gone once a run ends, so rerunning a backfill that stopped part way, or one that
+overlaps an earlier one, classifies every event again.  A ResultStore saves each successful result keyed by its zone,
+timestamp, and model id (the result's 'model' field), so the results of different model versions and precisions are
+kept side by side.  Results are written in batches, one transaction each.  Several processes may share a store.
+
+Events that could not be analyzed are not stored, so they are tried again by the next run.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.main import iter_run_model
+    from rf_classifier.model.description import get_model_id
+    from rf_classifier.store import ResultStore
+
+    with ResultStore('results.sqlite') as store:
+        events = store.iter_missing(paths, get_model_id())
+        for result in iter_run_model(events, store=store):
+            print(result)
+        for result in store.query(zones=['1L25'], model=get_model_id()):
+            print(result)
+"""
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import utils
+
+schema_version = 1
+"""Saved as the database's user_version.  Bump it when the schema changes."""
+
+timestamp_format = "%Y-%m-%d %H:%M:%S.%f"
+"""The format of the stored timestamps, less the last five digits.  The same as the results' timestamps."""
+
+
+class StoreStats:
+    """Counts the results stored in and the events skipped because of a ResultStore."""
+
+    def __init__(self):
+        self.stored: int = 0
+        self.skipped: int = 0
+        self.transactions: int = 0
+
+    def add(self, other: 'StoreStats') -> None:
+        """Adds the counts of another StoreStats to this one."""
+        self.stored += other.stored
+        self.skipped += other.skipped
+        self.transactions += other.transactions
+
+    def __str__(self) -> str:
+        return (f"Result store: {self.stored} results stored in {self.transactions} transactions, "
+                f"{self.skipped} events skipped")
+
+
+class ResultStore:
+    """Saves the results of analyzed events to a SQLite database, keyed by zone, timestamp, and model id.
+
+    A ResultStore is not thread safe.  Give each thread or process its own.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, timeout: float = 60.0):
+        """Create a ResultStore.  The database is created if needed.
+
+        Args:
+            path: The SQLite database file
+            batch_size: The number of results iter_store() writes in each transaction
+            timeout: The most seconds to wait for another process to finish writing to the database
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.stats = StoreStats()
+        self._connection = sqlite3.connect(path, timeout=timeout)
+
+        # Let other processes read while one writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    zone TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    cavity_label TEXT,
+                    cavity_confidence REAL,
+                    fault_label TEXT,
+                    fault_confidence REAL,
+                    result TEXT NOT NULL,
+                    stored TEXT NOT NULL,
+                    PRIMARY KEY (zone, timestamp, model)
+                )""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_by_model ON results (model, timestamp)")
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version == 0:
+                self._connection.execute(f"PRAGMA user_version={schema_version}")
+            elif version != schema_version:
+                raise RuntimeError(f"Result store {path} has schema version {version}, not {schema_version}")
+
+    def close(self) -> None:
+        """Closes the database."""
+        self._connection.close()
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def put(self, results: List[Dict[str, Any]]) -> int:
+        """Saves the successful results in a single transaction, replacing any of the same event and model.
+
+        Args:
+            results: Result dictionaries as made by Model.analyze_batch.  Error results are ignored.
+
+        Returns:
+            The number of results stored
+        """
+        stored = datetime.now().isoformat(timespec='seconds')
+        rows = [(result['location'], result['timestamp'], result['model'], result.get('cavity-label'),
+                 result.get('cavity-confidence'), result.get('fault-label'), result.get('fault-confidence'),
+                 json.dumps(result), stored)
+                for result in results if 'error' not in result and 'model' in result]
+        if len(rows) == 0:
+            return 0
+
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self.stats.stored += len(rows)
+        self.stats.transactions += 1
+        return len(rows)
+
+    def get(self, zone: str, timestamp: str, model: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored result of an event made by a model, or None if there is not one."""
+        row = self._connection.execute("SELECT result FROM results WHERE zone = ? AND timestamp = ? AND model = ?",
+                                       (zone, timestamp, model)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def contains(self, path: str, model: str) -> bool:
+        """Checks if the event at path has a result made by model.  Paths that do not name an event never do."""
+        try:
+            zone, timestamp = utils.path_to_zone_and_timestamp(path, fmt=timestamp_format)
+        except (ValueError, IndexError):
+            return False
+        return self._connection.execute("SELECT 1 FROM results WHERE zone = ? AND timestamp = ? AND model = ?",
+                                        (zone, timestamp, model)).fetchone() is not None
+
+    def iter_missing(self, events: Iterable[str], model: str) -> Iterator[str]:
+        """Yields the events that do not yet have a result made by model, counting the others as skipped.
+
+        The store is checked as each event is reached, so events stored by another process in the meantime are skipped
+        too.
+
+        Args:
+            events: The paths to the fault event directories.  Any iterable, including a generator, will do.
+            model: The model id of the results looked for.  See description.get_model_id.
+        """
+        for event in events:
+            if self.contains(event, model):
+                self.stats.skipped += 1
+            else:
+                yield event
+
+    def iter_store(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Passes the results through, saving them in transactions of batch_size results.
+
+        Whatever is left over is saved when results run out or the iterator is closed.
+        """
+        pending = []
+        try:
+            for result in results:
+                pending.append(result)
+                yield result
+                if len(pending) >= self.batch_size:
+                    self.put(pending)
+                    pending = []
+        finally:
+            self.put(pending)
+
+    def query(self, zones: Optional[List[str]] = None, since: Optional[datetime] = None,
+              until: Optional[datetime] = None, model: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yields the stored results in order of timestamp and zone.
+
+        Args:
+            zones: Only the results of these zones.  All zones if None.
+            since: Only the results of events at or after this time
+            until: Only the results of events before this time
+            model: Only the results made by this model id.  Those of every model if None.
+        """
+        clauses = []
+        params: List[Any] = []
+        if zones is not None:
+            clauses.append(f"zone IN ({', '.join('?' for _ in zones)})")
+            params.extend(zones)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since.strftime(timestamp_format)[:-5])
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until.strftime(timestamp_format)[:-5])
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+
+        where = f" WHERE {' AND '.join(clauses)}" if len(clauses) > 0 else ""
+        for row in self._connection.execute(f"SELECT result FROM results{where} ORDER BY timestamp, zone", params):
+            yield json.loads(row[0])
@@ -0,0 +1,194 @@
+"""This module writes synthetic fault events for tests and benchmarks that must run without the waveform browser.
+
+An event is laid out like the harvester's: <root>/<zone>/<YYYY_MM_DD>/<hhmmss.S> holding one WFSharv capture file per
+cavity.  Each file has a Time column followed by the seventeen waveforms of its cavity, sampled every 0.2 ms from
+-1536 ms by default.  The waveforms are steady with a little noise, except for one cavity whose gradient collapses at
+the fault (t = 0).  They pass the model's validation and give it something to classify, but make no claim to be physics.
+
+The cavity modes checked by validation can be given offline with write_mode_archive, which writes a file for
+FileArchive (or --mode-archive) in which every cavity is in GDR mode.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.synthetic import write_events, write_mode_archive
+
+    paths = write_events('/tmp/events', 100)
+    write_mode_archive('/tmp/events/cavity-modes.json', ['1L25'])
+"""
+import os
+import io
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+
+waveforms = ["IMES", "QMES", "GMES", "PMES", "IASK", "QASK", "GASK", "PASK", "CRFP", "CRFPP", "CRRP", "CRRPP", "GLDE",
+             "PLDE", "DETA2", "CFQE2", "DFQES"]
+"""The waveforms of each capture file in the order of the harvester's columns."""
+
+default_datetime = datetime(2023, 2, 1, 21, 0, 26, 100000)
+"""The time of the first synthetic event unless another is given."""
+
+
+def get_zone_prefix(zone: str) -> str:
+    """Returns the EPICS prefix of a C100 zone, e.g. R1P for 1L25.
+
+    Raises:
+        ValueError: if zone is not a C100 zone (1L22-1L26 or 2L22-2L26)
+    """
+    if len(zone) != 4 or zone[0] not in "12" or zone[1] != "L" or not zone[2:].isdigit() or \
+            not 22 <= int(zone[2:]) <= 26:
+        raise ValueError(f"Not a C100 zone - {zone}")
+    return f"R{zone[0]}{chr(ord('M') + int(zone[2:]) - 22)}"
+
+
+def make_capture_file(prefix: str, cavity: int, time: np.ndarray, rng: np.random.Generator,
+                      faulted: bool = False) -> str:
+    """Makes the content of a cavity's capture file.
+
+    Args:
+        prefix: The zone's EPICS prefix, e.g. R1P
+        cavity: The cavity number (1-8)
+        time: The Time column in ms
+        rng: The source of the cavity's settings and noise
+        faulted: Does the cavity's gradient collapse at t = 0
+
+    Returns:
+        The tab separated content of the file
+    """
+    n = len(time)
+    noise = rng.standard_normal((len(waveforms), n))
+    gradient = rng.uniform(5.0, 18.0)
+    phase = rng.uniform(-180.0, 180.0)
+    envelope = np.ones(n)
+    if faulted:
+        after = time > 0
+        envelope[after] = np.exp(-time[after] / rng.uniform(2.0, 50.0))
+
+    gmes = gradient * envelope + 0.005 * noise[2]
+    pmes = phase + 0.05 * noise[3]
+    gask = gradient / 8 * (2 - envelope) + 0.02 * noise[6]
+    crfp = gradient / 12 * envelope + 0.01 * noise[8]
+    crrp = gradient / 12 * (1 - envelope) + 1.0 + 0.01 * noise[10]
+    deta2 = 15 * (1 - envelope) * np.sin(time / 3) + 0.3 * noise[14]
+    columns = [
+        np.round(1700 * gmes * np.cos(np.radians(pmes))),
+        np.round(1700 * gmes * np.sin(np.radians(pmes))),
+        gmes,
+        pmes,
+        np.round(1500 * gask + 200 * noise[4]),
+        np.round(-4500 + 200 * noise[5]),
+        gask,
+        -50 + 2 * noise[7],
+        crfp,
+        -22 + 0.3 * noise[9],
+        crrp,
+        -106 + 0.5 * noise[11],
+        0.0005 * noise[12],
+        0.06 * noise[13],
+        deta2,
+        deta2 / 3 + 0.1 * noise[15],
+        np.where(time > 0, 0.01 * noise[16], 0.0),
+    ]
+
+    f = io.StringIO()
+    header = "\t".join(["Time"] + [f"{prefix}{cavity}WFS{waveform}" for waveform in waveforms])
+    np.savetxt(f, np.column_stack([time] + columns), fmt="%.6g", delimiter="\t", header=header, comments="")
+    return f.getvalue()
+
+
+def write_event(root: str, zone: str = "1L25", dt: datetime = default_datetime, n_samples: int = 8192,
+                start: float = -1536.0, step: float = 0.2, fault_cavity: Optional[int] = None,
+                seed: Optional[int] = None) -> str:
+    """Writes a synthetic event.
+
+    Args:
+        root: The data directory holding the zone directories
+        zone: The event's zone
+        dt: The event's time.  Only tenths of a second are kept.
+        n_samples: The number of samples of each waveform
+        start: The time of the first sample in ms
+        step: The time between samples in ms
+        fault_cavity: The cavity (1-8) whose gradient collapses.  A random one if None.
+        seed: Seeds the waveforms.  Events with the same seed have the same waveforms.
+
+    Returns:
+        The absolute path of the event directory
+    """
+    return _write_event(root, zone, dt, _make_event_content(zone, n_samples, start, step, fault_cavity, seed))
+
+
+def write_events(root: str, count: int, zone: str = "1L25", dt: datetime = default_datetime,
+                 interval: timedelta = timedelta(minutes=1), distinct: int = 16, seed: int = 0, **kwargs) -> List[str]:
+    """Writes a number of synthetic events, one every interval starting at dt.
+
+    Formatting the waveforms takes far longer than writing them, so only the first distinct events get waveforms of
+    their own.  Later events reuse their content, which is fine for timing.
+
+    Args:
+        root: The data directory holding the zone directories
+        count: The number of events
+        zone: The zone of the events
+        dt: The time of the first event
+        interval: The time between events
+        distinct: The number of events with their own waveforms
+        seed: Seeds the waveforms
+        kwargs: Passed to write_event, e.g. n_samples
+
+    Returns:
+        The absolute paths of the event directories in time order
+    """
+    contents = []
+    paths = []
+    for i in range(count):
+        if i < distinct:
+            contents.append(_make_event_content(zone, seed=seed + i, **kwargs))
+        paths.append(_write_event(root, zone, dt + i * interval, contents[i % distinct]))
+    return paths
+
+
+def write_mode_archive(path: str, zones: List[str], begin: datetime = datetime(2000, 1, 1)) -> None:
+    """Writes a FileArchive JSON file in which every cavity of the zones is in GDR mode and none are bypassed from
+    begin.
+
+    Args:
+        path: The file to write
+        zones: The zones to include
+        begin: The time of the single archived update of each PV
+    """
+    t = begin.isoformat(sep=" ")
+    pvs = {}
+    for zone in zones:
+        prefix = get_zone_prefix(zone)
+        pvs[f"{prefix}XMOUT"] = [[t, 0]]
+        for cavity in range(1, 9):
+            pvs[f"{prefix}{cavity}GSET"] = [[t, 12.5]]
+            pvs[f"{prefix}{cavity}CNTL2MODE"] = [[t, 4]]
+    with open(path, "w") as f:
+        json.dump({"pvs": pvs}, f)
+
+
+def _make_event_content(zone: str, n_samples: int = 8192, start: float = -1536.0, step: float = 0.2,
+                        fault_cavity: Optional[int] = None, seed: Optional[int] = None) -> List[str]:
+    """Makes the content of the eight capture files of an event."""
+    rng = np.random.default_rng(seed)
+    prefix = get_zone_prefix(zone)
+    time = np.round(start + step * np.arange(n_samples), 6)
+    if fault_cavity is None:
+        fault_cavity = int(rng.integers(1, 9))
+    return [make_capture_file(prefix, cavity, time, rng, faulted=(cavity == fault_cavity)) for cavity in range(1, 9)]
+
+
+def _write_event(root: str, zone: str, dt: datetime, contents: List[str]) -> str:
+    """Writes the capture files of an event into its directory."""
+    tenths = dt.microsecond // 100000
+    path = os.path.abspath(os.path.join(root, zone, dt.strftime("%Y_%m_%d"), f"{dt.strftime('%H%M%S')}.{tenths}"))
+    os.makedirs(path, exist_ok=True)
+    prefix = get_zone_prefix(zone)
+    for cavity, content in enumerate(contents, start=1):
+        name = f"{prefix}{cavity}WFSharv.{dt.strftime('%Y_%m_%d_%H%M%S')}.{tenths}.txt"
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+    return path
@@ -1,38 +1,57 @@
 import re
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
+_time_pattern = re.compile(r'\d\d\d\d\d\d\.\d')
+"""Matches the start of an event path's time directory.  Compiled once instead of on every call."""
 
-def path_to_datetime(path):
-    """Returns the datetime object associated with an event path.
+_date_pattern = re.compile(r'\d\d\d\d_\d\d_\d\d')
+"""Matches the start of an event path's date directory."""
 
-        Args:
-            path (str): The path on the filesystem matching a fault event directory.  Ending in .../<date>/<time> where
-                        <date> is of the format YYYY_MM_DD and <time> is formatted hhmmss.S
+date_regex = re.compile(r"\d\d\d\d_\d\d_\d\d$")
+"""A regex for matching the date directories of an event path."""
 
-        Returns:
-            datetime: A datetime object corresponding to the event timestamp embedded in the supplied path
+time_regex = re.compile(r"\d\d\d\d\d\d\.\d$")
+"""A regex for matching the time directories of an event path."""
 
-        Raises:
-            ValueError: if the path is not of the expected format
-    """
 
-    time_pattern = re.compile(r'\d\d\d\d\d\d\.\d')
-    date_pattern = re.compile(r'\d\d\d\d_\d\d_\d\d')
+def _parse_event_path(path):
+    """Splits an event path into its zone and datetime.  See path_to_zone_and_timestamp."""
     path = os.path.abspath(path).split(os.path.sep)
 
     time = str(path[-1])
     date = str(path[-2])
-    if not time_pattern.match(time):
+    if not _time_pattern.match(time):
         raise ValueError("Path includes invalid time format - " + time)
 
-    if not date_pattern.match(date):
+    if not _date_pattern.match(date):
         raise ValueError("Path includes invalid date format - " + date)
 
+    return str(path[-3]), _to_datetime(date, time)
+
+
+def _to_datetime(date, time):
+    """Converts the names of an event's YYYY_MM_DD date and hhmmss.S time directories to a datetime."""
     return datetime(year=int(date[0:4]), month=int(date[5:7]), day=int(date[8:10]), hour=int(time[0:2]),
                     minute=int(time[2:4]), second=int(time[4:6]), microsecond=int(time[7:8]) * 100000)
 
 
+def path_to_datetime(path):
+    """Returns the datetime object associated with an event path.
+
+        Args:
+            path (str): The path on the filesystem matching a fault event directory.  Ending in .../<date>/<time> where
+                        <date> is of the format YYYY_MM_DD and <time> is formatted hhmmss.S
+
+        Returns:
+            datetime: A datetime object corresponding to the event timestamp embedded in the supplied path
+
+        Raises:
+            ValueError: if the path is not of the expected format
+    """
+    return _parse_event_path(path)[1]
+
+
 def path_to_zone_and_timestamp(path, fmt="%Y-%m-%d %H:%M:%S.%f"):
     """Returns a tuple containing the event zone and timestamp.
 
@@ -46,21 +65,84 @@ def path_to_zone_and_timestamp(path, fmt="%Y-%m-%d %H:%M:%S.%f"):
         Raises:
             ValueError: if the path is not of the expected format
     """
+    zone, dt = _parse_event_path(path)
+    return zone, dt.strftime(fmt)[:-5]
 
-    time_pattern = re.compile(r'\d\d\d\d\d\d\.\d')
-    date_pattern = re.compile(r'\d\d\d\d_\d\d_\d\d')
-    path = os.path.abspath(path).split(os.path.sep)
 
-    time = str(path[-1])
-    date = str(path[-2])
-    zone = str(path[-3])
-    if not time_pattern.match(time):
-        raise ValueError("Path includes invalid time format - " + time)
+def list_dirs(path, pattern=None):
+    """Returns the sorted names of the directories in path, only those matching pattern if given.
 
-    if not date_pattern.match(date):
-        raise ValueError("Path includes invalid date format - " + date)
+        Args:
+            path (str): The directory to list.  An empty list is returned if it does not exist.
+            pattern (re.Pattern): The regex the names must match
 
-    dt = datetime(year=int(date[0:4]), month=int(date[5:7]), day=int(date[8:10]), hour=int(time[0:2]),
-                  minute=int(time[2:4]), second=int(time[4:6]), microsecond=int(time[7:8]) * 100000)
+        Returns:
+            list: The sorted directory names
+    """
+    names = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if (pattern is None or pattern.match(entry.name)) and entry.is_dir():
+                    names.append(entry.name)
+    except FileNotFoundError:
+        pass
+    return sorted(names)
 
-    return zone, dt.strftime(fmt)[:-5]
+
+def find_events(data_root, zones=None, since=None, until=None):
+    """Yields the paths of the fault events under a harvester data directory, zone by zone in time order.
+
+        The directories are laid out as <data_root>/<zone>/<YYYY_MM_DD>/<hhmmss.S>.  Date directories entirely outside
+        of the time range are skipped without being read, and paths are yielded as they are found so that analysis can
+        start before the walk is done.
+
+        Args:
+            data_root (str): The directory containing the zone directories
+            zones (list:str): The zones to search.  All zones if None.
+            since (datetime): Only events at or after this time.  No limit if None.
+            until (datetime): Only events before this time.  No limit if None.
+
+        Returns:
+            iterator: The absolute paths of the event directories
+    """
+    data_root = os.path.abspath(data_root)
+    for zone in list_dirs(data_root) if zones is None else sorted(zones):
+        zone_dir = os.path.join(data_root, zone)
+        for date in list_dirs(zone_dir, date_regex):
+            # A date directory holds the events from its midnight up to the next one
+            try:
+                day = datetime(year=int(date[0:4]), month=int(date[5:7]), day=int(date[8:10]))
+            except ValueError:
+                continue
+            if (since is not None and day + timedelta(days=1) <= since) or (until is not None and day >= until):
+                continue
+
+            date_dir = os.path.join(zone_dir, date)
+            for time in list_dirs(date_dir, time_regex):
+                if since is not None or until is not None:
+                    try:
+                        dt = _to_datetime(date, time)
+                    except ValueError:
+                        continue
+                    if (since is not None and dt < since) or (until is not None and dt >= until):
+                        continue
+                yield os.path.join(date_dir, time)
+
+
+def add_stats(total, stats):
+    """Adds the counters of a Model's get_stats() to a running total.
+
+        Args:
+            total (dict): The running total.  Updated in place.  Counters not yet in it are copied in.
+            stats (dict): The counters to add, e.g. {'read': ReadStats, 'cache': CacheStats}
+
+        Returns:
+            None
+    """
+    for key, value in stats.items():
+        if key in total:
+            total[key].add(value)
+        else:
+            total[key] = type(value)()
+            total[key].add(value)
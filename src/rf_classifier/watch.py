@@ -0,0 +1,252 @@
+"""This module watches the harvester's data directory and classifies new fault events as they are written.
+
+The harvester writes the capture files of a fault event to <data_root>/<zone>/<YYYY_MM_DD>/<hhmmss.S>/, one file per
+cavity.  The watcher polls the tree with os.scandir, only looking at the dates and times that come after the last event
+it handled in each zone.  An event is classified once all eight capture files are present and have stopped changing, or
+once it has not changed for a while (e.g., an IOC never wrote its file).  Results are appended to a JSON lines file as
+they are produced along with the number of seconds between the last capture file write and the result being written.
+
+The last event handled in each zone is saved to a checkpoint file so that a restarted watcher picks up where it left off
+without scanning or classifying history.
+
+Basic Usage Example:
+::
+
+    from rf_classifier.model.model import Model
+    from rf_classifier.watch import EventWatcher
+
+    with open('results.jsonl', 'a') as sink:
+        watcher = EventWatcher('/usr/opsdata/waveforms/data/rf', sink, Model(), checkpoint='results.checkpoint')
+        watcher.run()
+"""
+import os
+import re
+import sys
+import json
+import time
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+from .utils import date_regex, list_dirs, time_regex
+
+capture_file_regex = re.compile(r"R.*harv\..*\.txt")
+"""A regex for matching capture file filenames.  Same as the one used by rfwtools."""
+
+num_capture_files = 8
+"""The number of capture files in a complete fault event.  One per cavity."""
+
+
+class EventWatcher:
+    """Polls a harvester data directory for new fault events and classifies them with a resident model."""
+
+    def __init__(self, data_root: str, sink: IO[str], model, checkpoint: Optional[str] = None,
+                 zones: Optional[List[str]] = None, settle: float = 1.0, timeout: float = 60.0,
+                 include_existing: bool = False, deployment: str = 'ops', metrics_file: Optional[str] = None,
+                 metrics_format: Optional[str] = None):
+        """Create an EventWatcher.
+
+        Args:
+            data_root: The directory containing the harvester's zone directories
+            sink: A text stream that results are written to as JSON lines
+            model (rf_classifier.model.model.Model): The model used to classify events
+            checkpoint: A file where the last event handled in each zone is saved.  Progress is not saved if None.
+            zones: The zones to watch.  All zones under data_root if None.
+            settle: The number of seconds a complete event's files must be unchanged before it is classified
+            timeout: The number of seconds after which an incomplete event that stopped changing is classified anyway
+            include_existing: Should events that exist before the first poll be classified.  Only applies when there
+                              is no checkpoint to pick up from.
+            deployment: Which MYA deployment to use when validating cavity operating modes
+            metrics_file: A file the model's stats are written to after each poll that classifies events.  See
+                          metrics.write_metrics.
+            metrics_format: The format of metrics_file, 'prometheus' or 'json'.  Picked by its extension if None.
+        """
+        self.data_root = os.path.abspath(data_root)
+        self.sink = sink
+        self.model = model
+        self.checkpoint = checkpoint
+        self.zones = zones
+        self.settle = settle
+        self.timeout = timeout
+        self.deployment = deployment
+        self.metrics_file = metrics_file
+        self.metrics_format = metrics_format
+
+        # Event path => {'files': {filename: (size, mtime_ns)}, 'changed': <time the files were last seen to change>}
+        self.pending: Dict[str, Dict[str, Any]] = {}
+
+        # Zone => "<date>/<time>" of the last event handled in that zone
+        self.last_events: Dict[str, str] = {}
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "r") as f:
+                self.last_events = json.load(f)['zones']
+        elif not include_existing:
+            # Treat everything already on disk as history
+            for zone in self._list_zones():
+                events = self._list_new_events(zone)
+                if len(events) > 0:
+                    self.last_events[zone] = events[-1][0]
+            self._save_checkpoint()
+
+    def run(self, poll_interval: float = 1.0) -> None:
+        """Poll for and classify new events until interrupted.
+
+        Args:
+            poll_interval: The number of seconds to wait between polls
+        """
+        try:
+            while True:
+                start = time.monotonic()
+                self.poll()
+                time.sleep(max(0.0, poll_interval - (time.monotonic() - start)))
+        except KeyboardInterrupt:
+            pass
+
+    def poll(self) -> int:
+        """Scan for new events once and classify any that are ready.
+
+        Returns:
+            The number of events that were classified
+        """
+        now = time.time()
+        ready = []
+        for zone in self._list_zones():
+            for key, path in self._list_new_events(zone):
+                # Files have to be seen unchanged by two polls in a row before they count as written
+                files = self._get_capture_files(path)
+                pending = self.pending.get(path)
+                stable = pending is not None and pending['files'] == files
+                if not stable:
+                    pending = {'files': files, 'changed': now}
+                    self.pending[path] = pending
+                quiet = now - pending['changed']
+
+                # Events within a zone are handled in time order.  Later events wait for earlier ones, which keeps the
+                # checkpoint a simple high-water mark.
+                complete = len(files) == num_capture_files
+                if not stable or not ((complete and quiet >= self.settle) or quiet >= self.timeout):
+                    break
+                ready.append((zone, key, path))
+
+        if len(ready) > 0:
+            self._classify(ready)
+        return len(ready)
+
+    def _classify(self, ready: List[Tuple[str, str, str]]) -> None:
+        """Classify the ready events, write out the results, and then update the checkpoint."""
+        paths = [path for zone, key, path in ready if len(self.pending[path]['files']) > 0]
+        results = dict(zip(paths, self.model.analyze_batch(paths, deployment=self.deployment)))
+
+        for zone, key, path in ready:
+            files = self.pending.pop(path)['files']
+            if path in results:
+                result = results[path]
+            else:
+                # Don't hand an empty directory to the model.  rfwtools would try to download the event's data.
+                result = {'error': "No capture files found", 'location': zone, 'timestamp': _key_to_timestamp(key)}
+
+            # Measure from the last write to any of the event's capture files
+            if len(files) > 0:
+                last_write = max(mtime for size, mtime in files.values()) / 1e9
+                result['latency'] = round(time.time() - last_write, 3)
+            self.sink.write(json.dumps(result) + "\n")
+            self.last_events[zone] = key
+        self.sink.flush()
+
+        # Only move the checkpoint past the events once their results are out
+        self._save_checkpoint()
+
+        if self.metrics_file is not None:
+            from .model.metrics import write_metrics
+            write_metrics(self.metrics_file, self.model.get_stats(), self.metrics_format)
+
+    def _save_checkpoint(self) -> None:
+        """Atomically write the last event handled in each zone to the checkpoint file."""
+        if self.checkpoint is None:
+            return
+        tmp = f"{self.checkpoint}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({'zones': self.last_events}, f)
+        os.replace(tmp, self.checkpoint)
+
+    def _list_zones(self) -> List[str]:
+        """Returns the names of the zone directories being watched."""
+        return [zone for zone in list_dirs(self.data_root) if self.zones is None or zone in self.zones]
+
+    def _list_new_events(self, zone: str) -> List[Tuple[str, str]]:
+        """Returns the time ordered (<date>/<time>, path) of a zone's events that come after its last handled event.
+
+        Date directories before the last handled event are skipped without being read.
+        """
+        last = self.last_events.get(zone)
+        last_date = None if last is None else last.split("/")[0]
+
+        events = []
+        zone_dir = os.path.join(self.data_root, zone)
+        for date in list_dirs(zone_dir, date_regex):
+            # Dates are formatted YYYY_MM_DD so they sort the same as strings as they do in time
+            if last_date is not None and date < last_date:
+                continue
+            for event_time in list_dirs(os.path.join(zone_dir, date), time_regex):
+                key = f"{date}/{event_time}"
+                if last is None or key > last:
+                    events.append((key, os.path.join(zone_dir, date, event_time)))
+        return events
+
+    @staticmethod
+    def _get_capture_files(path: str) -> Dict[str, Tuple[int, int]]:
+        """Returns the size and modification time (ns) of each capture file in an event directory."""
+        files = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if capture_file_regex.match(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return files
+
+
+def _key_to_timestamp(key: str) -> str:
+    """Converts a "<YYYY_MM_DD>/<hhmmss.S>" event key to the timestamp format used in results."""
+    date, event_time = key.split("/")
+    return f"{date.replace('_', '-')} {event_time[0:2]}:{event_time[2:4]}:{event_time[4:]}"
+
+
+def watch(data_root: str, output: str = "-", checkpoint: Optional[str] = None, zones: Optional[List[str]] = None,
+          poll_interval: float = 1.0, settle: float = 1.0, timeout: float = 60.0,
+          include_existing: bool = False, session_config: Optional[Any] = None, precision: str = 'fp32',
+          result_timings: bool = False, metrics_file: Optional[str] = None, metrics_format: Optional[str] = None) \
+        -> None:
+    """Load the model and classify new events under data_root until interrupted.
+
+    Args:
+        data_root: The directory containing the harvester's zone directories
+        output: The JSON lines file that results are appended to.  "-" for standard out.
+        checkpoint: The checkpoint file.  Defaults to <output>.checkpoint when output is a file.
+        zones: The zones to watch.  All zones if None.
+        poll_interval: The number of seconds between polls
+        settle: The number of seconds a complete event's files must be unchanged before it is classified
+        timeout: The number of seconds after which an incomplete event that stopped changing is classified anyway
+        include_existing: Should events on disk at start up be classified when there is no checkpoint
+        session_config (SessionConfig): The settings of the model's ONNX sessions.  Defaults if None.
+        precision: The precision of the model files to run, 'fp32' or 'int8'
+        result_timings: Should each result include the time spent in each stage of its analysis
+        metrics_file: The file the model's stats, including stage timings, are kept in.  Not written if None.
+        metrics_format: The format of metrics_file, 'prometheus' or 'json'.  Picked by its extension if None.
+    """
+    from .model.model import Model
+
+    if checkpoint is None and output != "-":
+        checkpoint = f"{output}.checkpoint"
+
+    model = Model(session_config=session_config, precision=precision, timings=metrics_file is not None,
+                  result_timings=result_timings)
+    sink = sys.stdout if output == "-" else open(output, "a")
+    try:
+        watcher = EventWatcher(data_root, sink, model, checkpoint=checkpoint, zones=zones, settle=settle,
+                               timeout=timeout, include_existing=include_existing, metrics_file=metrics_file,
+                               metrics_format=metrics_format)
+        watcher.run(poll_interval=poll_interval)
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
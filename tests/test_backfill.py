@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import multiprocessing
+from unittest import TestCase, mock, skipUnless
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import backfill, parallel, synthetic
+from rf_classifier.main import run_model
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+
+
+class TestLimits(TestCase):
+
+    def test_adjust_limits(self):
+        # Workers go first, then the batch size, which never drops below 1
+        self.assertEqual((3, 16), backfill.adjust_limits(950, 1000, 4, 16, max_jobs=4, max_batch_size=16))
+        self.assertEqual((1, 8), backfill.adjust_limits(950, 1000, 1, 16, max_jobs=4, max_batch_size=16))
+        self.assertEqual((1, 1), backfill.adjust_limits(950, 1000, 1, 1, max_jobs=4, max_batch_size=16))
+
+        # They come back in the opposite order, up to the limits given
+        self.assertEqual((1, 16), backfill.adjust_limits(100, 1000, 1, 8, max_jobs=4, max_batch_size=16))
+        self.assertEqual((2, 16), backfill.adjust_limits(100, 1000, 1, 16, max_jobs=4, max_batch_size=16))
+        self.assertEqual((4, 16), backfill.adjust_limits(100, 1000, 4, 16, max_jobs=4, max_batch_size=16))
+
+        # Nothing changes between the water marks
+        self.assertEqual((2, 8), backfill.adjust_limits(750, 1000, 2, 8, max_jobs=4, max_batch_size=16))
+
+    def test_rss(self):
+        self.assertGreater(backfill.get_rss_mb(), 0.0)
+        self.assertGreater(backfill.get_pss_mb(), 0.0)
+        # Shared pages only count in part towards the PSS
+        self.assertLessEqual(backfill.get_pss_mb(), backfill.get_rss_mb())
+        self.assertGreaterEqual(backfill.get_total_pss_mb(), backfill.get_pss_mb())
+        self.assertLessEqual(backfill.get_unique_mb(), backfill.get_rss_mb())
+
+
+class TestBackfill(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.paths = synthetic.write_events(cls.tmp.name, 5, distinct=3)
+        cls.archive = os.path.join(cls.tmp.name, 'cavity-modes.json')
+        synthetic.write_mode_archive(cls.archive, ['1L25'])
+        cls.model_kwargs = {'mode_lookup': CavityModeLookup(FileArchive(cls.archive))}
+        cls.expected = run_model(cls.paths, batch_size=4, model_kwargs=cls.model_kwargs)['data']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_iter_backfill(self):
+        stats = {}
+        reports = []
+        results = backfill.iter_backfill(iter(self.paths), memory_budget=10 ** 6, batch_size=4, chunk_size=2,
+                                         model_kwargs=self.model_kwargs, stats=stats, trace_python=True,
+                                         on_chunk=reports.append)
+        self.assertEqual(self.expected, list(results))
+
+        self.assertEqual([2, 2, 1], [report['events'] for report in reports])
+        self.assertGreater(reports[0]['peak-python-mb'], 0.0)
+        self.assertEqual((3, 5, 0), (stats['backfill'].chunks, stats['backfill'].events, stats['backfill'].backoffs))
+        self.assertGreater(stats['backfill'].peak_rss_mb, 0.0)
+        self.assertEqual(40, stats['read'].files)
+
+    def test_backoff(self):
+        # No process fits in a megabyte, so every chunk backs off until there is one worker with batches of one
+        stats = {}
+        reports = []
+        results = run_model(self.paths, batch_size=4, jobs=2, model_kwargs=self.model_kwargs, stats=stats,
+                            memory_budget=1, chunk_size=1)['data']
+        self.assertEqual(self.expected, results)
+        self.assertEqual(5, stats['backfill'].over_budget_chunks)
+        self.assertEqual(3, stats['backfill'].backoffs)
+
+        list(backfill.iter_backfill(self.paths, memory_budget=1, batch_size=4, jobs=2, chunk_size=1,
+                                    model_kwargs=self.model_kwargs, on_chunk=reports.append))
+        self.assertEqual([(2, 4), (1, 4), (1, 2), (1, 1), (1, 1)],
+                         [(report['jobs'], report['batch-size']) for report in reports])
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), "Sharing the model needs fork")
+    def test_share_model(self):
+        # The shared model is loaded once for the whole backfill, not once per chunk's pool
+        with mock.patch.object(parallel, '_init_worker', wraps=parallel._init_worker) as init_worker:
+            results = backfill.iter_backfill(self.paths, memory_budget=10 ** 6, batch_size=1, jobs=2, chunk_size=2,
+                                             model_kwargs=self.model_kwargs, share_model=True)
+            self.assertEqual(self.expected, list(results))
+        self.assertEqual(1, init_worker.call_count)
+        self.assertIsNone(parallel._model)
@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+import numpy as np
+
+from . import testing_utils
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model.cache import FeatureCache
+from rf_classifier.model.model import Model
+
+data_dir = os.path.dirname(__file__) + "/test-data"
+
+
+class TestFeatureCache(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_make_key(self):
+        event = os.path.join(self.tmp, 'event')
+        shutil.copytree(f"{data_dir}/good-example/1L25/2023_02_01/210026.1", event)
+
+        key = FeatureCache.make_key(event)
+        self.assertEqual(key, FeatureCache.make_key(event))
+
+        # Touching a capture file invalidates the key
+        capture_file = os.path.join(event, sorted(os.listdir(event))[0])
+        stat = os.stat(capture_file)
+        os.utime(capture_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        self.assertNotEqual(key, FeatureCache.make_key(event))
+
+        self.assertIsNone(FeatureCache.make_key(os.path.join(self.tmp, 'missing')))
+
+    def test_get_put(self):
+        cache = FeatureCache(os.path.join(self.tmp, 'cache'))
+        features = np.random.default_rng(1).random((4096, 32), dtype=np.float32)
+
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', features)
+        cached = cache.get('a')
+        self.assertIsInstance(cached, np.memmap)
+        np.testing.assert_array_equal(features, cached)
+        self.assertEqual((1, 1, 1, 0), (cache.stats.hits, cache.stats.misses, cache.stats.stores,
+                                        cache.stats.evictions))
+
+        # Damaged entries are treated as misses and removed
+        with open(os.path.join(cache.cache_dir, 'b.npy'), 'wb') as f:
+            f.write(b'not an array')
+        self.assertIsNone(cache.get('b'))
+        self.assertFalse(os.path.exists(os.path.join(cache.cache_dir, 'b.npy')))
+
+    def test_evict(self):
+        features = np.zeros((4096, 32), dtype=np.float32)
+        entry_size = features.nbytes + 128
+        cache = FeatureCache(os.path.join(self.tmp, 'cache'), max_bytes=2 * entry_size)
+
+        cache.put('a', features)
+        cache.put('b', features)
+        old = os.stat(os.path.join(cache.cache_dir, 'a.npy')).st_mtime_ns - 10 ** 9
+        for key in ('a', 'b'):
+            os.utime(os.path.join(cache.cache_dir, f"{key}.npy"), ns=(old, old))
+
+        # Using 'a' makes 'b' the least recently used
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', features)
+        self.assertEqual(['a.npy', 'c.npy'], sorted(os.listdir(cache.cache_dir)))
+        self.assertEqual(1, cache.stats.evictions)
+
+    def test_model(self):
+        path = os.path.abspath(f"{data_dir}/good-example/1L25/2023_02_01/210026.1")
+        model = Model(feature_cache=FeatureCache(os.path.join(self.tmp, 'cache')),
+                      mode_lookup=testing_utils.get_offline_mode_lookup())
+        expected = model.analyze_batch([path])
+
+        # The second time around the event goes straight to inference
+        with mock.patch.object(Model, 'validate_data') as validate_data, \
+                mock.patch.object(Model, 'preprocess_data') as preprocess_data:
+            model.update_example(path)
+            self.assertEqual(expected[0], model.analyze())
+            validate_data.assert_not_called()
+            preprocess_data.assert_not_called()
+
+        stats = model.get_stats()['cache']
+        self.assertEqual((1, 1, 1), (stats.hits, stats.misses, stats.stores))
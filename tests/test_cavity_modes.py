@@ -0,0 +1,104 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from . import testing_utils
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+from rf_classifier.model.model import Model
+
+data_dir = os.path.dirname(__file__) + "/test-data"
+good_event = datetime(2023, 2, 1, 21, 0, 26, 100000)
+good_filenames = [f"R1P{cav}WFTharv.2023_02_01_210026.1.txt" for cav in range(1, 9)]
+
+
+class CountingArchive(FileArchive):
+    """A FileArchive that records the queries made of it."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.queries = []
+
+    def get_history(self, pv, begin, end, deployment='ops'):
+        self.queries.append((pv, begin, end))
+        return super().get_history(pv, begin, end, deployment=deployment)
+
+
+class TestCavityModeLookup(TestCase):
+
+    def setUp(self):
+        self.archive = CountingArchive(testing_utils.cavity_modes_file)
+        self.lookup = CavityModeLookup(self.archive)
+
+    def test_get_value(self):
+        # Values are the last update at or before the time.  None before the first one.
+        self.assertEqual(4, self.lookup.get_value('R1P3CNTL2MODE', datetime(2018, 10, 4, 4)))
+        self.assertEqual(2, self.lookup.get_value('R1P3CNTL2MODE', datetime(2018, 10, 4, 6)))
+        self.assertIsNone(self.lookup.get_value('R1PXMOUT', datetime(2018, 10, 4, 6)))
+        with self.assertRaises(ValueError):
+            self.lookup.get_value('R1P9CNTL2MODE', datetime(2018, 10, 4, 6))
+
+        # Asking again does not query the archive
+        self.assertEqual(4, self.lookup.get_value('R1P3CNTL2MODE', datetime(2018, 10, 4, 4)))
+        self.assertEqual(4, len(self.archive.queries))
+        self.assertEqual((5, 1), (self.lookup.stats.lookups, self.lookup.stats.hits))
+
+    def test_validate_cavity_modes(self):
+        self.lookup.validate_cavity_modes(good_filenames, good_event, mode=(4, 64))
+        self.assertEqual(17, len(self.archive.queries))
+
+        # Cavity 5 is in SELAP mode
+        with self.assertRaisesRegex(ValueError,
+                                    r"Cavity 'R1P5' not in valid operating mode \(\(4,\)\)\.  Mode = 64"):
+            self.lookup.validate_cavity_modes(good_filenames, good_event, mode=(4,))
+        self.assertEqual(17, len(self.archive.queries))
+
+        # Cavities 3 and 7 are in SEL mode, but cavity 7 is "bypassed" with a zero gradient set point
+        filenames = [f"R1P{cav}WFSharv.2018_10_04_052657.9.txt" for cav in range(1, 9)]
+        with self.assertRaisesRegex(ValueError, "Cavity 'R1P3' not in valid operating mode"):
+            self.lookup.validate_cavity_modes(filenames, datetime(2018, 10, 4, 5, 26, 59, 400000), mode=(4, 64))
+        self.lookup.validate_cavity_modes([f for f in filenames if not f.startswith('R1P3')],
+                                          datetime(2018, 10, 4, 5, 26, 59, 400000), mode=(4,))
+
+        with self.assertRaisesRegex(ValueError, "No capture file content"):
+            self.lookup.validate_cavity_modes([], good_event)
+
+    def test_prefetch_events(self):
+        # Events close together share a single query per PV.  Those too far apart get their own.
+        events = [(good_filenames, good_event + timedelta(minutes=minutes)) for minutes in (0, 5, 30)]
+        events.append((good_filenames, good_event + timedelta(days=2)))
+        self.lookup.prefetch_events(events)
+        self.assertEqual(34, len(self.archive.queries))
+        self.assertEqual({timedelta(minutes=30), timedelta(0)},
+                         set(end - begin for pv, begin, end in self.archive.queries))
+
+        for filenames, event_datetime in events:
+            self.lookup.validate_cavity_modes(filenames, event_datetime, mode=(4, 64))
+        self.assertEqual(34, len(self.archive.queries))
+        self.assertEqual(4 * 17, self.lookup.stats.hits)
+        self.assertIn("(100.0% already fetched), 34 archive queries", str(self.lookup.stats))
+
+    def test_model(self):
+        model = Model(mode_lookup=self.lookup)
+        test_paths = [
+            f'{data_dir}/good-cavity-mode/1L25/2023_02_01/210026.1',
+            f'{data_dir}/good-example/1L25/2023_02_01/210026.1',
+            f'{data_dir}/good-example-meta/1L25/2023_02_01/210026.1',
+            f'{data_dir}/bad-cavity-mode/1L25/2018_10_04/052659.4',
+        ]
+        results = model.analyze_batch([os.path.abspath(p) for p in test_paths])
+
+        # The batch is prefetched with one query per PV for each of the two dates
+        self.assertEqual(34, len(self.archive.queries))
+        for result in results[:3]:
+            self.assertNotIn('error', result)
+            self.assertEqual('6', result['cavity-label'])
+
+        # This one's short time range is caught before its cavity modes are checked
+        self.assertTrue(results[3]['error'].startswith("Invalid time range"))
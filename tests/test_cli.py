@@ -1,9 +1,49 @@
 import unittest
 import subprocess
 import os
+import sys
+import io
+import csv
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 rfc = os.path.join(os.path.dirname(__file__), "..", "bin", "rf_classifier.bash")
 test_data = os.path.join(os.path.dirname(__file__), "test-data")
+src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+mode_archive = os.path.join(test_data, "cavity-modes.json")
+
+
+def run_main(*args, **kwargs):
+    """Runs the app with this interpreter on the source tree, so that the exit status is the app's own."""
+    return subprocess.run([sys.executable, '-m', 'rf_classifier.main', *args], stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True, env=dict(os.environ, PYTHONPATH=src_dir),
+                          **kwargs)
+
+
+class StubServerHandler(BaseHTTPRequestHandler):
+    """Answers like a classification server running the fp32 models, but with a canned error for every event."""
+
+    def do_GET(self):
+        self._send_json({'name': 'rf_classifier', 'version': '0.0.0', 'model': 'cnn_lstm_v1_0'})
+
+    def do_POST(self):
+        events = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['events']
+        self._send_json({'data': [{'error': "Answered by the stub server", 'location': '1L25',
+                                   'timestamp': '2018-10-05 04:44:08.2'} for _ in events]})
+
+    def _send_json(self, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
 
 class TestCLI(unittest.TestCase):
     def test_cli_blank(self):
@@ -53,3 +93,130 @@ Brief:         .*
         process = subprocess.run([rfc, 'analyze', '-o', 'json', f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2"],
                                  stdout=subprocess.PIPE, universal_newlines=True)
         self.assertEqual(process.stdout, exp, "Unexpected error message")
+
+    def test_cli_analyze_jobs(self):
+        events = [f"{test_data}/{e}" for e in ("missing-cfs/1L25/2018_10_05/044408.2",
+                                               "duplicate-cfs/1L25/2018_10_05/044408.2",
+                                               "missing-waveforms/1L25/2018_10_05/044556.2",
+                                               "bad-time-interval/1L25/2018_10_05/044556.2",
+                                               "short-test/1L24/0000_00_00/000000.0")]
+
+        # Results from the worker pool should come back in the same order as a serial run
+        serial = subprocess.run([rfc, 'analyze', '-o', 'json', *events], stdout=subprocess.PIPE,
+                                universal_newlines=True)
+        parallel = subprocess.run([rfc, 'analyze', '-o', 'json', '-j', '3', '-b', '1', *events],
+                                  stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(serial.stdout, parallel.stdout, "Parallel results differ from serial results")
+        self.assertEqual(5, len(json.loads(parallel.stdout)['data']))
+
+    def test_cli_analyze_jsonl(self):
+        events = [f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2",
+                  f"{test_data}/duplicate-cfs/1L25/2018_10_05/044408.2"]
+        json_process = subprocess.run([rfc, 'analyze', '-o', 'json', *events], stdout=subprocess.PIPE,
+                                      universal_newlines=True)
+        jsonl_process = subprocess.run([rfc, 'analyze', '-o', 'jsonl', '-b', '1', *events], stdout=subprocess.PIPE,
+                                       universal_newlines=True)
+
+        # One result per line, matching the regular JSON output
+        exp = json.loads(json_process.stdout)['data']
+        self.assertListEqual(exp, [json.loads(line) for line in jsonl_process.stdout.splitlines()])
+
+    def test_cli_analyze_csv(self):
+        events = [f"{test_data}/good-example/1L25/2023_02_01/210026.1",
+                  f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2"]
+        json_process = subprocess.run([rfc, 'analyze', '-o', 'json', *events], stdout=subprocess.PIPE,
+                                      universal_newlines=True)
+        csv_process = subprocess.run([rfc, 'analyze', '-o', 'csv', *events], stdout=subprocess.PIPE,
+                                     universal_newlines=True)
+
+        exp = json.loads(json_process.stdout)['data']
+        rows = list(csv.DictReader(io.StringIO(csv_process.stdout)))
+        self.assertEqual([r.get('fault-label', '') for r in exp], [r['fault_label'] for r in rows])
+        self.assertEqual([r.get('error', '') for r in exp], [r['error'] for r in rows])
+
+        process = run_main('analyze', '-o', 'npy', *events)
+        self.assertEqual(2, process.returncode)
+        self.assertIn("must be written to a file", process.stderr)
+
+    def test_cli_analyze_find_events(self):
+        event = os.path.abspath(f"{test_data}/good-example/1L25/2023_02_01/210026.1")
+        exp = subprocess.run([rfc, 'analyze', '-o', 'jsonl', event], stdout=subprocess.PIPE,
+                             universal_newlines=True).stdout
+
+        process = subprocess.run([rfc, 'analyze', '-o', 'jsonl', '--root', f"{test_data}/good-example", '-z', '1L25',
+                                  '--since', '2023-02-01', '--until', '2023-02-01 21:01'], stdout=subprocess.PIPE,
+                                 universal_newlines=True)
+        self.assertEqual(exp, process.stdout)
+
+        process = subprocess.run([rfc, 'analyze', '-o', 'jsonl', '--root', f"{test_data}/good-example",
+                                  '--since', '2023-02-01 21:01'], stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual("", process.stdout)
+
+        process = subprocess.run([rfc, 'analyze', '-o', 'jsonl', '--from-file', '-'], input=f"# A comment\n{event}\n",
+                                 stdout=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(exp, process.stdout)
+
+        process = run_main('analyze', '--since', '2023-02-01', event)
+        self.assertEqual(2, process.returncode)
+        self.assertIn("require --root", process.stderr)
+
+    def test_cli_analyze_skip_existing(self):
+        events = [os.path.abspath(f"{test_data}/good-example/1L25/2023_02_01/210026.1"),
+                  os.path.abspath(f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2")]
+        with tempfile.TemporaryDirectory() as tmp:
+            store = os.path.join(tmp, 'results.sqlite')
+            # The archived cavity modes let the good event pass validation offline
+            args = ['analyze', '-o', 'jsonl', '--mode-archive', mode_archive, '--store', store, '--skip-existing']
+            first = subprocess.run([rfc, *args, *events], stdout=subprocess.PIPE, universal_newlines=True)
+            first_results = [json.loads(line) for line in first.stdout.splitlines()]
+            self.assertEqual('6', first_results[0]['cavity-label'])
+            self.assertIn('error', first_results[1])
+
+            # Only the event that failed is analyzed again
+            second = subprocess.run([rfc, *args, *events], stdout=subprocess.PIPE, universal_newlines=True)
+            self.assertEqual(first.stdout.splitlines()[1:], second.stdout.splitlines())
+
+        process = run_main('analyze', '--skip-existing', *events)
+        self.assertEqual(2, process.returncode)
+        self.assertIn("requires --store", process.stderr)
+
+    def test_cli_analyze_server_precision(self):
+        event = os.path.abspath(f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2")
+        stub = ThreadingHTTPServer(('127.0.0.1', 0), StubServerHandler)
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        try:
+            args = ['analyze', '-o', 'jsonl', '--server', '--server-port', str(stub.server_address[1])]
+
+            # The server runs the fp32 models, so it answers fp32 requests
+            process = run_main(*args, event)
+            self.assertEqual("Answered by the stub server", json.loads(process.stdout)['error'])
+
+            # but int8 requests are analyzed locally rather than getting its fp32 results
+            process = run_main(*args, '--precision', 'int8', event)
+            self.assertEqual("Missing capture file for zone '3'", json.loads(process.stdout)['error'])
+            self.assertIn("runs cnn_lstm_v1_0, not cnn_lstm_v1_0_int8", process.stderr)
+        finally:
+            stub.shutdown()
+            stub.server_close()
+
+    def test_cli_describe_imports(self):
+        # Describing the model only needs its description file, not the packages the models run on
+        code = ("import sys\n"
+                "from rf_classifier.main import main\n"
+                "sys.argv = ['rf_classifier', 'describe']\n"
+                "try:\n"
+                "    main()\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                "print([m for m in ('numpy', 'pandas', 'scipy', 'rfwtools', 'onnxruntime') if m in sys.modules])\n")
+        process = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True,
+                                 env=dict(os.environ, PYTHONPATH=src_dir))
+        self.assertIn("Model ID:", process.stdout)
+        self.assertTrue(process.stdout.rstrip().endswith("[]"), process.stdout)
+
+    def test_cli_startup_profile(self):
+        process = subprocess.run([rfc, '--startup-profile', 'describe'], stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertIn("Model ID:", process.stdout)
+        self.assertRegex(process.stderr, r"Startup profile: \d+\.\d+ s total, \d+\.\d+ s importing \d+ modules")
+        self.assertRegex(process.stderr, r"\d+\.\d+ s  rf_classifier\.model\.description \(\d+ modules\)")
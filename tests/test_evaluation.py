@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from unittest import TestCase
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import synthetic
+from rf_classifier.evaluation import ConfusionMatrix, evaluate, find_event_dir, read_test_set
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+from rf_classifier.model.model import Model
+
+test_set_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_set.txt")
+rfc = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin', 'rf_classifier.bash')
+
+
+class TestReadTestSet(TestCase):
+
+    def test_read_test_set(self):
+        events = read_test_set(test_set_file)
+        self.assertEqual(10, len(events))
+        self.assertEqual({'zone': '1L26', 'timestamp': '2020-03-07 08:19:56', 'cavity-label': 'multiple',
+                          'fault-label': 'Multi Cav turn off', 'throws': True,
+                          'expected': {'cavity-label': 'multiple', 'cavity-confidence': 0.000001,
+                                       'fault-label': 'Multi Cav turn off', 'fault-confidence': 0.000001}},
+                         events[0])
+        self.assertEqual(('8', '2', 0.9759), (events[8]['cavity-label'], events[8]['expected']['cavity-label'],
+                                              events[8]['expected']['cavity-confidence']))
+
+    def test_missing_columns(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+            f.write("; A comment\nzone\ttime\tcavity\n1L25\t2023-02-01 21:00:26\t1\n")
+            f.flush()
+            with self.assertRaisesRegex(ValueError, "missing columns - fault"):
+                read_test_set(f.name)
+
+
+class TestConfusionMatrix(TestCase):
+
+    def test_confusion_matrix(self):
+        matrix = ConfusionMatrix()
+        self.assertIsNone(matrix.get_accuracy())
+        for true, predicted in (('1', '1'), ('1', '2'), ('2', '2'), ('multiple', '2')):
+            matrix.add(true, predicted)
+        self.assertEqual(0.5, matrix.get_accuracy())
+        self.assertEqual({'1': {'events': 2, 'accuracy': 0.5}, '2': {'events': 1, 'accuracy': 1.0},
+                          'multiple': {'events': 1, 'accuracy': 0.0}}, matrix.get_label_accuracy())
+        self.assertEqual({'labels': ['1', '2', 'multiple'], 'counts': [[1, 1, 0], [0, 1, 0], [0, 1, 0]]},
+                         matrix.to_dict())
+
+
+class TestEvaluate(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.paths = synthetic.write_events(cls.tmp.name, 3, distinct=3)
+        cls.archive = os.path.join(cls.tmp.name, 'cavity-modes.json')
+        synthetic.write_mode_archive(cls.archive, ['1L25'])
+
+        # Label the events with the model's own results, except for the first event's fault
+        model = Model(mode_lookup=CavityModeLookup(FileArchive(cls.archive)))
+        cls.results = model.analyze_batch(cls.paths)
+        lines = ["zone\tcavity\tcav#\tfault\ttime\tcav_pred\tcav_conf\tfault_pred\tfault_conf\tthrows\tmodel"]
+        for i, result in enumerate(cls.results):
+            cavity = '0' if result['cavity-label'] == 'multiple' else result['cavity-label']
+            fault = 'Microphonics' if i == 0 else result['fault-label']
+            lines.append(f"1L25\t{cavity}\t0\t{fault}\t{result['timestamp'][:-2]}\t{cavity}\t"
+                         f"{result['cavity-confidence'] * 100:.2f}\t{result['fault-label']}\t"
+                         f"{result['fault-confidence'] * 100:.2f}\tFalse\tcnn_lstm_v1_0")
+        lines.append("1L25\t1\t0\tE_Quench\t2023-02-02 00:00:00\t1\t90.0\tE_Quench\t90.0\tTrue\tcnn_lstm_v1_0")
+        cls.test_set = os.path.join(cls.tmp.name, 'test_set.txt')
+        with open(cls.test_set, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_find_event_dir(self):
+        self.assertEqual(self.paths[1], find_event_dir(self.tmp.name, '1L25', '2023-02-01 21:01:26'))
+        self.assertEqual(self.paths[1], find_event_dir(self.tmp.name, '1L25', '2023-02-01 21:01:26.1'))
+        self.assertIsNone(find_event_dir(self.tmp.name, '1L25', '2023-02-01 21:01:26.2'))
+        self.assertIsNone(find_event_dir(self.tmp.name, '1L25', '2023-02-02 21:01:26'))
+
+    def test_evaluate(self):
+        evaluation = evaluate(read_test_set(self.test_set), self.tmp.name, batch_size=2,
+                              model_kwargs={'mode_lookup': CavityModeLookup(FileArchive(self.archive))})
+        self.assertEqual(self.results, [event['result'] for event in evaluation.events[:3]])
+        self.assertEqual("Event directory not found", evaluation.events[3]['result']['error'])
+
+        summary = evaluation.get_summary()
+        self.assertEqual((4, 1, 0, 0), (summary['events'], summary['expected-errors'], summary['unexpected-errors'],
+                                        summary['missed-errors']))
+        self.assertEqual(1.0, summary['cavity-accuracy'])
+        self.assertAlmostEqual(2 / 3, summary['fault-accuracy'])
+        self.assertEqual((1.0, 1.0), (summary['cavity-agreement'], summary['fault-agreement']))
+        self.assertLess(summary['cavity-confidence-drift-max'], 0.0001)
+        self.assertGreater(summary['ms-per-event'], 0.0)
+        self.assertIn("Cavity accuracy: 100.0%", str(evaluation))
+
+    def test_cli_evaluate(self):
+        process = subprocess.run([rfc, 'evaluate', '-o', 'json', '-j', '2', '--data-root', self.tmp.name,
+                                  '--mode-archive', self.archive, self.test_set], stdout=subprocess.PIPE,
+                                 universal_newlines=True)
+        self.assertEqual(0, process.returncode)
+        output = json.loads(process.stdout)
+        self.assertEqual(self.results, [event['result'] for event in output['events'][:3]])
+        self.assertEqual(sum(sum(row) for row in output['cavity-confusion']['counts']), 3)
@@ -0,0 +1,80 @@
+import io
+import os
+import csv
+import sys
+import tempfile
+import unittest
+from unittest import TestCase
+
+import numpy as np
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import export
+
+results = [
+    {'location': '1L25', 'timestamp': '2023-02-01 21:00:26.1', 'cavity-label': '6',
+     'cavity-confidence': 0.9596626162528992, 'fault-label': 'Single Cav Turn off',
+     'fault-confidence': 0.8224388957023621, 'model': 'cnn_lstm_v1_0'},
+    {'error': "Missing capture file for zone '3'", 'location': '1L25', 'timestamp': '2018-10-05 04:44:08.2'},
+    {'error': "Path includes invalid time format - 210026", 'location': None, 'timestamp': None},
+]
+
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_csv(self):
+        out = io.StringIO()
+        writer = export.CsvWriter(out)
+        self.assertEqual(3, export.write_results(iter(results), writer, chunk_size=2))
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([name for name, dtype in export.columns], list(rows[0].keys()))
+        self.assertEqual(0.9596626162528992, float(rows[0]['cavity_confidence']))
+        self.assertEqual(('', "Missing capture file for zone '3'"), (rows[1]['fault_label'], rows[1]['error']))
+        self.assertEqual('', rows[2]['location'])
+
+    def test_npy(self):
+        path = os.path.join(self.tmp.name, 'results.npy')
+        with export.open_writer('npy', path) as writer:
+            export.write_results(results, writer, chunk_size=2)
+
+        # The file is a plain structured array, so it can be memory mapped too
+        data = np.load(path, mmap_mode='r')
+        self.assertEqual(3, len(data))
+        self.assertEqual(np.datetime64('2023-02-01T21:00:26.100'), data['timestamp'][0])
+        self.assertEqual('Single Cav Turn off', data['fault_label'][0])
+        self.assertEqual(0.8224388957023621, data['fault_confidence'][0])
+        self.assertTrue(np.isnan(data['cavity_confidence'][1]))
+        self.assertTrue(np.isnat(data['timestamp'][2]))
+        self.assertEqual(results[2]['error'], data['error'][2])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise unittest.SkipTest("pyarrow is not installed")
+
+        path = os.path.join(self.tmp.name, 'results.parquet')
+        with export.open_writer('parquet', path) as writer:
+            export.write_results(results, writer, chunk_size=2)
+
+        table = pq.read_table(path)
+        self.assertEqual(2, pq.ParquetFile(path).num_row_groups)
+        self.assertEqual(['cnn_lstm_v1_0', None, None], table.column('model').to_pylist())
+        self.assertEqual([0.9596626162528992, None, None], table.column('cavity_confidence').to_pylist())
+
+    def test_open_writer(self):
+        with self.assertRaisesRegex(ValueError, "must be written to a file"):
+            export.open_writer('npy')
+        with self.assertRaisesRegex(ValueError, "Unknown output format"):
+            export.open_writer('xlsx', 'results.xlsx')
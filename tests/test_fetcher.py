@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+import tempfile
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+import numpy as np
+
+from . import testing_utils
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import synthetic
+from rf_classifier.model.reader import CaptureFileReader
+
+
+def make_event_csv(event_dir):
+    """Makes the CSV the waveform browser would send for an event from its capture files."""
+    columns = None
+    names = ['event_id', 'location', 'time_offset']
+    for name in sorted(os.listdir(event_dir)):
+        with open(os.path.join(event_dir, name), "r") as f:
+            lines = [line.rstrip("\n").split("\t") for line in f]
+        names.extend(lines[0][1:])
+        if columns is None:
+            columns = [["1", "1L25", line[0]] for line in lines[1:]]
+        for row, line in zip(columns, lines[1:]):
+            row.extend(line[1:])
+    return "\n".join([",".join(names)] + [",".join(row) for row in columns]) + "\n"
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Answers event requests like the waveform browser.  Only knows one event of 1L25 and counts the requests."""
+
+    def __init__(self, csv_text):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.csv_text = csv_text
+        self.requests = []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        query = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        self.server.requests.append(query)
+        body = self.server.csv_text.encode('utf-8') if query['location'] == '1L25' else b""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestEventFetcher(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.event_dir = synthetic.write_event(os.path.join(cls.tmp.name, 'source'), n_samples=9000, seed=3)
+        cls.server = StandInServer(make_event_csv(cls.event_dir))
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/wfbrowser/ajax/event"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.cache = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache.cleanup()
+
+    def test_fetch(self):
+        fetcher = testing_utils.EventFetcher(cache_dir=self.cache.name, base_url=self.url)
+        begin = datetime(2023, 2, 1, 21, 0, 26)
+        text = fetcher.fetch('1L25', begin)
+        self.assertEqual(self.server.csv_text, text)
+        self.assertEqual([{'out': 'csv', 'includeData': 'true', 'location': '1L25', 'begin': '2023-02-01 21:00:26',
+                           'end': '2023-02-01 21:00:27'}], self.server.requests)
+
+        # Found in the cache by this fetcher and by one that can't download
+        self.assertEqual(text, fetcher.fetch('1L25', begin))
+        offline = testing_utils.EventFetcher(cache_dir=self.cache.name, base_url=self.url, offline=True)
+        self.assertEqual(text, offline.fetch('1L25', begin))
+        self.assertEqual((1, 1, 0), (len(self.server.requests), fetcher.downloads, offline.downloads))
+        with self.assertRaisesRegex(RuntimeError, "not cached"):
+            offline.fetch('1L25', datetime(2023, 2, 1, 21, 0, 27))
+
+        with self.assertRaisesRegex(RuntimeError, "empty response"):
+            fetcher.fetch('1L22', begin)
+
+    def test_cache_is_content_addressed(self):
+        fetcher = testing_utils.EventFetcher(cache_dir=self.cache.name, base_url=self.url)
+        fetcher.fetch('1L25', datetime(2023, 2, 1, 21, 0, 26))
+        fetcher.fetch('1L25', datetime(2023, 2, 1, 21, 0, 27))
+
+        # The same content is stored once
+        self.assertEqual(1, len(os.listdir(os.path.join(self.cache.name, 'objects'))))
+        self.assertEqual(2, len(os.listdir(os.path.join(self.cache.name, 'refs', '1L25'))))
+
+        # A damaged object is downloaded again
+        name = os.listdir(os.path.join(self.cache.name, 'objects'))[0]
+        with open(os.path.join(self.cache.name, 'objects', name), "wb") as f:
+            f.write(b"")
+        fetcher.fetch('1L25', datetime(2023, 2, 1, 21, 0, 26))
+        self.assertEqual(3, fetcher.downloads)
+
+    def test_prefetch(self):
+        fetcher = testing_utils.EventFetcher(cache_dir=self.cache.name, base_url=self.url, max_workers=3)
+        events = [testing_utils.EventData('1L25', f"2023/02/01 21:00:{second}") for second in range(20, 26)]
+        events.append(testing_utils.EventData('1L22', "2023/02/01 21:00:26"))
+        errors = fetcher.prefetch(events)
+        self.assertEqual([None] * 6, errors[:6])
+        self.assertIsInstance(errors[6], RuntimeError)
+        self.assertEqual(7, len(self.server.requests))
+
+    def test_get_event_data(self):
+        fetcher = testing_utils.EventFetcher(cache_dir=self.cache.name, base_url=self.url)
+        event = testing_utils.EventData('1L25', "2023/02/01 21:00:26")
+        event.event_dir = os.path.join(self.cache.name, 'events', '1L25', '2023_02_01', '210026.0')
+        event.get_event_data(fetcher=fetcher)
+
+        # The capture files hold the same values as the ones the CSV was made from
+        self.assertEqual([f"R1P{cavity}WFSharv.2023_02_01_210026.0.txt" for cavity in range(1, 9)],
+                         sorted(os.listdir(event.event_dir)))
+        reader = CaptureFileReader()
+        expected = reader.load(self.event_dir)
+        event_data = reader.load(event.event_dir)
+        np.testing.assert_array_equal(expected.time, event_data.time)
+        np.testing.assert_array_equal(expected.get_signals(), event_data.get_signals())
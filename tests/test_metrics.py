@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import tempfile
+from unittest import TestCase
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import synthetic
+from rf_classifier.backfill import BackfillStats
+from rf_classifier.utils import add_stats
+from rf_classifier.model import metrics
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+from rf_classifier.model.metrics import Histogram, TimingStats
+from rf_classifier.model.model import Model
+from rf_classifier.model.reader import ReadStats
+
+
+class TestHistogram(TestCase):
+
+    def test_observe(self):
+        histogram = Histogram(buckets=[1.0, 2.0])
+        for value in (0.5, 1.0, 1.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual([2, 1, 1], histogram.counts)
+        self.assertEqual((4, 6.0), (histogram.count, histogram.sum))
+        self.assertEqual(1.0, histogram.quantile(0.5))
+        self.assertEqual(float('inf'), histogram.quantile(1.0))
+
+    def test_add(self):
+        histogram = Histogram(buckets=[1.0])
+        other = Histogram(buckets=[1.0])
+        histogram.observe(0.5)
+        other.observe(2.0)
+        histogram.add(other)
+        self.assertEqual(([1, 1], 2, 2.5), (histogram.counts, histogram.count, histogram.sum))
+
+        with self.assertRaisesRegex(ValueError, "different buckets"):
+            histogram.add(Histogram(buckets=[2.0]))
+
+
+class TestTimingStats(TestCase):
+
+    def test_record(self):
+        stats = TimingStats()
+        stats.record({'validate': 0.2, 'read': 0.05, 'bytes-read': 1000, 'total': 0.25})
+        stats.record({'validate': 0.01, 'total': 0.01}, error=True)
+        self.assertEqual((2, 1), (stats.events, stats.errors))
+        self.assertEqual((2, 1, 0), (stats.stages['validate'].count, stats.stages['read'].count,
+                                     stats.stages['cache'].count))
+        self.assertNotIn('bytes-read', stats.stages)
+        self.assertIn("validate 105.0, read 50.0", str(stats))
+
+        total = {}
+        add_stats(total, {'timings': stats})
+        add_stats(total, {'timings': stats})
+        self.assertEqual((4, 2), (total['timings'].events, total['timings'].stages['read'].count))
+
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        timings = TimingStats()
+        timings.record({'read': 0.003, 'total': 0.003})
+        reads = ReadStats()
+        reads.files, reads.bytes_read, reads.bytes_total = 8, 100, 200
+        self.stats = {'read': reads, 'timings': timings}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_format_prometheus(self):
+        lines = metrics.format_prometheus(self.stats).splitlines()
+        self.assertIn("# TYPE rf_classifier_read_files_total counter", lines)
+        self.assertIn("rf_classifier_read_bytes_read_total 100", lines)
+        self.assertIn("rf_classifier_read_bytes_total 200", lines)
+        self.assertIn("rf_classifier_events_total 1", lines)
+        self.assertIn("# TYPE rf_classifier_stage_duration_seconds histogram", lines)
+
+        # Buckets are cumulative
+        self.assertIn('rf_classifier_stage_duration_seconds_bucket{stage="read",le="0.0025"} 0', lines)
+        self.assertIn('rf_classifier_stage_duration_seconds_bucket{stage="read",le="0.005"} 1', lines)
+        self.assertIn('rf_classifier_stage_duration_seconds_bucket{stage="read",le="+Inf"} 1', lines)
+        self.assertIn('rf_classifier_stage_duration_seconds_count{stage="read"} 1', lines)
+        self.assertIn('rf_classifier_stage_duration_seconds_count{stage="validate"} 0', lines)
+
+    def test_format_prometheus_gauges(self):
+        # Peaks can go down from one run to the next, so they are gauges rather than counters
+        backfill = BackfillStats()
+        backfill.chunks, backfill.peak_rss_mb = 3, 512.5
+        lines = metrics.format_prometheus({'backfill': backfill}).splitlines()
+        self.assertIn("# TYPE rf_classifier_backfill_chunks_total counter", lines)
+        self.assertIn("# TYPE rf_classifier_backfill_peak_rss_mb gauge", lines)
+        self.assertIn("rf_classifier_backfill_peak_rss_mb 512.5", lines)
+        self.assertFalse(any(line.startswith("rf_classifier_backfill_peak_rss_mb_total") for line in lines))
+
+    def test_write_metrics(self):
+        path = os.path.join(self.tmp.name, "metrics.json")
+        metrics.write_metrics(path, self.stats)
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+        self.assertEqual({'files': 8, 'bytes_read': 100, 'bytes_total': 200}, snapshot['stats']['read'])
+        self.assertEqual(1, snapshot['stats']['timings']['stages']['read']['count'])
+
+        path = os.path.join(self.tmp.name, "metrics.prom")
+        metrics.write_metrics(path, self.stats)
+        with open(path, "r") as f:
+            self.assertEqual(metrics.format_prometheus(self.stats), f.read())
+        self.assertEqual(["metrics.json", "metrics.prom"], sorted(os.listdir(self.tmp.name)))
+
+        with self.assertRaisesRegex(ValueError, "Unknown metrics format"):
+            metrics.write_metrics(path, self.stats, 'csv')
+
+
+class TestModelTimings(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.paths = synthetic.write_events(cls.tmp.name, 2, distinct=2)
+        cls.archive = os.path.join(cls.tmp.name, 'cavity-modes.json')
+        synthetic.write_mode_archive(cls.archive, ['1L25'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_off(self):
+        model = Model(mode_lookup=CavityModeLookup(FileArchive(self.archive)))
+        result = model.analyze_batch(self.paths[:1])[0]
+        self.assertNotIn('timings', result)
+        self.assertNotIn('timings', model.get_stats())
+
+    def test_result_timings(self):
+        model = Model(mode_lookup=CavityModeLookup(FileArchive(self.archive)), result_timings=True)
+        plain = Model(mode_lookup=CavityModeLookup(FileArchive(self.archive)))
+        bad_path = os.path.join(self.tmp.name, '1L25', '2023_02_01', '999999.9')
+        results = model.analyze_batch(self.paths + [bad_path])
+
+        # Timing does not change the results
+        expected = plain.analyze_batch(self.paths)
+        for result, other in zip(results, expected):
+            timings = result['timings']
+            self.assertEqual(other, {key: value for key, value in result.items() if key != 'timings'})
+            for stage in ('validate', 'read', 'resample', 'scale', 'cavity-inference', 'total'):
+                self.assertGreater(timings[stage], 0.0)
+            self.assertAlmostEqual(timings['total'], sum(value for stage, value in timings.items()
+                                                         if stage not in ('total', 'bytes-read')))
+            self.assertGreater(timings['bytes-read'], 0)
+        self.assertIn('error', results[2])
+        self.assertIn('timings', results[2])
+
+        stats = model.get_stats()['timings']
+        self.assertEqual((3, 1), (stats.events, stats.errors))
+        self.assertEqual(2, stats.stages['read'].count)
+        self.assertEqual(sum(result['timings']['bytes-read'] for result in results[:2]),
+                         model.get_stats()['read'].bytes_read)
+
+        # Single events are timed too
+        model.update_example(self.paths[0])
+        self.assertIn('cavity-inference', model.analyze()['timings'])
+        self.assertEqual(4, model.get_stats()['timings'].events)
+
+        model.reset_stats()
+        self.assertEqual(0, model.get_stats()['timings'].events)
+
+    def test_timings(self):
+        # Collected for the stats without being added to results
+        model = Model(mode_lookup=CavityModeLookup(FileArchive(self.archive)), timings=True)
+        result = model.analyze_batch(self.paths[:1])[0]
+        self.assertNotIn('timings', result)
+        self.assertEqual(1, model.get_stats()['timings'].stages['total'].count)
+        self.assertEqual(0, model.copy().get_stats()['timings'].events)
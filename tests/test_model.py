@@ -2,7 +2,7 @@ import datetime
 import unittest
 import warnings
 
-from unittest import TestCase
+from unittest import TestCase, mock
 import os
 import sys
 
@@ -40,6 +40,9 @@ class TestModel(TestCase):
             test_results_file = os.path.join(app_root, 'tests', 'test_results.txt')
             test_set = testing_utils.TestSet(test_file)
 
+            # Download the events that are not cached all at once instead of one at a time below
+            test_set.prefetch()
+
             msgs = []
             ts_new_df = test_set.test_set_df.copy()
             for test_event in test_set.get_events():
@@ -49,8 +52,7 @@ class TestModel(TestCase):
                     event.get_event_data()
                 except Exception as exc:
                     failed += 1
-                    msgs.append("## Failed to get data for test.")
-                    msgs.append(exc)
+                    msgs.append(f"## Failed to get data for test.  {exc}")
 
                     continue
 
@@ -186,6 +188,110 @@ class TestModel(TestCase):
             msgs = [f"## FAILED {tests_failed} 'good' data validation tests"] + msgs
             self.fail('\n'.join(msgs))
 
+    def test_analyze_batch(self):
+        # Cavity modes come from a local stand-in for the archiver
+        model = Model(mode_lookup=testing_utils.get_offline_mode_lookup())
+
+        data_dir = os.path.dirname(__file__) + "/test-data"
+        test_paths = [
+            f'{data_dir}/good-example/1L25/2023_02_01/210026.1',
+            f'{data_dir}/missing-cfs/1L25/2018_10_05/044408.2',
+            'not/an/absolute/path/2023_02_01/210026.1',
+            f'{data_dir}/good-cavity-mode/1L25/2023_02_01/210026.1',
+            f'{data_dir}/bad-time-interval/1L25/2018_10_05/044556.2',
+        ]
+
+        # The batch should produce exactly what analyzing the events one at a time does
+        exp = []
+        for p in test_paths:
+            try:
+                model.update_example(p)
+                exp.append(model.analyze())
+            except Exception as ex:
+                exp.append({'error': f"{ex}", 'location': model.zone_name, 'timestamp': model.fault_time})
+
+        self.assertListEqual(exp, model.analyze_batch(test_paths))
+        self.assertEqual('6', exp[0]['cavity-label'])
+        self.assertEqual("Missing capture file for zone '3'", exp[1]['error'])
+        self.assertIsNone(exp[2]['location'])
+
+    def test_single_read(self):
+        model = Model(mode_lookup=testing_utils.get_offline_mode_lookup())
+        data_dir = os.path.dirname(os.path.abspath(__file__)) + "/test-data"
+
+        # Count every file opened while analyzing, whether by the model, rfwtools, or pandas
+        opened = []
+        real_open = open
+
+        def counting_open(file, *args, **kwargs):
+            if isinstance(file, (str, os.PathLike)):
+                opened.append(os.path.abspath(file))
+            return real_open(file, *args, **kwargs)
+
+        for path, throws in ((f'{data_dir}/good-example/1L25/2023_02_01/210026.1', False),
+                             (f'{data_dir}/bad-time-interval/1L25/2018_10_05/044556.2', True)):
+            with self.subTest(path=path):
+                opened.clear()
+                model.reset_stats()
+                model.update_example(path)
+                with mock.patch('builtins.open', counting_open):
+                    if throws:
+                        with self.assertRaisesRegex(ValueError, "Invalid time range"):
+                            model.analyze()
+                    else:
+                        model.analyze()
+
+                # Each capture file is opened exactly once, and the waveforms are not kept once they've been used
+                capture_files = [f for f in opened if os.path.dirname(f) == path]
+                self.assertEqual(8, len(capture_files))
+                self.assertEqual(8, len(set(capture_files)))
+                self.assertEqual(8, model.get_stats()['read'].files)
+                self.assertIsNone(model.event_data)
+
+    def test_iter_analyze(self):
+        model = Model()
+
+        data_dir = os.path.dirname(__file__) + "/test-data"
+        test_paths = [
+            f'{data_dir}/missing-cfs/1L25/2018_10_05/044408.2',
+            f'{data_dir}/duplicate-cfs/1L25/2018_10_05/044408.2',
+            f'{data_dir}/missing-waveforms/1L25/2018_10_05/044556.2',
+        ]
+        exp = model.analyze_batch(test_paths)
+
+        # Any iterable of paths should work, and batch boundaries should not change the results
+        results = model.iter_analyze((p for p in test_paths), batch_size=2)
+        self.assertNotIsInstance(results, list)
+        self.assertListEqual(exp, list(results))
+
+    def test_iter_analyze_prefetch(self):
+        data_dir = os.path.dirname(__file__) + "/test-data"
+        test_paths = [
+            f'{data_dir}/good-example/1L25/2023_02_01/210026.1',
+            f'{data_dir}/missing-cfs/1L25/2018_10_05/044408.2',
+            'not/an/absolute/path/2023_02_01/210026.1',
+            f'{data_dir}/good-cavity-mode/1L25/2023_02_01/210026.1',
+            f'{data_dir}/bad-time-interval/1L25/2018_10_05/044556.2',
+        ]
+        model = Model(mode_lookup=testing_utils.get_offline_mode_lookup())
+        exp = model.analyze_batch(test_paths)
+        exp_files = model.get_stats()['read'].files
+
+        # Loading ahead on other threads should change neither the results, their order, nor the counts
+        for prefetch in (1, 4):
+            with self.subTest(prefetch=prefetch):
+                model = Model(mode_lookup=testing_utils.get_offline_mode_lookup(), timings=True, prefetch=prefetch,
+                              io_threads=3)
+                self.assertListEqual(exp, list(model.iter_analyze(iter(test_paths), batch_size=2)))
+                self.assertEqual(exp_files, model.get_stats()['read'].files)
+                self.assertEqual(5, model.get_stats()['timings'].events)
+
+        # Stopping early leaves nothing running
+        model = Model(mode_lookup=testing_utils.get_offline_mode_lookup(), prefetch=4)
+        results = model.iter_analyze(test_paths, batch_size=1)
+        self.assertEqual(exp[0], next(results))
+        results.close()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import multiprocessing
+from unittest import TestCase, skipUnless
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import parallel, synthetic
+from rf_classifier.main import run_model
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+
+
+class TestWorkerMemoryStats(TestCase):
+
+    def test_add(self):
+        stats = parallel.WorkerMemoryStats()
+        stats.record(1, 100.0, 10.0)
+        other = parallel.WorkerMemoryStats()
+        other.record(1, 90.0, 20.0)
+        other.record(2, 120.0, 15.0)
+        stats.add(other)
+
+        # Each worker keeps its own peaks
+        self.assertEqual({1: 100.0, 2: 120.0}, stats.rss_mb)
+        self.assertEqual({1: 20.0, 2: 15.0}, stats.unique_mb)
+        self.assertEqual((120.0, 20.0), (stats.peak_rss_mb, stats.peak_unique_mb))
+        self.assertIn("Workers: 2", str(stats))
+
+
+@skipUnless('fork' in multiprocessing.get_all_start_methods(), "Sharing the model needs fork")
+class TestShareModel(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.paths = synthetic.write_events(cls.tmp.name, 6, distinct=3)
+        cls.archive = os.path.join(cls.tmp.name, 'cavity-modes.json')
+        synthetic.write_mode_archive(cls.archive, ['1L25'])
+        cls.model_kwargs = {'mode_lookup': CavityModeLookup(FileArchive(cls.archive))}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_share_model(self):
+        expected = run_model(self.paths, batch_size=2, model_kwargs=self.model_kwargs)['data']
+
+        stats = {}
+        results = parallel.run_model_parallel(self.paths, jobs=2, batch_size=2, model_kwargs=self.model_kwargs,
+                                              stats=stats, share_model=True)
+        self.assertEqual(expected, results)
+        self.assertEqual(48, stats['read'].files)
+
+        # The workers report their memory, and the model loaded to be shared is let go of afterwards
+        self.assertGreaterEqual(len(stats['workers'].rss_mb), 1)
+        self.assertGreater(stats['workers'].peak_rss_mb, 0.0)
+        self.assertIsNone(parallel._model)
+
+    def test_spawn(self):
+        with self.assertRaisesRegex(ValueError, "fork start method"):
+            list(parallel.iter_run_model_parallel(self.paths, jobs=2, share_model=True,
+                                                  mp_context=multiprocessing.get_context('spawn')))
@@ -0,0 +1,107 @@
+import os
+import math
+import sys
+import datetime
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+from scipy import signal as sgl
+from sklearn.preprocessing import StandardScaler
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model import preprocessing
+from rfwtools.example import Example
+from rfwtools.extractor.windowing import window_extractor
+
+data_dir = os.path.dirname(__file__) + "/test-data"
+
+
+def legacy_model_input(example: Example) -> np.ndarray:
+    """The original rfwtools and DataFrame based preprocessing that the preprocessing module replaces."""
+    num_samples = preprocessing.num_resample
+    df = window_extractor(example, signals=preprocessing.signals, windows={'pre-fault': preprocessing.window_start},
+                          n_samples=preprocessing.n_samples, standardize=False, downsample=True,
+                          ds_kwargs={'num': num_samples})
+    df = pd.DataFrame(df.iloc[0, 8:].values.reshape(len(preprocessing.signals), -1).T,
+                      columns=preprocessing.signals)
+
+    scaler = StandardScaler(copy=True, with_mean=True, with_std=True)
+    for i in range(len(df.columns)):
+        signal = df.iloc[:, i].values.reshape(-1, 1)
+        if np.min(signal) == np.max(signal):
+            df.iloc[:, i] = [preprocessing.fill] * len(signal)
+        else:
+            df.iloc[:, i] = scaler.fit_transform(signal)
+    return df.values.astype(np.float32)
+
+
+class TestPreprocessing(TestCase):
+
+    def test_make_model_input(self):
+        for name in ('good-example', 'good-example-meta'):
+            with self.subTest(name=name):
+                example = Example(zone='1L25', dt=datetime.datetime(2023, 2, 1, 21, 0, 26, 100000),
+                                  cavity_conf=math.nan, fault_conf=math.nan, cavity_label="", fault_label="",
+                                  label_source="", data_dir=f"{data_dir}/{name}")
+                expected = legacy_model_input(example)
+
+                example.load_data()
+                event_df = example.event_df
+                example.unload_data()
+                result = preprocessing.make_model_input(event_df['Time'].values,
+                                                        event_df[preprocessing.signals].values)
+
+                self.assertEqual((4096, 32), result.shape)
+                self.assertEqual(np.float32, result.dtype)
+                self.assertTrue(result.flags['C_CONTIGUOUS'])
+                np.testing.assert_allclose(expected, result, rtol=1e-5, atol=1e-6)
+
+    def test_resampler(self):
+        # Same as scipy.signal.resample, including the Nyquist handling of even lengths when down or up sampling
+        rng = np.random.default_rng(42)
+        for n, num in ((7680, 4096), (101, 50), (100, 51), (100, 50), (50, 100), (51, 100), (64, 64)):
+            with self.subTest(n=n, num=num):
+                x = rng.normal(size=(n, 3))
+                np.testing.assert_allclose(sgl.resample(x, num, axis=0), preprocessing.Resampler(n, num).resample(x),
+                                           rtol=1e-10, atol=1e-12)
+
+        # Several events at once give the same result as one at a time
+        resampler = preprocessing.get_resampler()
+        self.assertIs(resampler, preprocessing.get_resampler())
+        windows = rng.normal(size=(3, preprocessing.n_samples, 32))
+        result = resampler.resample(windows)
+        self.assertEqual((3, preprocessing.num_resample, 32), result.shape)
+        for i in range(3):
+            np.testing.assert_allclose(sgl.resample(windows[i], preprocessing.num_resample, axis=0), result[i],
+                                       rtol=1e-10, atol=1e-12)
+
+        with self.assertRaises(ValueError):
+            resampler.resample(windows[:, :100])
+
+    def test_standardize(self):
+        x = np.array([[1.0, 5.0, -2.0],
+                      [2.0, 5.0, 0.0],
+                      [3.0, 5.0, 8.0]])
+        result = preprocessing.standardize(x, fill_value=0.001)
+
+        expected = x.copy()
+        for i in (0, 2):
+            expected[:, i] = StandardScaler().fit_transform(x[:, i:i + 1]).ravel()
+        expected[:, 1] = 0.001
+        np.testing.assert_allclose(expected, result)
+
+    def test_get_window_bounds(self):
+        time = np.arange(-10, 10, 1.0)
+        self.assertEqual((5, 10), preprocessing.get_window_bounds(time, start=-5.5, n=5))
+
+        # The window must end before the last sample
+        self.assertEqual((10, 19), preprocessing.get_window_bounds(time, start=0, n=9))
+        with self.assertRaises(RuntimeError):
+            preprocessing.get_window_bounds(time, start=0, n=10)
+        with self.assertRaises(RuntimeError):
+            preprocessing.get_window_bounds(time, start=20, n=1)
@@ -0,0 +1,69 @@
+import os
+import sys
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from . import testing_utils
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model import quantization
+from rf_classifier.model.model import Model
+
+data_dir = os.path.dirname(__file__) + "/test-data"
+
+
+class TestQuantization(TestCase):
+
+    def test_get_model_path(self):
+        self.assertEqual(os.path.join(quantization.model_dir, 'cavity_model.onnx'),
+                         quantization.get_model_path('cavity_model'))
+        self.assertEqual('/tmp/fault_model.int8.onnx', quantization.get_model_path('fault_model', 'int8', '/tmp'))
+        with self.assertRaisesRegex(ValueError, "Unknown precision"):
+            quantization.get_model_path('cavity_model', 'fp16')
+
+    def test_quantize_models(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            paths = quantization.quantize_models(tmp)
+            self.assertEqual(['cavity_model.int8.onnx', 'fault_model.int8.onnx'], sorted(os.listdir(tmp)))
+            for path in paths:
+                self.assertLess(os.path.getsize(path), os.path.getsize(quantization.get_model_path('cavity_model')) / 2)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_model(self):
+        path = os.path.abspath(f"{data_dir}/good-example/1L25/2023_02_01/210026.1")
+        model = Model(precision='int8', mode_lookup=testing_utils.get_offline_mode_lookup())
+        result = model.analyze_batch([path])[0]
+        self.assertEqual('cnn_lstm_v1_0_int8', result['model'])
+        self.assertEqual(('6', 'Single Cav Turn off'), (result['cavity-label'], result['fault-label']))
+
+        with self.assertRaisesRegex(ValueError, "Unknown precision"):
+            Model(precision='int4')
+
+    def test_compare_precisions(self):
+        paths = [os.path.abspath(f"{data_dir}/{name}") for name in ('good-example/1L25/2023_02_01/210026.1',
+                                                                    'good-cavity-mode/1L25/2023_02_01/210026.1',
+                                                                    'missing-cfs/1L25/2018_10_05/044408.2')]
+        comparison = quantization.compare_precisions(
+            paths, model_kwargs={'mode_lookup': testing_utils.get_offline_mode_lookup()})
+
+        self.assertEqual(2, len(comparison.events))
+        self.assertEqual("Missing capture file for zone '3'", comparison.errors[0]['error'])
+        event = comparison.events[0]
+        self.assertEqual('cnn_lstm_v1_0', event['fp32']['model'])
+        self.assertEqual('cnn_lstm_v1_0_int8', event['int8']['model'])
+        self.assertGreater(event['int8-seconds'], 0)
+
+        summary = comparison.get_summary()
+        self.assertEqual((2, 1, 1.0), (summary['events'], summary['errors'], summary['agreement']))
+        self.assertLess(summary['cavity-confidence-drift-max'], 0.05)
+        self.assertTrue(np.isfinite(summary['int8-ms-p99']))
+        self.assertIn("Label agreement:   cavity 100.0%", str(comparison))
@@ -0,0 +1,121 @@
+import os
+import sys
+import math
+import datetime
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model import preprocessing
+from rf_classifier.model.reader import CaptureFileReader
+from rfwtools.example import Example
+
+data_dir = os.path.dirname(__file__) + "/test-data"
+
+
+def write_event(path: str, time: np.ndarray, cavities=range(1, 9)):
+    """Writes capture files with the model's signals for the given times.  Each signal is a ramp offset by its index."""
+    os.makedirs(path)
+    for cavity in cavities:
+        waveforms = ['GMES', 'GASK', 'CRFP', 'DETA2']
+        with open(os.path.join(path, f"R1M{cavity}WFSharv.2020_01_01_000000.0.txt"), "w") as f:
+            f.write("\t".join(['Time'] + [f"R1M{cavity}WFS{waveform}" for waveform in waveforms]) + "\n")
+            for i, t in enumerate(time):
+                f.write("\t".join([f"{t:g}"] + [f"{i + cavity * 10 + j}" for j in range(len(waveforms))]) + "\n")
+
+
+class TestCaptureFileReader(TestCase):
+
+    def test_load(self):
+        example = Example(zone='1L25', dt=datetime.datetime(2023, 2, 1, 21, 0, 26, 100000), cavity_conf=math.nan,
+                          fault_conf=math.nan, cavity_label="", fault_label="", label_source="",
+                          data_dir=f"{data_dir}/good-example")
+        example.load_data()
+        event_df = example.event_df
+        example.unload_data()
+
+        # The whole of each file is read once, but only the model's signals are kept
+        reader = CaptureFileReader()
+        event_data = reader.load(example.get_event_path())
+        self.assertEqual(8, reader.stats.files)
+        self.assertEqual(reader.stats.bytes_total, reader.stats.bytes_read)
+        self.assertEqual(sorted(example.get_capture_file_list()), event_data.capture_filenames)
+        self.assertEqual(sorted(c for c in event_df.columns if c != 'Time'), sorted(event_data.waveforms))
+        np.testing.assert_array_equal(event_df['Time'].values, event_data.time)
+        np.testing.assert_array_equal(event_df[preprocessing.signals].values, event_data.get_signals())
+
+        event_data.validate_capture_file_counts()
+        event_data.validate_capture_file_waveforms()
+        event_data.validate_waveform_times(min_end=10.0, max_start=-1534.0, step_size=0.2)
+
+        event_data.release()
+        self.assertIsNone(event_data.time)
+        with self.assertRaisesRegex(RuntimeError, "released"):
+            event_data.get_signals()
+
+    def test_load_validation(self):
+        # The checks raise the same errors as rfwtools' ExampleValidator
+        reader = CaptureFileReader()
+        event_data = reader.load(f"{data_dir}/missing-cfs/1L25/2018_10_05/044408.2")
+        with self.assertRaisesRegex(ValueError, "Missing capture file for zone '3'"):
+            event_data.validate_capture_file_counts()
+        event_data = reader.load(f"{data_dir}/duplicate-cfs/1L25/2018_10_05/044408.2")
+        with self.assertRaisesRegex(ValueError, "Duplicate capture files"):
+            event_data.validate_capture_file_counts()
+        event_data = reader.load(f"{data_dir}/missing-waveforms/1L25/2018_10_05/044556.2")
+        with self.assertRaisesRegex(ValueError, "required waveform columns"):
+            event_data.validate_capture_file_waveforms()
+        event_data = reader.load(f"{data_dir}/bad-time-interval/1L25/2018_10_05/044556.2")
+        with self.assertRaisesRegex(ValueError, "Invalid time range"):
+            event_data.validate_waveform_times(min_end=10.0, max_start=-1534.0, step_size=0.2)
+        # Same as rfwtools, the range of files whose times do not match is that of all of their times
+        event_data = reader.load(f"{data_dir}/mismatched-times/1L25/2018_10_05/044556.2")
+        with self.assertRaisesRegex(ValueError, r"Invalid time range of \[-307.15,103.4\]"):
+            event_data.validate_waveform_times(min_end=10.0, max_start=-1534.0, step_size=0.2)
+        with self.assertRaisesRegex(ValueError, "matching Time"):
+            event_data.validate_waveform_times(min_end=10.0, max_start=-300.0, step_size=0.2)
+        with self.assertRaisesRegex(ValueError, "matching Time"):
+            event_data.get_signals()
+
+    def test_concurrent_read(self):
+        # Reading the files at once gives the same data, counts, and errors as reading them one after another
+        good = f"{data_dir}/good-example/1L25/2023_02_01/210026.1"
+        missing = f"{data_dir}/missing-cfs/1L25/2018_10_05/044408.2"
+        sequential = CaptureFileReader(threads=1)
+        concurrent = CaptureFileReader(threads=8)
+        for path in (good, missing):
+            expected = sequential.load(path)
+            event_data = concurrent.load(path)
+            self.assertEqual(expected.capture_filenames, event_data.capture_filenames)
+            self.assertEqual(expected.waveforms, event_data.waveforms)
+            np.testing.assert_array_equal(expected.time, event_data.time)
+            if path == good:
+                np.testing.assert_array_equal(expected.get_signals(), event_data.get_signals())
+            else:
+                # Cavities 3, 4, and 7 have no capture files, so their signals are missing either way
+                for data in (expected, event_data):
+                    with self.assertRaisesRegex(ValueError, "missing waveforms"):
+                        data.get_signals()
+        self.assertEqual(vars(sequential.stats), vars(concurrent.stats))
+        concurrent.close()
+
+    def test_load_missing_signals(self):
+        event_data = CaptureFileReader().load(f"{data_dir}/missing-waveforms/1L25/2018_10_05/044556.2")
+        with self.assertRaisesRegex(ValueError, "missing waveforms - 1_DETA2"):
+            event_data.get_signals()
+
+    def test_load_flipped_time(self):
+        # Some early events had their Time column flipped.  rfwtools flips it back.
+        with tempfile.TemporaryDirectory() as tmp:
+            time = np.arange(10, -10, -0.5)
+            write_event(os.path.join(tmp, 'event'), time)
+
+            event_data = CaptureFileReader().load(os.path.join(tmp, 'event'))
+            np.testing.assert_array_equal(-1 * time[::-1], event_data.time)
+            self.assertEqual((len(time), 32), event_data.get_signals().shape)
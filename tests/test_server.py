@@ -0,0 +1,60 @@
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from rf_classifier.model.model import Model
+from rf_classifier import server
+
+test_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-data")
+
+
+class TestServer(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Port zero lets the OS pick a free port
+        cls.server = server.ModelServer(Model(), port=0)
+        cls.url = server.get_server_url(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_is_server_running(self):
+        self.assertTrue(server.is_server_running(self.url))
+        self.assertFalse(server.is_server_running(server.get_server_url(1)))
+
+    def test_get_server_model_id(self):
+        self.assertEqual('cnn_lstm_v1_0', server.get_server_model_id(self.url))
+        self.assertIsNone(server.get_server_model_id(server.get_server_url(1)))
+
+    def test_analyze_remote(self):
+        exp = {'data': [{'error': "Missing capture file for zone '3'", 'location': '1L25',
+                         'timestamp': '2018-10-05 04:44:08.2'}]}
+        result = server.analyze_remote([f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2"], self.url)
+        self.assertDictEqual(exp, result)
+
+    def test_analyze_remote_concurrent(self):
+        events = [f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2",
+                  f"{test_data}/duplicate-cfs/1L25/2018_10_05/044408.2",
+                  f"{test_data}/bad-time-interval/1L25/2018_10_05/044556.2",
+                  f"{test_data}/missing-waveforms/1L25/2018_10_05/044556.2"]
+        exp = [server.analyze_remote([event], self.url)['data'][0] for event in events]
+
+        # Requests running at the same time should not see each other's events
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda e: server.analyze_remote([e], self.url)['data'][0], events * 3))
+        self.assertListEqual(exp * 3, results)
+
+    def test_bad_request(self):
+        with self.assertRaises(RuntimeError):
+            server.analyze_remote("not a list", self.url)
+
+
+if __name__ == '__main__':
+    unittest.main()
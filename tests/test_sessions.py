@@ -0,0 +1,86 @@
+import os
+import sys
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+import numpy as np
+import onnxruntime as rt
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.model.model import Model
+from rf_classifier.model.sessions import SessionConfig
+
+model_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "rf_classifier",
+                          "model", "model_files", "cavity_model.onnx")
+
+
+def run(session, features):
+    """Returns the raw output of a session for the given input."""
+    return session.run(None, {session.get_inputs()[0].name: features})[0]
+
+
+class TestSessionConfig(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_make_options(self):
+        # The defaults are ONNX Runtime's
+        options = SessionConfig().make_options()
+        defaults = rt.SessionOptions()
+        self.assertEqual(defaults.intra_op_num_threads, options.intra_op_num_threads)
+        self.assertEqual(defaults.graph_optimization_level, options.graph_optimization_level)
+        self.assertEqual(defaults.execution_mode, options.execution_mode)
+
+        options = SessionConfig(intra_op_threads=2, inter_op_threads=3, optimization_level='basic',
+                                execution_mode='parallel').make_options()
+        self.assertEqual((2, 3), (options.intra_op_num_threads, options.inter_op_num_threads))
+        self.assertEqual(rt.GraphOptimizationLevel.ORT_ENABLE_BASIC, options.graph_optimization_level)
+        self.assertEqual(rt.ExecutionMode.ORT_PARALLEL, options.execution_mode)
+
+        with self.assertRaisesRegex(ValueError, "Unknown graph optimization level"):
+            SessionConfig(optimization_level='max')
+
+    def test_replace(self):
+        config = SessionConfig(intra_op_threads=2, optimized_model_dir=self.tmp, warm_up=True)
+        other = config.replace(intra_op_threads=1)
+        self.assertEqual((1, self.tmp, True), (other.intra_op_threads, other.optimized_model_dir, other.warm_up))
+        self.assertEqual(2, config.intra_op_threads)
+
+    def test_create_session(self):
+        features = np.random.default_rng(1).standard_normal((1, 4096, 32), dtype=np.float32)
+        expected = run(rt.InferenceSession(model_file), features)
+
+        # The optimized model is saved the first time and loaded afterwards
+        config = SessionConfig(optimized_model_dir=self.tmp)
+        path = config.get_optimized_model_path(model_file)
+        np.testing.assert_array_equal(expected, run(config.create_session(model_file), features))
+        self.assertEqual([os.path.basename(path)], os.listdir(self.tmp))
+        with mock.patch.object(rt, 'InferenceSession', wraps=rt.InferenceSession) as session:
+            np.testing.assert_array_equal(expected, run(config.create_session(model_file), features))
+            self.assertEqual(path, session.call_args[0][0])
+
+        # Each optimization level gets its own file
+        self.assertNotEqual(path, config.replace(optimization_level='basic').get_optimized_model_path(model_file))
+        self.assertIsNone(config.replace(optimization_level='disable').get_optimized_model_path(model_file))
+
+        # A damaged file is replaced
+        with open(path, 'wb') as f:
+            f.write(b'not a model')
+        np.testing.assert_array_equal(expected, run(config.create_session(model_file), features))
+        self.assertGreater(os.path.getsize(path), 1000)
+
+    def test_warm_up(self):
+        with mock.patch.object(Model, 'make_batch_prediction', wraps=Model.make_batch_prediction) as prediction:
+            model = Model(session_config=SessionConfig(warm_up=True))
+            self.assertEqual(2, prediction.call_count)
+            self.assertEqual((1, 4096, 32), prediction.call_args[0][1].shape)
+        self.assertIs(model.fault_onnx_session, prediction.call_args[0][0])
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier.store import ResultStore
+
+
+def make_result(zone, timestamp, model='cnn_lstm_v1_0'):
+    return {'location': zone, 'timestamp': timestamp, 'cavity-label': '6', 'cavity-confidence': 0.9,
+            'fault-label': 'Quench_100ms', 'fault-confidence': 0.8, 'model': model}
+
+
+class TestResultStore(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'results.sqlite')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put(self):
+        with ResultStore(self.path) as store:
+            results = [make_result('1L25', '2023-02-01 21:00:26.1'), make_result('1L26', '2023-02-01 21:00:26.1'),
+                       {'error': 'Bad event', 'location': '1L25', 'timestamp': '2023-02-01 22:00:00.0'}]
+            # Only the successful results are kept
+            self.assertEqual(2, store.put(results))
+            self.assertEqual(results[0], store.get('1L25', '2023-02-01 21:00:26.1', 'cnn_lstm_v1_0'))
+            self.assertIsNone(store.get('1L25', '2023-02-01 21:00:26.1', 'cnn_lstm_v1_0_int8'))
+            self.assertIsNone(store.get('1L25', '2023-02-01 22:00:00.0', 'cnn_lstm_v1_0'))
+
+            # A newer result for the same event and model replaces the old one
+            results[0]['fault-label'] = 'E_Quench'
+            store.put(results[:1])
+            self.assertEqual('E_Quench', store.get('1L25', '2023-02-01 21:00:26.1', 'cnn_lstm_v1_0')['fault-label'])
+            self.assertEqual((3, 2), (store.stats.stored, store.stats.transactions))
+
+        # The results are still there when the store is opened again
+        with ResultStore(self.path) as store:
+            self.assertEqual(2, len(list(store.query())))
+
+    def test_iter_missing(self):
+        with ResultStore(self.path) as store:
+            store.put([make_result('1L25', '2023-02-01 21:00:26.1')])
+            events = ['/data/1L25/2023_02_01/210026.1', '/data/1L25/2023_02_01/210027.1', 'not/an/event']
+            self.assertEqual(events[1:], list(store.iter_missing(iter(events), 'cnn_lstm_v1_0')))
+            self.assertEqual(events, list(store.iter_missing(events, 'cnn_lstm_v1_0_int8')))
+            self.assertEqual(1, store.stats.skipped)
+
+    def test_iter_store(self):
+        with ResultStore(self.path, batch_size=2) as store:
+            results = [make_result('1L25', f'2023-02-01 21:00:2{i}.1') for i in range(5)]
+            stored = store.iter_store(iter(results))
+            self.assertEqual(results[:2], [next(stored), next(stored)])
+            self.assertEqual(0, store.stats.stored)
+
+            # Whole batches are written as they fill up and the rest once the results run out
+            self.assertEqual(results[2], next(stored))
+            self.assertEqual(2, store.stats.stored)
+            self.assertEqual(results[3:], list(stored))
+            self.assertEqual((5, 3), (store.stats.stored, store.stats.transactions))
+
+    def test_query(self):
+        with ResultStore(self.path) as store:
+            store.put([make_result('1L26', '2023-02-02 01:00:00.0'), make_result('1L25', '2023-02-01 21:00:26.1'),
+                       make_result('1L25', '2023-02-03 00:00:00.0'),
+                       make_result('1L25', '2023-02-01 21:00:26.1', model='cnn_lstm_v1_0_int8')])
+
+            self.assertEqual(['2023-02-01 21:00:26.1', '2023-02-03 00:00:00.0'],
+                             [r['timestamp'] for r in store.query(zones=['1L25'], model='cnn_lstm_v1_0')])
+            self.assertEqual(['1L26'], [r['location'] for r in store.query(since=datetime(2023, 2, 2),
+                                                                           until=datetime(2023, 2, 3))])
+            self.assertEqual(4, len(list(store.query())))
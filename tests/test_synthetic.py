@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+
+# Put the lib dir at the front of the search path.  Makes the sys.path correct regardless of the context this test is
+# run.
+app_root = os.path.join(os.path.dirname(os.path.dirname(__file__)))
+app_lib = os.path.join(app_root, "lib")
+sys.path.insert(0, app_lib)
+from rf_classifier import synthetic
+from rf_classifier.model import preprocessing
+from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+from rf_classifier.model.model import Model
+from rf_classifier.model.reader import CaptureFileReader
+
+
+class TestSynthetic(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_zone_prefix(self):
+        self.assertEqual('R1P', synthetic.get_zone_prefix('1L25'))
+        self.assertEqual('R2M', synthetic.get_zone_prefix('2L22'))
+        with self.assertRaisesRegex(ValueError, "Not a C100 zone"):
+            synthetic.get_zone_prefix('0L04')
+
+    def test_write_event(self):
+        path = synthetic.write_event(self.tmp.name, zone='2L23', dt=datetime(2024, 3, 5, 6, 7, 8, 950000),
+                                     n_samples=100, fault_cavity=3, seed=1)
+        self.assertEqual(os.path.join(self.tmp.name, '2L23', '2024_03_05', '060708.9'), path)
+        self.assertEqual([f"R2N{cavity}WFSharv.2024_03_05_060708.9.txt" for cavity in range(1, 9)],
+                         sorted(os.listdir(path)))
+
+        with open(os.path.join(path, "R2N3WFSharv.2024_03_05_060708.9.txt"), "r") as f:
+            header = f.readline().rstrip("\n").split("\t")
+            lines = f.readlines()
+        self.assertEqual(['Time'] + [f"R2N3WFS{waveform}" for waveform in synthetic.waveforms], header)
+        self.assertEqual(100, len(lines))
+        self.assertEqual(['-1536', '-1535.8'], [line.split("\t")[0] for line in lines[:2]])
+
+        # The same seed gives the same waveforms
+        other = synthetic.write_event(os.path.join(self.tmp.name, 'other'), zone='2L23',
+                                      dt=datetime(2024, 3, 5, 6, 7, 8, 950000), n_samples=100, fault_cavity=3, seed=1)
+        with open(os.path.join(other, "R2N3WFSharv.2024_03_05_060708.9.txt"), "r") as f:
+            self.assertEqual(lines, f.readlines()[1:])
+
+    def test_write_events(self):
+        paths = synthetic.write_events(self.tmp.name, 3, n_samples=9000, distinct=2)
+        self.assertEqual(['210026.1', '210126.1', '210226.1'], [os.path.basename(path) for path in paths])
+
+        # The faulted cavity's gradient collapses after t = 0
+        event_data = CaptureFileReader().load(paths[0])
+        time, data = event_data.time, event_data.get_signals()
+        gmes = data[:, [preprocessing.signals.index(f"{cavity}_GMES") for cavity in range(1, 9)]]
+        after = time > 100
+        self.assertEqual(1, np.sum(gmes[after].mean(axis=0) < 0.5 * gmes[time < 0].mean(axis=0)))
+
+    def test_model(self):
+        # Synthetic events pass validation, so the whole model can be run without the waveform browser
+        paths = synthetic.write_events(self.tmp.name, 3, distinct=2)
+        archive = os.path.join(self.tmp.name, 'cavity-modes.json')
+        synthetic.write_mode_archive(archive, ['1L25'])
+
+        model = Model(mode_lookup=CavityModeLookup(FileArchive(archive)))
+        results = model.analyze_batch(paths)
+        for result in results:
+            self.assertNotIn('error', result)
+        self.assertEqual(['2023-02-01 21:00:26.1', '2023-02-01 21:01:26.1', '2023-02-01 21:02:26.1'],
+                         [result['timestamp'] for result in results])
+        self.assertEqual(results[0]['cavity-label'], results[2]['cavity-label'])
@@ -1,6 +1,7 @@
 from unittest import TestCase
 import unittest
 import os
+import tempfile
 from rf_classifier import utils
 from datetime import datetime
 
@@ -28,6 +29,41 @@ class TestUtils(TestCase):
         self.assertRaises(ValueError, utils.path_to_datetime,
                           os.path.join("some", "path", '1L99', "20178-05-01", "00:03:50.7289"))
 
+    def test_find_events(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for event in ("1L22/2023_01_31/235959.9", "1L22/2023_02_01/000000.0", "1L22/2023_02_01/120000.5",
+                          "1L22/2023_02_02/000000.1", "1L23/2023_02_01/080000.0", "1L22/2023_02_01/not-an-event",
+                          "1L22/notadate/120000.5"):
+                os.makedirs(os.path.join(tmp, event))
+            # Files are not events
+            open(os.path.join(tmp, "1L22", "2023_02_01", "130000.0"), "w").close()
+
+            def find(**kwargs):
+                return [os.path.relpath(path, tmp) for path in utils.find_events(tmp, **kwargs)]
+
+            self.assertEqual(["1L22/2023_01_31/235959.9", "1L22/2023_02_01/000000.0", "1L22/2023_02_01/120000.5",
+                              "1L22/2023_02_02/000000.1", "1L23/2023_02_01/080000.0"], find())
+            self.assertEqual(["1L22/2023_02_01/000000.0", "1L22/2023_02_01/120000.5"],
+                             find(zones=['1L22'], since=datetime(2023, 2, 1), until=datetime(2023, 2, 2)))
+            self.assertEqual(["1L22/2023_02_01/120000.5", "1L22/2023_02_02/000000.1"],
+                             find(zones=['1L22'], since=datetime(2023, 2, 1, 12, 0, 0, 500000)))
+            self.assertEqual(["1L23/2023_02_01/080000.0"], find(zones=['1L23', '1L99']))
+
+            # Date directories outside of the range are not listed at all
+            listed = []
+            list_dirs = utils.list_dirs
+
+            def recording_list_dirs(path, pattern=None):
+                listed.append(os.path.relpath(path, tmp))
+                return list_dirs(path, pattern)
+
+            utils.list_dirs = recording_list_dirs
+            try:
+                find(zones=['1L22'], since=datetime(2023, 2, 2))
+            finally:
+                utils.list_dirs = list_dirs
+            self.assertEqual(["1L22", "1L22/2023_02_02"], listed)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,77 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import TestCase
+
+from rf_classifier.model.model import Model
+from rf_classifier.watch import EventWatcher
+
+test_data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-data")
+
+
+class TestEventWatcher(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = Model()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_root = os.path.join(self.tmp_dir, "rf")
+        self.checkpoint = os.path.join(self.tmp_dir, "watch.checkpoint")
+
+        # Some history that was classified before the watcher ever started
+        shutil.copytree(f"{test_data}/missing-cfs/1L25/2018_10_05/044408.2",
+                        f"{self.data_root}/1L25/2018_10_05/044408.2")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def add_event(self, src, dst):
+        shutil.copytree(os.path.join(test_data, src), os.path.join(self.data_root, dst))
+
+    def test_poll(self):
+        sink = io.StringIO()
+        watcher = EventWatcher(self.data_root, sink, self.model, checkpoint=self.checkpoint, settle=0, timeout=60)
+        self.assertEqual(0, watcher.poll())
+
+        # A complete event is only classified once it has been seen unchanged
+        self.add_event("duplicate-waveforms/1L25/2018_10_05/044556.2", "1L25/2018_10_05/044556.2")
+        self.assertEqual(0, watcher.poll())
+        self.assertEqual(1, watcher.poll())
+
+        result = json.loads(sink.getvalue())
+        self.assertEqual("1L25", result['location'])
+        self.assertEqual("2018-10-05 04:45:56.2", result['timestamp'])
+        self.assertIn('error', result)
+        self.assertGreaterEqual(result['latency'], 0)
+
+        # Incomplete events wait for the timeout
+        self.add_event("missing-cfs/1L25/2018_10_05/044408.2", "1L25/2018_10_06/044408.2")
+        self.assertEqual(0, watcher.poll())
+        self.assertEqual(0, watcher.poll())
+        watcher.timeout = 0
+        self.assertEqual(1, watcher.poll())
+        self.assertEqual("Missing capture file for zone '3'", json.loads(sink.getvalue().splitlines()[1])['error'])
+
+        # A restarted watcher does not reclassify anything
+        sink = io.StringIO()
+        watcher = EventWatcher(self.data_root, sink, self.model, checkpoint=self.checkpoint, settle=0, timeout=0,
+                               include_existing=True)
+        self.assertEqual(0, watcher.poll())
+        self.assertEqual(0, watcher.poll())
+        self.assertEqual("", sink.getvalue())
+
+    def test_include_existing(self):
+        sink = io.StringIO()
+        watcher = EventWatcher(self.data_root, sink, self.model, settle=0, timeout=0, include_existing=True)
+        self.assertEqual(0, watcher.poll())
+        self.assertEqual(1, watcher.poll())
+        self.assertEqual("Missing capture file for zone '3'", json.loads(sink.getvalue())['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,10 @@
+import csv
 import datetime
+import gzip
+import hashlib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 import urllib.parse
@@ -21,6 +27,187 @@ class SSLContextAdapter(HTTPAdapter):
         return super(SSLContextAdapter, self).init_poolmanager(*args, **kwargs)
 
 
+default_base_url = os.environ.get('RF_CLASSIFIER_TEST_URL', 'https://accweb.acc.jlab.org/wfbrowser/ajax/event')
+"""The waveform browser's event service.  Point RF_CLASSIFIER_TEST_URL at a local stand-in to test without accweb."""
+
+default_cache_dir = os.environ.get('RF_CLASSIFIER_TEST_CACHE',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "test-data", "event-cache"))
+"""Where fetched events are kept between runs.  Set RF_CLASSIFIER_TEST_CACHE to share one between checkouts."""
+
+offline = os.environ.get('RF_CLASSIFIER_TEST_OFFLINE', '') not in ('', '0')
+"""Set RF_CLASSIFIER_TEST_OFFLINE=1 to only use cached events.  Events that are not cached fail to fetch."""
+
+
+class EventFetcher:
+    """Downloads events from the waveform browser through one pooled session and keeps them in a local cache.
+
+    The cache is content addressed.  Each response is stored once as objects/<sha256>.csv.gz, and refs/<zone>/<time>
+    names the object of an event.  Objects never change once written, and both are written to a temporary name first,
+    so any number of threads or processes can share a cache.  Copy a cache directory to run the tests offline.
+    """
+
+    def __init__(self, cache_dir=default_cache_dir, base_url=default_base_url, max_workers=4, offline=offline):
+        """Create an EventFetcher.
+
+        Args:
+            cache_dir (str): The directory of the cache.  Nothing is cached if None.
+            base_url (str): The URL of the waveform browser's event service
+            max_workers (int): The most events downloaded at once.  Also the size of the session's connection pool.
+            offline (bool): Only use cached events
+        """
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.offline = offline
+        self.downloads = 0
+        """The number of events downloaded rather than found in the cache."""
+        self._lock = threading.Lock()
+
+        # Supply the SSLContextAdapter to use the Windows trust store.  One session reuses its connections.
+        self.session = requests.Session()
+        self.session.mount(base_url, SSLContextAdapter(pool_connections=1, pool_maxsize=max_workers))
+
+    def make_url(self, zone, begin):
+        """Returns the URL of the CSV of a zone's event at begin (datetime)."""
+        out_fmt = '%Y-%m-%d %H:%M:%S'
+        end = begin + datetime.timedelta(seconds=1)
+        query = urllib.parse.urlencode([('out', 'csv'), ('includeData', 'true'), ('location', zone),
+                                        ('begin', begin.strftime(out_fmt)), ('end', end.strftime(out_fmt))])
+        return f"{self.base_url}?{query}"
+
+    def fetch(self, zone, begin):
+        """Returns the CSV text of a zone's event at begin (datetime), from the cache if it is there.
+
+        Raises:
+            RuntimeError: if the event is not cached when offline, or the server sends back an empty response
+        """
+        text = self._read_cache(zone, begin)
+        if text is not None:
+            return text
+        url = self.make_url(zone, begin)
+        if self.offline:
+            raise RuntimeError(f"Event is not cached and fetching is off - {url}")
+
+        r = self.session.get(url)
+        r.raise_for_status()
+        if len(r.text) < 10:
+            raise RuntimeError(f"Got empty response from data server for - {url}")
+        with self._lock:
+            self.downloads += 1
+        self._write_cache(zone, begin, r.text)
+        return r.text
+
+    def prefetch(self, events):
+        """Fetches several events into the cache concurrently.  Their capture files are written by get_event_data.
+
+        Args:
+            events (list:EventData): The events to fetch
+
+        Returns:
+            list: The exception raised for each event, in order, or None if it was fetched
+        """
+        def fetch_one(event):
+            try:
+                self.fetch(event.zone, event.timestamp)
+            except Exception as ex:
+                return ex
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fetch_one, events))
+
+    def _get_ref_path(self, zone, begin):
+        return os.path.join(self.cache_dir, "refs", zone, begin.strftime("%Y_%m_%d_%H%M%S"))
+
+    def _get_object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", f"{digest}.csv.gz")
+
+    def _read_cache(self, zone, begin):
+        """Returns the cached CSV text of an event, or None if it is not cached."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._get_ref_path(zone, begin), "r") as f:
+                digest = f.read().strip()
+            with gzip.open(self._get_object_path(digest), "rt", newline="") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+
+        # Treat a damaged object as missing.  It is replaced when the event is downloaded again.
+        if hashlib.sha256(text.encode('utf-8')).hexdigest() != digest:
+            return None
+        return text
+
+    def _write_cache(self, zone, begin, text):
+        """Stores the CSV text of an event in the cache."""
+        if self.cache_dir is None:
+            return
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        object_path = self._get_object_path(digest)
+        if not os.path.exists(object_path):
+            _write_atomic(object_path, gzip.compress(text.encode('utf-8'), compresslevel=1))
+        _write_atomic(self._get_ref_path(zone, begin), digest.encode('utf-8'))
+
+
+def _write_atomic(path, content):
+    """Writes bytes to a temporary file next to path and then moves it into place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Returns the EventFetcher shared by the tests, creating it on first use."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = EventFetcher()
+        return _fetcher
+
+
+def write_capture_files(text, event_dir, date, ctime):
+    """Splits an event's CSV from the waveform browser into the per-cavity capture files the model expects to find.
+
+    The values are copied as text, so nothing is lost to parsing and formatting numbers.
+
+    Args:
+        text (str): The CSV text
+        event_dir (str): The directory the capture files are written to
+        date (str): The event's date as YYYY_MM_DD
+        ctime (str): The event's time as hhmmss.S
+    """
+    rows = csv.reader(StringIO(text))
+    header = ['Time' if name == 'time_offset' else name for name in next(rows)]
+    base = header[3][:3]
+    time_column = header.index('Time')
+    cavities = []
+    for i in range(1, 9):
+        cav = base + str(i)
+        cavities.append((cav, [time_column] + [j for j, name in enumerate(header) if cav in name]))
+
+    columns = [[] for _ in cavities]
+    for row in rows:
+        for out, (cav, indices) in zip(columns, cavities):
+            out.append("\t".join([row[j] for j in indices]))
+
+    for out, (cav, indices) in zip(columns, cavities):
+        out_file = os.path.join(event_dir, "{}WFSharv.{}_{}.txt".format(cav, date, ctime))
+        with open(out_file, "w") as f:
+            f.write("\t".join([header[j] for j in indices]) + "\n")
+            f.write("\n".join(out) + "\n")
+
+
 class EventData:
 
     def __init__(self, zone, timestamp):
@@ -39,32 +226,13 @@ class EventData:
         self.event_dir = os.path.join(self.event_dir_base, self.timestamp_fs_string)
         self.timestamp = datetime.datetime.strptime(self.timestamp_string, '%Y-%m-%d %H%M%S.%f')
 
-    def get_event_data(self):
-        """Downloads the data from accweb for the specified zone and timestamp."""
+    def get_event_data(self, fetcher=None):
+        """Gets the data for the specified zone and timestamp from the cache or accweb and writes its capture files.
 
-        # Setup to download the data
-        base = 'https://accweb.acc.jlab.org/wfbrowser/ajax/event?'
-        z = urllib.parse.quote_plus(self.zone)
-        in_fmt = '%Y-%m-%d %H%M%S.%f'
-        out_fmt = '%Y-%m-%d %H:%M:%S'
-        begin = self.timestamp
-        end = begin + datetime.timedelta(seconds=1)
-        b = urllib.parse.quote_plus(begin.strftime(out_fmt))
-        e = urllib.parse.quote_plus(end.strftime(out_fmt))
-        url = base + 'out=csv&includeData=true&location=' + z + '&begin=' + b + '&end=' + e
-
-        # Download the data - supply the session/SSLContextAdapter to use Windows trust store
-        s = requests.Session()
-        adapter = SSLContextAdapter()
-        s.mount(url, adapter)
-        r = s.get(url)
-
-        if len(r.text) < 10:
-            raise RuntimeError(f"Got empty response from data server for - {url}")
-
-        # Read the data in from the response stream
-        data = StringIO(r.text.replace('time_offset', 'Time'))
-        df = pd.read_csv(data)
+        Args:
+            fetcher (EventFetcher): Where the data comes from.  The shared fetcher if None.  See get_fetcher.
+        """
+        text = (get_fetcher() if fetcher is None else fetcher).fetch(self.zone, self.timestamp)
 
         # Create the event directory tree
         try:
@@ -77,12 +245,7 @@ class EventData:
         # Write out the data into per-cavity capture files that the model expects to find
         date = self.timestamp_string.split(" ")[0].replace("-", "_")
         ctime = self.timestamp_string.split(" ")[1].replace(":", "")
-        base = df.columns.values[3][:3]
-        for i in range(1, 9):
-            cav = base + str(i)
-            cav_columns = ['Time'] + [col for col in df.columns.values if cav in col]
-            out_file = os.path.join(self.event_dir, "{}WFSharv.{}_{}.txt".format(cav, date, ctime))
-            df[cav_columns].to_csv(out_file, index=False, sep='\t')
+        write_capture_files(text, self.event_dir, date, ctime)
 
     def delete_event_data(self):
         shutil.rmtree(self.event_dir_base)
@@ -111,6 +274,17 @@ class TestSet:
         self.test_set_df.loc[:, "cav_conf"] = self.test_set_df.loc[:, "cav_conf"].round(2).astype(str)
         self.test_set_df.loc[:, "fault_conf"] = self.test_set_df.loc[:, "fault_conf"].round(2).astype(str)
 
+    def prefetch(self, fetcher=None):
+        """Fetches the data of every event in the test set into the cache concurrently.
+
+        Events that fail are left for get_event_data to report.
+
+        Args:
+            fetcher (EventFetcher): Where the data comes from.  The shared fetcher if None.
+        """
+        events = [EventData(zone=event['zone'], timestamp=event['timestamp']) for event in self.get_events()]
+        (get_fetcher() if fetcher is None else fetcher).prefetch(events)
+
     def get_events(self):
         out = []
         for i in range(0, len(self.test_set_df)):
@@ -129,3 +303,13 @@ class TestSet:
                 }
             })
         return out
+
+
+cavity_modes_file = os.path.join(os.path.dirname(__file__), "test-data", "cavity-modes.json")
+"""Archived cavity modes, gradients, and bypass words for the events in test-data.  Lets validation run offline."""
+
+
+def get_offline_mode_lookup():
+    """Returns a CavityModeLookup that answers from cavity_modes_file instead of the archiver."""
+    from rf_classifier.model.cavity_modes import CavityModeLookup, FileArchive
+    return CavityModeLookup(FileArchive(cavity_modes_file))